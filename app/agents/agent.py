@@ -2,12 +2,19 @@
 """
 The base class for all AI Agent implementations
 """
+import asyncio
 import logging
 import os
-import gc
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from app.agents.agent_config import AIAgentConfig
+from app.agents.agent_metrics import AgentMetrics, CallMetrics
+from app.agents.context_window import ContextWindow
 from app.agents.prompt import Prompt
+from app.agents.rate_limiter import RateLimiter
+from app.agents.response_cache import ResponseCache
 
 
 # Setup logging framework
@@ -21,6 +28,9 @@ logger = logging.getLogger(__name__)
 # app/agents/AIAgent.py
 class AIAgent:
     """The base class for all AI Agent implementations"""
+
+    PROVIDER = "generic"    # the AI platform, overridden by the implementations
+
     def __init__(self, config: AIAgentConfig):
         logger.debug("Initializing AIAgent with config: %s", config)
         self.config : AIAgentConfig = config
@@ -35,40 +45,64 @@ class AIAgent:
         self.stop_sequences = AIAgentConfig.get_stop_sequences()
 
         # further processing configs
-        self.max_prompt_length = int(os.getenv('AI_MAX_PROMPT_LENGTH', '2000'))
+        self.context_window = ContextWindow(self.model_name, self.max_output_tokens)
+        self.response_cache : ResponseCache|None = ResponseCache.get_instance()
+        self.use_cache = True   # may be disabled per workflow with NO_CACHE
+        # mark the stable prompt prefix for the provider's prompt cache (if supported)
+        self.use_prompt_cache = os.getenv('AI_PROMPT_CACHE', 'TRUE').upper() == 'TRUE'
+        self.rate_limiter = RateLimiter.get_instance(self.PROVIDER, self.model_name)
 
-        # usage telemetry
+        # usage telemetry (accumulated over all calls)
         self.total_duration_sec = 0.0
         self.total_iterations = 0
 
         self.total_prompt_tokens = 0
         self.total_completion_tokens = 0
         self.total_tokens = 0
+        self.total_cached_prompt_tokens = 0 # prompt tokens read from the provider's prompt cache
 
         self.total_prompt_chars = 0
         self.total_completion_chars = 0
         self.total_chars = 0
 
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.total_queue_wait_sec = 0.0 # waiting for the rate limiter (incl. the backoff after 429)
+        self.total_retries = 0
+        self.total_candidates = 0       # candidate answers generated by ask_candidates()
+        self.reused_candidates = 0      # candidate answers taken by next_candidate() without a request
+
+        # per-call metrics, also recorded in the process-wide registry
+        self.call_metrics : list[CallMetrics] = []
+        self.metrics_registry : AgentMetrics = AgentMetrics.get_instance()
+        self._current_call : CallMetrics|None = None
+        self._usage_lock = threading.Lock()
+
+        # streaming telemetry (of the last streamed answer)
+        self.time_to_first_token_sec : float|None = None
+        self.tokens_per_sec : float|None = None
+
         self.messages : list = []
         self.last_result : str|None = None
+        self.candidates : list[str] = []    # the unused candidate answers of the last ask_candidates()
+        self.candidates_prompt : str|None = None    # the prompt the candidates answer
 
 
-    def __del__(self):
-        """Destructor calls cleanup to ensure resource release"""
-        print("Destructor called for AIAgent")
-        try:
-            self.cleanup()
-        except Exception as e:
-            pass
+    def reset(self):
+        """
+        Starts a new conversation (a reset), so that the agent and its (pooled) vendor client 
+        can be reused instead of creating a new agent. The usage telemetry is kept.
+        """
+        self.messages = []
+        self.last_result = None
+        self.candidates = []
+        self.candidates_prompt = None
+        logger.debug("Reset conversation of AIAgent")
 
 
     def cleanup(self):
         """Cleanup function to release ressources"""
         self.messages.clear()
-
-        # Force garbage collection
-        gc.collect()
-
         logger.debug("Cleanup completed for AIAgent")
 
 
@@ -77,6 +111,8 @@ class AIAgent:
         logger.debug("System prompt received: %s", prompt)
         self.messages.append( Prompt(Prompt.SYSTEM, prompt) )
         self.last_result = None
+        self.candidates = []
+        self.candidates_prompt = None
 
         # record telemetry
         self.total_iterations = 0
@@ -88,6 +124,9 @@ class AIAgent:
         """Store the user prompt"""
         logger.debug("User prompt received: %s", prompt)
         self.messages.append( Prompt(Prompt.USER, prompt) )
+        # a new prompt discards the unused candidates of the previous one
+        self.candidates = []
+        self.candidates_prompt = None
 
         # record telemetry
         self.total_iterations = len(self.messages)
@@ -98,6 +137,73 @@ class AIAgent:
         # token usage telemetry has to be set by the implementation
         return prompt
 
+    async def system_async(self, prompt: str) -> str:
+        """Awaitable variant of system(), the system prompt is stored locally by default"""
+        return self.system(prompt)
+
+    async def ask_async(self, prompt: str) -> str:
+        """
+        Awaitable variant of ask().
+        Implementations with an async vendor client override this, 
+        the default runs the blocking ask() in a worker thread.
+        """
+        return await asyncio.to_thread(self.ask, prompt)
+
+    def ask_stream(self, prompt: str, stop_when=None):
+        """
+        Sends a prompt and yields the answer in chunks while it is generated.
+        Implementations with a streaming vendor API override this,
+        the default yields the complete answer of ask() as one chunk.
+        :param stop_when: optional predicate on the answer so far, 
+            the stream is cancelled as soon as it returns True
+        """
+        yield self.ask(prompt)
+
+    def ask_candidates(self, prompt: str, n: int, selector=None) -> str:
+        """
+        Sends a prompt for n candidate answers in one request. The answer is the candidate chosen by the selector,
+        the others are kept in candidates, so that a retry can take one with next_candidate() without a request.
+        :param selector: function returning the index of the chosen candidate (or None if no candidate fits),
+            by default the first candidate is chosen
+        """
+        logger.debug("Ask %d candidates: %s", n, prompt)
+        AIAgent.ask(self, self._truncate_prompt(prompt))
+        candidates = self._complete_candidates(n)
+        index = selector(candidates) if selector is not None else None
+        index = index if index is not None else 0
+        self.candidates = candidates[:index] + candidates[index+1:]
+        self.candidates_prompt = prompt
+        self.answer(candidates[index])
+        return self.last_result
+
+    def next_candidate(self, prompt: str, selector=None) -> str|None:
+        """
+        Answers the prompt with an unused candidate of the last ask_candidates() without a request,
+        returns None if the candidates answer another prompt or there is no (fitting) candidate left
+        """
+        if prompt != self.candidates_prompt:
+            return None
+        index = selector(self.candidates) if selector is not None else 0
+        if index is None or index >= len(self.candidates):
+            return None
+        candidate = self.candidates.pop(index)
+        self.reused_candidates += 1
+        self.advice(prompt, candidate)
+        return candidate
+
+    def feedback(self, succeeded: bool) -> None:
+        """
+        Feedback of the workflow on the last answer, e.g. the result of the following CHECK.
+        Implementations adapting to it override this (see AIAgentCascade), the default ignores it.
+        """
+
+    def set_validator(self, validator) -> None:
+        """
+        Sets the check of the next answers (answer -> bool), or None to accept every answer.
+        Implementations asking another model for a rejected answer override this (see AIAgentCascade),
+        the default ignores it.
+        """
+
     def advice(self, question: str, answer: str):
         """Store the advice interaction"""
         logger.debug("Advice interaction - Question: %s, Answer: %s", question, answer)
@@ -123,6 +229,291 @@ class AIAgent:
         self.total_iterations = len(self.messages)
 
 
+    def _truncate_prompt(self, prompt: str) -> str:
+        """Truncates the prompt in the middle if it has more tokens than AI_MAX_PROMPT_TOKENS"""
+        truncated = self.context_window.truncate(prompt)
+        if truncated != prompt:
+            logger.warning("Prompt has more than %d tokens (AI_MAX_PROMPT_TOKENS), so truncated in the middle:\n%s",
+                           self.context_window.max_prompt_tokens, truncated)
+        return truncated
+
+    def _fit_context(self) -> None:
+        """
+        Fits the messages into the context window of the model before they are sent,
+        raises a ValueError if the conversation would overflow
+        """
+        self.context_window.fit(self.messages, self.max_output_tokens)
+
+    def _complete(self, send) -> str:
+        """
+        Sends the current messages using the vendor specific send() function,
+        records the duration and stores the answer in messages
+        """
+        self._start_call()
+        try:
+            self._fit_context()
+            cache_key, result = self._lookup_cache()
+            if result is None:
+                result = self._send_rate_limited(send)
+                self._store_cache(cache_key, result)
+        except Exception as e:
+            self._finish_call(e)
+            raise
+        self._finish_call()
+        self.answer(result)
+        return self.last_result
+
+    def _complete_stream(self, send_stream, stop_when=None):
+        """
+        Same as _complete(), but iterates the chunks of the vendor specific send_stream() generator,
+        yields them and records the time-to-first-token and the generation speed.
+        The stream is closed early, when the stop_when predicate is fulfilled.
+        When the stream fails, the error is raised and the partial answer is not stored in messages.
+        """
+        call = self._start_call(streamed=True)
+        try:
+            self._fit_context()
+            cache_key, result = self._lookup_cache()
+        except Exception as e:
+            self._finish_call(e)
+            raise
+        if result is not None:
+            self._finish_call()
+            self.answer(result)
+            yield result
+            return
+
+        result = ""
+        chunk_count = 0
+        stopped = False
+        self.time_to_first_token_sec = None
+        self.tokens_per_sec = None
+        error = None
+        start_time = time.perf_counter()
+        first_chunk_time = None
+        stream = None
+        try:
+            self._record_queue_wait(self.rate_limiter.acquire(self._estimate_tokens()))
+            start_time = time.perf_counter()
+            stream = send_stream()
+            for chunk in stream:
+                if first_chunk_time is None:
+                    first_chunk_time = time.perf_counter()
+                    self.time_to_first_token_sec = first_chunk_time - start_time
+                    call.time_to_first_token_sec = self.time_to_first_token_sec
+                result += chunk
+                chunk_count += 1
+                yield chunk
+                if stop_when is not None and stop_when(result):
+                    logger.info("Stop condition reached after %d chunks, cancel the stream", chunk_count)
+                    stopped = True
+                    break
+            if not stopped:
+                # only complete answers are cached
+                self._store_cache(cache_key, result)
+            else:
+                call.finish_reason = "stop_when"
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if stream is not None:
+                stream.close()
+            end_time = time.perf_counter()
+            self._record_latency(end_time - start_time)
+            if first_chunk_time is not None and end_time > first_chunk_time:
+                # every streamed chunk is (approximately) one token
+                self.tokens_per_sec = chunk_count / (end_time - first_chunk_time)
+            logger.debug("Streamed %d chunks, time-to-first-token=%s sec, tokens/sec=%s",
+                         chunk_count, self.time_to_first_token_sec, self.tokens_per_sec)
+            self._finish_call(error)
+            if error is None:
+                # a complete answer, or cancelled by stop_when or the consumer of the stream
+                self.answer(result)
+
+    def _complete_candidates(self, n: int) -> list[str]:
+        """
+        Sends the current messages for n candidate answers using the vendor specific _send_candidates(),
+        the candidates are neither cached nor stored in messages
+        """
+        self._start_call()
+        try:
+            self._fit_context()
+            candidates = self._send_rate_limited(lambda: self._send_candidates(n))
+        except Exception as e:
+            self._finish_call(e)
+            raise
+        self._finish_call()
+        self.total_candidates += len(candidates)
+        return candidates
+
+    def _send(self) -> str:
+        """
+        Sends the current messages to the vendor and returns the answer (see _complete()).
+        Every implementation sending requests overrides this.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not send requests to a model")
+
+    def _send_candidates(self, n: int) -> list[str]:
+        """
+        Generates n candidate answers to the current messages.
+        Implementations with a native parameter override this, the default sends n requests in parallel.
+        """
+        with ThreadPoolExecutor(max_workers=n) as executor:
+            futures = [executor.submit(self._send) for _ in range(n)]
+            return [future.result() for future in futures]
+
+    async def _complete_async(self, send_async) -> str:
+        """Same as _complete(), but awaits the vendor specific send_async() coroutine function"""
+        self._start_call()
+        try:
+            self._fit_context()
+            cache_key, result = self._lookup_cache()
+            if result is None:
+                result = await self._send_rate_limited_async(send_async)
+                self._store_cache(cache_key, result)
+        except Exception as e:
+            self._finish_call(e)
+            raise
+        self._finish_call()
+        self.answer(result)
+        return self.last_result
+
+
+    def _send_rate_limited(self, send) -> str:
+        """
+        Calls send() within the budgets of the rate limiter and records the duration,
+        a request rejected with 429 (too many requests) is retried after a backoff
+        """
+        attempt = 0
+        while True:
+            self._record_queue_wait(self.rate_limiter.acquire(self._estimate_tokens()))
+            start_time = time.perf_counter()
+            try:
+                return send()
+            except Exception as e:
+                delay = self.rate_limiter.backoff(e, attempt)
+                if delay is None:
+                    raise
+                logger.warning("Rate limit of %s exceeded, retry %d in %.1f sec: %s",
+                               self.model_name, attempt + 1, delay, e)
+            finally:
+                self._record_latency(time.perf_counter() - start_time)
+            time.sleep(delay)
+            self._record_queue_wait(delay)
+            self._record_retry()
+            attempt += 1
+
+    async def _send_rate_limited_async(self, send_async) -> str:
+        """Same as _send_rate_limited(), but awaits the send_async() coroutine function"""
+        attempt = 0
+        while True:
+            self._record_queue_wait(await self.rate_limiter.acquire_async(self._estimate_tokens()))
+            start_time = time.perf_counter()
+            try:
+                return await send_async()
+            except Exception as e:
+                delay = self.rate_limiter.backoff(e, attempt)
+                if delay is None:
+                    raise
+                logger.warning("Rate limit of %s exceeded, retry %d in %.1f sec: %s",
+                               self.model_name, attempt + 1, delay, e)
+            finally:
+                self._record_latency(time.perf_counter() - start_time)
+            await asyncio.sleep(delay)
+            self._record_queue_wait(delay)
+            self._record_retry()
+            attempt += 1
+
+    def _start_call(self, streamed: bool = False) -> CallMetrics:
+        """Starts the metrics record of the next call"""
+        self._current_call = CallMetrics(self.PROVIDER, self.model_name, streamed)
+        return self._current_call
+
+    def _finish_call(self, error: Exception|None = None) -> None:
+        """Finishes the metrics record of the current call and adds it to the registry"""
+        call = self._current_call
+        if call is None:
+            return
+        self._current_call = None
+        if error is not None:
+            call.error = type(error).__name__
+        self.call_metrics.append(call)
+        self.metrics_registry.record(call)
+        logger.debug("Call metrics: %s", call.to_dict())
+
+    def _record_call_usage(self, prompt_tokens: int|None, completion_tokens: int|None,
+                           cached_prompt_tokens: int = 0) -> None:
+        """
+        Records the token usage of the current call as reported by the provider (summed up, if a call
+        consists of several requests, e.g. of candidates), the totals of the agent are accumulated over all calls
+        """
+        with self._usage_lock:
+            call = self._current_call
+            if call is not None:
+                if prompt_tokens is not None:
+                    call.prompt_tokens = (call.prompt_tokens or 0) + prompt_tokens
+                if completion_tokens is not None:
+                    call.completion_tokens = (call.completion_tokens or 0) + completion_tokens
+                call.cached_prompt_tokens += cached_prompt_tokens
+            self.total_prompt_tokens += prompt_tokens or 0
+            self.total_completion_tokens += completion_tokens or 0
+            self.total_tokens += (prompt_tokens or 0) + (completion_tokens or 0)
+            self.total_cached_prompt_tokens += cached_prompt_tokens
+
+    def _record_finish_reason(self, finish_reason: str|None) -> None:
+        """Records why the generation of the current call finished (e.g. stop, length)"""
+        if self._current_call is not None and finish_reason is not None:
+            self._current_call.finish_reason = str(finish_reason)
+
+    def _record_queue_wait(self, wait_sec: float) -> None:
+        """Records the time waited for the rate limiter (incl. the backoff)"""
+        self.total_queue_wait_sec += wait_sec
+        if self._current_call is not None:
+            self._current_call.queue_wait_sec += wait_sec
+
+    def _record_latency(self, duration_sec: float) -> None:
+        """Records the duration of a request sent to the provider"""
+        self.total_duration_sec += duration_sec
+        if self._current_call is not None:
+            self._current_call.latency_sec += duration_sec
+
+    def _record_retry(self) -> None:
+        """Records the retry of a request rejected with 429"""
+        self.total_retries += 1
+        if self._current_call is not None:
+            self._current_call.retries += 1
+
+    def latency_percentile(self, p: float) -> float|None:
+        """Returns the p-th percentile (0..100) of the latencies of the calls, which were not cached"""
+        return AgentMetrics.percentile([call.latency_sec for call in self.call_metrics if not call.cache_hit], p)
+
+    def _estimate_tokens(self) -> int:
+        """Estimates the tokens of the next request (prompt and maximal output) for the rate limiter"""
+        if self.rate_limiter.tpm <= 0:
+            return 0
+        return self.context_window.count_messages(self.messages) + (self.max_output_tokens or 0)
+
+
+    def _lookup_cache(self) -> tuple[str|None, str|None]:
+        """Looks up the answer to the current messages in the response cache (if enabled)"""
+        if self.response_cache is None or not self.use_cache:
+            return (None, None)
+        cache_key = ResponseCache.create_key(self)
+        result = self.response_cache.get(cache_key)
+        if result is None:
+            self.cache_misses += 1
+        else:
+            self.cache_hits += 1
+            if self._current_call is not None:
+                self._current_call.cache_hit = True
+            logger.debug("Answer found in response cache, key=%s", cache_key)
+        return (cache_key, result)
+
+    def _store_cache(self, cache_key: str|None, result: str) -> None:
+        if cache_key is not None and result is not None:
+            self.response_cache.put(cache_key, self.model_name, result)
+
 if __name__ == "__main__":
     main_agent = AIAgent(AIAgentConfig("gpt-5-nano")) # use "codellama/CodeLlama-7b-Instruct-hf" to test the transformers agent
 
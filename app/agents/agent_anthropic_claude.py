@@ -4,13 +4,11 @@ The AI-Agent implementation using the Claude models from Anthropic
 """
 import logging
 import os
-import time
 from dotenv import load_dotenv
-from anthropic import Anthropic
-from app.util.string_utils import trunc_middle
+from anthropic import Anthropic, AsyncAnthropic
 from app.agents.agent_config import AIAgentConfig
 from app.agents.agent import AIAgent
-from app.agents.prompt import Prompt
+from app.agents.client_pool import ClientPool
 
 
 load_dotenv()
@@ -28,13 +26,17 @@ logging.getLogger("anthropic").setLevel(log_level)
 class AIAgentAnthropicClaude(AIAgent):
     """Accesses the Anthropic Claude API and keeps track of the context"""
 
+    PROVIDER = "anthropic"
+
     def __init__(self, config):
         super().__init__(config)
         logger.info("Creating AIAgentAnthropicClaude with %s", config)
 
-        self.client = Anthropic(
+        # the clients (and their HTTP connections) are shared by all agents
+        self.client_key = ("anthropic", config.anthropic_api_key)
+        self.client = ClientPool.get_client(self.client_key, lambda: Anthropic(
             api_key=config.anthropic_api_key,
-        )
+        ))
 
 
     def system(self, prompt: str) -> str:
@@ -50,39 +52,88 @@ class AIAgentAnthropicClaude(AIAgent):
     def ask(self, prompt: str) -> str:
         """Sends a prompt to Claude, tracks message history and usage"""
         logger.debug("Ask AIAgentAnthropicClaude: %s", prompt)
-        if len(prompt) > self.max_prompt_length:
-            prompt = trunc_middle(prompt, self.max_prompt_length)
-            logger.warning("Prompt is longer than %d (AI_MAX_PROMPT_LENGTH), so truncated in the middle:\n%s",
-                           self.max_prompt_length, prompt)
-        super().ask(prompt)
-
+        super().ask(self._truncate_prompt(prompt))
+        return self._complete(self._send)
+
+    async def ask_async(self, prompt: str) -> str:
+        """Sends a prompt to Claude using the async client, tracks message history and usage"""
+        logger.debug("Ask AIAgentAnthropicClaude (async): %s", prompt)
+        super().ask(self._truncate_prompt(prompt))
+        return await self._complete_async(self._send_async)
+
+    def ask_stream(self, prompt: str, stop_when=None):
+        """Sends a prompt to Claude and yields the answer chunks while they are generated"""
+        logger.debug("Ask AIAgentAnthropicClaude (stream): %s", prompt)
+        super().ask(self._truncate_prompt(prompt))
+        yield from self._complete_stream(self._send_stream, stop_when)
+
+
+    @property
+    def async_client(self) -> AsyncAnthropic:
+        """The async Anthropic client of the running event loop"""
+        return ClientPool.get_async_client(self.client_key, lambda: AsyncAnthropic(
+            api_key=self.config.anthropic_api_key,
+        ))
+
+    def _message_args(self) -> dict:
+        """The request parameters for the messages API, the system prompt is passed separately"""
         system_prompt = self.messages[0].content if len(self.messages) > 0 else None
         claude_messages = [msg.to_dict() for msg in self.messages[1::]]
-
-        start_time = time.perf_counter()
-        response = self.client.messages.create(
-            model=self.model_name,  # e.g., "claude-3-7-sonnet-20250219",
-            max_tokens=self.max_output_tokens,
-            temperature=self.temperature,
-            system=system_prompt,
-            messages=claude_messages,
-        )
-        self.total_duration_sec += time.perf_counter() - start_time
-
+        if self.use_prompt_cache:
+            # cache breakpoints: the system prompt and the conversation up to the newest prompt,
+            # so that the next request (and every conversation with the same system prompt) reads them from the cache
+            if system_prompt is not None:
+                system_prompt = [{"type": "text", "text": system_prompt,
+                                  "cache_control": {"type": "ephemeral"}}]
+            if len(claude_messages) > 0:
+                claude_messages[-1]["content"] = [{"type": "text", "text": claude_messages[-1]["content"],
+                                                   "cache_control": {"type": "ephemeral"}}]
+        return {
+            "model": self.model_name,  # e.g., "claude-3-7-sonnet-20250219",
+            "max_tokens": self.max_output_tokens,
+            "temperature": self.temperature,
+            "system": system_prompt,
+            "messages": claude_messages,
+        }
+
+    def _send(self) -> str:
+        """Sends the current messages to the messages API"""
+        response = self.client.messages.create(**self._message_args())
+        return self._process_response(response)
+
+    async def _send_async(self) -> str:
+        """Sends the current messages to the messages API using the async client"""
+        response = await self.async_client.messages.create(**self._message_args())
+        return self._process_response(response)
+
+    def _send_stream(self):
+        """Streams the answer to the current messages, yields the text deltas"""
+        # leaving the context manager (also on early close) cancels the HTTP stream
+        with self.client.messages.stream(**self._message_args()) as stream:
+            yield from stream.text_stream
+            final_message = stream.get_final_message()
+            self._record_usage(final_message.usage)
+            self._record_finish_reason(final_message.stop_reason)
+
+    def _process_response(self, response) -> str:
+        """Extracts the answer and records the usage telemetry"""
         #print(response.content)
-        self.last_result = response.content[-1].text
-        self.messages.append(Prompt(Prompt.ASSISTANT, self.last_result))
-
-        self.total_iterations = len(self.messages)
-        self.total_completion_chars += len(self.last_result)
-        self.total_chars += len(self.last_result)
-        # Record telemetry (Anthropic does not return usage yet in public API)
-        self.total_prompt_tokens = None
-        self.total_completion_tokens = None
-        self.total_tokens = None
-
-        logger.debug("Anthropic Claude returned: %s", self.last_result)
-        return self.last_result
+        result = response.content[-1].text
+
+        self._record_usage(response.usage)
+        self._record_finish_reason(response.stop_reason)
+
+        logger.debug("Anthropic Claude returned: %s", result)
+        return result
+
+    def _record_usage(self, usage) -> None:
+        """Records the token usage telemetry, the input tokens are split into uncached and cached ones"""
+        cache_read_tokens = getattr(usage, "cache_read_input_tokens", None) or 0
+        cache_creation_tokens = getattr(usage, "cache_creation_input_tokens", None) or 0
+        prompt_tokens = usage.input_tokens + cache_read_tokens + cache_creation_tokens
+        self._record_call_usage(prompt_tokens, usage.output_tokens, cache_read_tokens)
+        logger.debug("Anthropic Claude usage: prompt_tokens=%d (cached=%d, cache_creation=%d), completion_tokens=%d",
+                     prompt_tokens, cache_read_tokens, cache_creation_tokens, usage.output_tokens)
 
 
 if __name__ == "__main__":
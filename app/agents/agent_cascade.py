@@ -0,0 +1,239 @@
+#!/bin/python
+"""
+The AI-Agent implementation routing through a cascade of models (cascade:<model>,<model>,...):
+the prompts are answered by the cheapest model, the next tier is asked only when the answer is rejected
+by the validator, or when the following CHECK of the workflow failed (see feedback()).
+"""
+import logging
+import os
+import threading
+import time
+from dotenv import load_dotenv
+from app.agents.agent import AIAgent
+from app.agents.agent_config import AIAgentConfig
+from app.agents.agent_factory import AIAgentFactory
+from app.agents.prompt import Prompt
+
+
+load_dotenv()
+
+# Setup logging framework
+if not logging.getLogger().hasHandlers():
+    logging.basicConfig(level=os.getenv('LOGLEVEL', 'INFO').upper(),
+                        format=os.getenv('LOGFORMAT', '%(message)s'))
+logger = logging.getLogger(__name__)
+
+
+class CascadeTier:
+    """One model of the cascade, with its agent (created on first use) and its statistics"""
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.agent : AIAgent|None = None
+        self.synced_messages = 0    # number of messages of the cascade the agent knows
+
+        self.calls = 0
+        self.rejected = 0           # by the validator or a failed CHECK
+        self.total_latency_sec = 0.0
+
+    @property
+    def hit_rate(self) -> float|None:
+        """Share of the answers which were not rejected"""
+        return (self.calls - self.rejected) / self.calls if self.calls > 0 else None
+
+    @property
+    def mean_latency_sec(self) -> float|None:
+        """Mean latency of the answers of the tier"""
+        return self.total_latency_sec / self.calls if self.calls > 0 else None
+
+
+# app/agents/AIAgentCascade.py
+class AIAgentCascade(AIAgent):
+    """Answers with the cheapest model of the cascade and escalates to the next tier on rejected answers"""
+
+    PROVIDER = "cascade"
+    PREFIX = "cascade:"
+
+    def __init__(self, config: AIAgentConfig):
+        super().__init__(config)
+        model_names = [name.strip() for name in self.model_name.removeprefix(self.PREFIX).split(",")]
+        if len(model_names) == 0 or "" in model_names:
+            raise ValueError(f"Invalid cascade of models: {self.model_name}")
+        logger.info("Creating %s of %s", type(self).__name__, model_names)
+        self.tiers = [CascadeTier(model_name) for model_name in model_names]
+        self.tier = 0               # the tier answering the next prompt
+        self._answered_by : int|None = None  # the tier of the last answer, until its feedback
+        # optional check of the answers (answer -> bool), a rejected answer is asked again of the next tier
+        self.validator = None
+        self.escalations = 0
+        self._tiers_lock = threading.Lock()   # the tiers may be asked concurrently (see AIAgentHedge)
+
+
+    def _tier_agent(self, tier: CascadeTier) -> AIAgent:
+        """Returns the agent of the tier, it is created on first use and gets the conversation so far"""
+        if tier.agent is None:
+            tier_config = AIAgentConfig(tier.model_name)
+            tier_config.__dict__.update({key: value for key, value in self.config.__dict__.items()
+                                         if key != "model_name"})
+            tier.agent = AIAgentFactory.create_agent(tier_config)
+        agent = tier.agent
+        agent.use_cache = self.use_cache
+        # the messages the agent does not know yet, the pending user prompt is asked afterwards
+        i = tier.synced_messages
+        end = len(self.messages) - 1
+        while i < end:
+            message = self.messages[i]
+            if message.role == Prompt.SYSTEM:
+                agent.reset()
+                agent.system(message.content)
+            elif message.role == Prompt.USER and i + 1 < end and self.messages[i + 1].role == Prompt.ASSISTANT:
+                agent.advice(message.content, self.messages[i + 1].content)
+                i += 1
+            elif message.role == Prompt.USER:
+                agent.advice(message.content, None)
+            else:
+                agent.advice(None, message.content)
+            i += 1
+        tier.synced_messages = len(self.messages) - 1
+        return agent
+
+
+    def reset(self):
+        """Starts a new conversation, also of the agents of the tiers"""
+        super().reset()
+        for tier in self.tiers:
+            if tier.agent is not None:
+                tier.agent.reset()
+            tier.synced_messages = 0
+        self.tier = 0
+        self._answered_by = None
+
+    def cleanup(self):
+        """Releases the resources of the agents of the tiers"""
+        super().cleanup()
+        for tier in self.tiers:
+            if tier.agent is not None:
+                tier.agent.cleanup()
+
+    def system(self, prompt: str) -> str:
+        """Starts a new conversation with the cheapest model"""
+        logger.debug("Init AIAgentCascade with system prompt: %s", prompt)
+        self.messages = []
+        for tier in self.tiers:
+            tier.synced_messages = 0
+        self.tier = 0
+        self._answered_by = None
+        return super().system(prompt)
+
+    def ask(self, prompt: str) -> str:
+        """Asks the current tier, the next tiers are asked as long as the validator rejects the answers"""
+        logger.debug("Ask AIAgentCascade (tier %d): %s", self.tier, prompt)
+        super().ask(prompt)
+        return self._ask_cascade(lambda agent: agent.ask(prompt))
+
+    def ask_candidates(self, prompt: str, n: int, selector=None) -> str:
+        """Same as ask(), the candidates are generated by the agent of the tier"""
+        logger.debug("Ask AIAgentCascade %d candidates (tier %d): %s", n, self.tier, prompt)
+        AIAgent.ask(self, prompt)
+        result = self._ask_cascade(lambda agent: agent.ask_candidates(prompt, n, selector))
+        self.candidates = list(self.tiers[self._answered_by].agent.candidates)
+        self.candidates_prompt = prompt
+        self.total_candidates += n
+        return result
+
+    def _ask_cascade(self, ask) -> str:
+        """Asks the current tier with ask(agent), the next tiers as long as the validator rejects the answers"""
+        while True:
+            result = self._ask_tier(self.tiers[self.tier], ask)
+            self._answered_by = self.tier
+            if self.validator is None or self.validator(result) or self.tier + 1 >= len(self.tiers):
+                break
+            logger.info("Answer of %s rejected by the validator, escalating", self.tiers[self.tier].model_name)
+            # the conversation of the tier is rebuilt with the accepted answer, when it is asked again
+            self.tiers[self.tier].rejected += 1
+            self.tiers[self.tier].synced_messages = 0
+            self._escalate()
+        self.answer(result)
+        return self.last_result
+
+    def _ask_tier(self, tier: CascadeTier, ask) -> str:
+        """Asks the agent of the tier and takes over its telemetry"""
+        with self._tiers_lock:
+            agent = self._tier_agent(tier)
+            tier.calls += 1
+        calls = len(agent.call_metrics)
+        start_time = time.perf_counter()
+        result = None
+        try:
+            result = ask(agent)
+        finally:
+            latency_sec = time.perf_counter() - start_time
+            with self._tiers_lock:
+                if tier.agent is agent:
+                    # not discarded in the meantime, after an error the conversation is rebuilt on the next use
+                    tier.synced_messages = len(self.messages) + 1 if result is not None else 0
+                    tier.total_latency_sec += latency_sec
+                self.total_duration_sec += latency_sec
+                for call in agent.call_metrics[calls:]:
+                    # the calls are recorded in the registry by the agent of the tier
+                    self.call_metrics.append(call)
+                    self.total_queue_wait_sec += call.queue_wait_sec
+                    self.total_retries += call.retries
+                    self.cache_hits += 1 if call.cache_hit else 0
+                    self._record_call_usage(call.prompt_tokens, call.completion_tokens, call.cached_prompt_tokens)
+        return result
+
+    def _escalate(self) -> None:
+        """The next prompts are answered by the next tier (if there is one)"""
+        if self.tier + 1 < len(self.tiers):
+            self.tier += 1
+            self.escalations += 1
+            logger.info("AIAgentCascade escalated to %s", self.tiers[self.tier].model_name)
+
+
+    def set_validator(self, validator) -> None:
+        """A rejected answer is asked again of the next tier"""
+        self.validator = validator
+
+
+    def feedback(self, succeeded: bool) -> None:
+        """
+        Feedback of the workflow on the last answer (the following CHECK):
+        on failure the retry is answered by the next tier, on success the cascade starts again with the cheapest model
+        """
+        if self._answered_by is None:
+            return
+        if succeeded:
+            self.tier = 0
+        else:
+            self.tiers[self._answered_by].rejected += 1
+            self._escalate()
+        self._answered_by = None
+
+
+    def tier_stats(self) -> list[dict]:
+        """Returns the calls, hit rate and mean latency per tier"""
+        return [{"model_name": tier.model_name, "calls": tier.calls, "rejected": tier.rejected,
+                 "hit_rate": tier.hit_rate, "mean_latency_sec": tier.mean_latency_sec} for tier in self.tiers]
+
+    @property
+    def latency_saving_sec(self) -> float|None:
+        """
+        Estimated latency saved by the cheaper tiers: the accepted answers of the cheaper tiers
+        compared to the mean latency of the last tier, None if the last tier was never asked
+        """
+        top_latency = self.tiers[-1].mean_latency_sec
+        if top_latency is None:
+            return None
+        return sum((tier.calls - tier.rejected) * (top_latency - tier.mean_latency_sec)
+                   for tier in self.tiers[:-1] if tier.calls > 0)
+
+
+if __name__ == "__main__":
+    main_agent = AIAgentCascade(AIAgentConfig("cascade:gpt-5-nano,gpt-5-mini"))
+    main_agent.system("You are a helpful assistant")
+    MAIN_PROMPT = "What is the answer to life, the universe and everything?"
+    print(f"User Prompt:\n{MAIN_PROMPT}")
+    result = main_agent.ask(MAIN_PROMPT)
+    print(f"\nOutput:\n{result}")
+    print(main_agent.tier_stats())
@@ -28,6 +28,10 @@ class AIAgentConfig:
         self.openai_organization_id = None
         self.google_client_secret_file = None
         self.anthropic_api_key = None
+        # Local Hugging Face Transformers models:
+        self.transformers_profile = None
+        self.transformers_threads = 0
+        self.transformers_draft_model = None
 
         self.load_from_environment()
 
@@ -42,6 +46,10 @@ class AIAgentConfig:
         self.google_client_secret_file = os.getenv('GOOGLE_CLIENT_SECRET_FILE', '')
         # Anthropic:
         self.anthropic_api_key = os.getenv('ANTHROPIC_API_KEY', '')
+        # Local Hugging Face Transformers models:
+        self.transformers_profile = os.getenv('AI_TRANSFORMERS_PROFILE', 'auto')
+        self.transformers_threads = int(os.getenv('AI_TRANSFORMERS_THREADS', '0'))
+        self.transformers_draft_model = os.getenv('AI_TRANSFORMERS_DRAFT_MODEL', '') or None
 
         logger.debug(self)
 
@@ -2,16 +2,14 @@
 """
 The factory class for creating AI-Agent instances
 """
+import importlib
 import logging
 import os
+import threading
 from dotenv import load_dotenv
 from app.agents.prompt_factory import PromptFactory
 from app.agents.agent_config import AIAgentConfig
 from app.agents.agent import AIAgent
-from app.agents.agent_openai_gpt import AIAgentOpenAIGpt
-from app.agents.agent_openai_instruct import AIAgentOpenAIInstruct
-from app.agents.agent_google_gemini import AIAgentGoogleGemini
-from app.agents.agent_anthropic_claude import AIAgentAnthropicClaude
 
 
 # Setup logging framework
@@ -28,39 +26,95 @@ class AIAgentFactory:
     The factory class for creating AI-Agent instances
     """
 
+    # Registry of the AI-Agent classes by model name prefix, the longest matching prefix wins.
+    # The classes are given as "module:class" and imported on first use, so that only the SDK
+    # of the used provider is loaded.
+    _providers : dict = {
+        # Platform OpenAI Reasoning Models:
+        "gpt-5": "app.agents.agent_openai_instruct:AIAgentOpenAIInstruct",
+        "o1": "app.agents.agent_openai_instruct:AIAgentOpenAIInstruct",
+        "o3": "app.agents.agent_openai_instruct:AIAgentOpenAIInstruct",
+        # Platform OpenAI GPT Chat Models:
+        "gpt-": "app.agents.agent_openai_gpt:AIAgentOpenAIGpt",
+        # Google Gemini API Models:
+        "gemini-": "app.agents.agent_google_gemini:AIAgentGoogleGemini",
+        # Anthropic Claude Models:
+        "claude-": "app.agents.agent_anthropic_claude:AIAgentAnthropicClaude",
+        # Record and replay of another model (replay:<model>), for offline benchmarks:
+        "replay:": "app.agents.agent_replay:AIAgentReplay",
+        # Cascade of models (cascade:<model>,<model>,...), escalating from the cheapest model:
+        "cascade:": "app.agents.agent_cascade:AIAgentCascade",
+        # Hedged requests (hedge:<primary model>,<secondary model>), with failover to the secondary model:
+        "hedge:": "app.agents.agent_hedge:AIAgentHedge",
+    }
+    # Models without a matching prefix are looked up on the Hugging Face Hub
+    _fallback_provider = "app.agents.agent_transformers:AIAgentTransformers"
+    _providers_lock = threading.Lock()
+
+
     @staticmethod
     def create_agent(config:AIAgentConfig|None = None) -> AIAgent:
         """
-        Creates an AI-Agent instance of type AIAgentOpenAI
+        Creates an AI-Agent instance of the provider registered for the model name
         """
         if config is None:
             model_name = AIAgentFactory.get_model_name()
             config = AIAgentConfig(model_name)
         model_name = config.model_name
 
-        # Platform OpenAI Reasoning Models:
-        if model_name.startswith("gpt-5"):
-            return AIAgentOpenAIInstruct(config)
-        elif model_name in ["o1","o3"] or model_name.startswith("o1-") or model_name.startswith("o3-"):
-            return AIAgentOpenAIInstruct(config)
-        # Platform OpenAI GPT Chat Models:
-        elif model_name.startswith("gpt-"):
-            return AIAgentOpenAIGpt(config)
-        # Google Gemini API Models:
-        elif model_name.startswith("gemini-"):
-            return AIAgentGoogleGemini(config)
-        # Anthropic Claude Models:
-        elif model_name.startswith("claude-"):
-            return AIAgentAnthropicClaude(config)
-        else:
-            from app.agents.agent_transformers import AIAgentTransformers
-            # Code Llama Models:
-            if AIAgentTransformers.is_model_supported(model_name):
-                return AIAgentTransformers(config)
+        agent_class = AIAgentFactory.get_agent_class(model_name)
+        if agent_class is not None:
+            return agent_class(config)
+
+        # Hugging Face Transformers Models (e.g. Code Llama):
+        agent_class = AIAgentFactory._resolve(AIAgentFactory._fallback_provider)
+        if agent_class.is_model_supported(model_name):
+            return agent_class(config)
 
         raise ValueError(f"Unsupported model name: {model_name}")
 
 
+    @staticmethod
+    def register_provider(prefix: str, agent_class: type|str):
+        """
+        Registers an AI-Agent class for the models starting with prefix, e.g. for a third-party provider
+        :param agent_class: the AIAgent subclass, or "module:class" to import it on first use
+        """
+        with AIAgentFactory._providers_lock:
+            AIAgentFactory._providers[prefix] = agent_class
+
+    @staticmethod
+    def unregister_provider(prefix: str) -> None:
+        """Removes the AI-Agent class registered for the prefix (if any), e.g. a provider of a test"""
+        with AIAgentFactory._providers_lock:
+            AIAgentFactory._providers.pop(prefix, None)
+
+
+    @staticmethod
+    def get_agent_class(model_name: str) -> type|None:
+        """Returns the AI-Agent class registered for the model name, or None if no prefix matches"""
+        with AIAgentFactory._providers_lock:
+            best_prefix = None
+            for prefix in AIAgentFactory._providers:
+                if model_name.startswith(prefix) and (best_prefix is None or len(prefix) > len(best_prefix)):
+                    best_prefix = prefix
+            if best_prefix is None:
+                return None
+            agent_class = AIAgentFactory._resolve(AIAgentFactory._providers[best_prefix])
+            AIAgentFactory._providers[best_prefix] = agent_class
+            return agent_class
+
+
+    @staticmethod
+    def _resolve(agent_class: type|str) -> type:
+        """Returns the AI-Agent class, it is imported if given by name (module:class)"""
+        if not isinstance(agent_class, str):
+            return agent_class
+        module_name, class_name = agent_class.split(":")
+        logger.debug("Importing AI-Agent class %s from %s", class_name, module_name)
+        return getattr(importlib.import_module(module_name), class_name)
+
+
     @staticmethod
     def get_model_name() -> str:
         """
@@ -1,16 +1,15 @@
 #!/bin/python
 """
-The AI-Agent implementation using the Platform OpenAI GPT models (gpt-)
+The AI-Agent implementation using the Google Gemini models (gemini-)
 """
 import logging
 import os
-import time
+import threading
 from dotenv import load_dotenv
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 import google.generativeai as genai
 from google.auth.transport.requests import Request
-from app.util.string_utils import trunc_middle
 from app.agents.agent_config import AIAgentConfig
 from app.agents.agent import AIAgent
 from app.agents.prompt import Prompt
@@ -35,19 +34,45 @@ GEMINI_SCOPES = ["https://www.googleapis.com/auth/generative-language.tuning"]
 class AIAgentGoogleGemini(AIAgent):
     """Accesses Google's Gemini API using OAuth2 credentials, maintains conversation context."""
 
+    PROVIDER = "google"
+
+    # The OAuth2 credentials are loaded once per process and client secret file, shared by all agents
+    _credentials : dict = {}
+    _configured_credentials = None  # the credentials genai is configured with
+    _credentials_lock = threading.Lock()
+
     def __init__(self, config):
         super().__init__(config)
         logger.info("Creating AIAgentGoogleGemini with OAuth2 config: %s", config)
 
-        # Load OAuth2 credentials
-        self.credentials = self.load_credentials(config.google_client_secret_file)
-
-        genai.configure(credentials=self.credentials)
+        self.credentials = AIAgentGoogleGemini.get_credentials(config.google_client_secret_file)
         self.model = genai.GenerativeModel(self.model_name)
         self.chat_session = self.model.start_chat(history=[])
-
-
-    def load_credentials(self, client_secret_path: str):
+        self._session_outdated = False  # the messages were changed without the chat session
+
+
+    @staticmethod
+    def get_credentials(client_secret_path: str):
+        """
+        Returns the OAuth2 credentials of the client secret file, they are loaded on first use
+        and refreshed when expired (not on every agent construction)
+        """
+        with AIAgentGoogleGemini._credentials_lock:
+            creds = AIAgentGoogleGemini._credentials.get(client_secret_path)
+            if creds is None:
+                creds = AIAgentGoogleGemini.load_credentials(client_secret_path)
+                AIAgentGoogleGemini._credentials[client_secret_path] = creds
+            elif not creds.valid and creds.refresh_token:
+                logger.debug("Refreshing the expired Google OAuth2 credentials")
+                creds.refresh(Request())
+                AIAgentGoogleGemini._store_token(client_secret_path, creds)
+            if AIAgentGoogleGemini._configured_credentials is not creds:
+                genai.configure(credentials=creds)
+                AIAgentGoogleGemini._configured_credentials = creds
+            return creds
+
+    @staticmethod
+    def load_credentials(client_secret_path: str):
         """Loads OAuth 2.0 credentials from the client_secret.json file."""
         #client_secret_path = os.path.abspath(client_secret_path)
         logger.debug("Loading Google OAuth2 credentials from: %s", client_secret_path)
@@ -65,60 +90,134 @@ class AIAgentGoogleGemini(AIAgent):
                     client_secret_path, GEMINI_SCOPES
                 )
                 creds = flow.run_local_server(port=0)
-            with open(token_path, "w", encoding="utf-8") as token_file:
-                token_file.write(creds.to_json())
+            AIAgentGoogleGemini._store_token(client_secret_path, creds)
 
         logger.info("Google OAuth2 credentials loaded successfully.")
-        logger.debug("Stored OAuth2 token in: %s", token_path)
         return creds
 
+    @staticmethod
+    def _store_token(client_secret_path: str, creds) -> None:
+        """Stores the (refreshed) OAuth2 token next to the client_secret.json file"""
+        token_path = client_secret_path.replace(".json", "_token.json")
+        with open(token_path, "w", encoding="utf-8") as token_file:
+            token_file.write(creds.to_json())
+        logger.debug("Stored OAuth2 token in: %s", token_path)
+
+
+    def reset(self):
+        """Starts a new conversation with a new chat session"""
+        super().reset()
+        self.model = genai.GenerativeModel(self.model_name)
+        self.chat_session = self.model.start_chat(history=[])
+        self._session_outdated = False
+
 
     def system(self, prompt: str) -> str:
-        """Starts a new chat with a simulated system message."""
+        """Starts a new chat with the prompt as system instruction (sent with the first request)"""
         logger.debug("Init AIAgentGoogleGemini with system prompt: %s", prompt)
         self.messages = []
+        self.model = genai.GenerativeModel(self.model_name, system_instruction=prompt)
         self.chat_session = self.model.start_chat(history=[])
-        self.chat_session.send_message(prompt)
+        self._session_outdated = False
         return super().system(prompt)
 
 
+    def advice(self, question: str, answer: str):
+        """Store the advice interaction, the chat session is rebuilt before the next request"""
+        super().advice(question, answer)
+        self._session_outdated = True
+
     def ask(self, prompt: str) -> str:
         """Sends a prompt to Gemini and processes the assistant's response."""
         logger.debug("Ask AIAgentGoogleGemini: %s", prompt)
-        if len(prompt) > self.max_prompt_length:
-            prompt = trunc_middle(prompt, self.max_prompt_length)
-            logger.warning("Prompt is longer than %d (AI_MAX_PROMPT_LENGTH), so truncated in the middle:\n%s",
-                           self.max_prompt_length, prompt)
-
-
-        super().ask(prompt)
-
-        start_time = time.perf_counter()
+        super().ask(self._truncate_prompt(prompt))
+        return self._complete(self._send)
+
+    async def ask_async(self, prompt: str) -> str:
+        """Sends a prompt to Gemini using the async API and processes the assistant's response."""
+        logger.debug("Ask AIAgentGoogleGemini (async): %s", prompt)
+        super().ask(self._truncate_prompt(prompt))
+        return await self._complete_async(self._send_async)
+
+
+    def _fit_context(self) -> None:
+        """Fits the messages into the context window, the chat session is rebuilt if turns were dropped"""
+        changes = self.context_window.evicted_messages + self.context_window.summarized_messages
+        super()._fit_context()
+        if changes != self.context_window.evicted_messages + self.context_window.summarized_messages \
+                or self._session_outdated:
+            self.chat_session = self.model.start_chat(history=self._chat_history(self.messages[:-1]))
+            self._session_outdated = False
+
+    def _lookup_cache(self) -> tuple[str|None, str|None]:
+        """Looks up the answer in the response cache, the chat session is rebuilt after a cached answer"""
+        cache_key, result = super()._lookup_cache()
+        if result is not None:
+            # the cached turn is only in the messages, not in the history of the chat session
+            self._session_outdated = True
+        return (cache_key, result)
+
+    @staticmethod
+    def _chat_history(messages: list) -> list:
+        """The messages as Gemini contents, the system prompt is the system instruction of the model"""
+        return [{"role": "model" if msg.role == Prompt.ASSISTANT else "user", "parts": [msg.content]}
+                for msg in messages if msg.role != Prompt.SYSTEM]
+
+    def _generation_config(self) -> dict:
+        """The generation parameters for the Gemini request"""
+        return {
+            "temperature": self.temperature,
+            "top_p": self.top_p,
+            "top_k": 1, # TODO - add top_k to config
+            "max_output_tokens": self.max_output_tokens,
+            "stop_sequences": self.stop_sequences,
+        }
+
+    def _send(self) -> str:
+        """Sends the latest user prompt to the chat session, which keeps the history itself"""
         response = self.chat_session.send_message(
-            prompt,
-            generation_config={
-                "temperature": self.temperature,
-                "top_p": self.top_p,
-                "top_k": 1, # TODO - add top_k to config
-                "max_output_tokens": self.max_output_tokens,
-                "stop_sequences": self.stop_sequences,
-            }
+            self.messages[-1].content,
+            generation_config=self._generation_config()
         )
-        self.total_duration_sec += time.perf_counter() - start_time
-
-        self.last_result = response.text
-        self.messages.append(Prompt(Prompt.ASSISTANT, self.last_result))
+        return self._process_response(response)
 
-        self.total_iterations = len(self.messages)
-        self.total_completion_chars += len(self.last_result)
-        self.total_chars += len(self.last_result)
-        # Token usage is not reported in Gemini API (as of now)
-        self.total_prompt_tokens = None
-        self.total_completion_tokens = None
-        self.total_tokens = None
-
-        logger.debug("Gemini returned: %s", self.last_result)
-        return self.last_result
+    async def _send_async(self) -> str:
+        """Sends the latest user prompt to the chat session using the async API"""
+        response = await self.chat_session.send_message_async(
+            self.messages[-1].content,
+            generation_config=self._generation_config()
+        )
+        return self._process_response(response)
+
+    def _send_candidates(self, n: int) -> list[str]:
+        """
+        Generates the candidate answers in one request (the chat session does not support candidates),
+        the chat session is rebuilt with the chosen answer before the next request
+        """
+        generation_config = self._generation_config()
+        generation_config["candidate_count"] = n
+        response = self.model.generate_content(self._chat_history(self.messages),
+                                               generation_config=generation_config)
+        self._session_outdated = True
+        self._record_response_usage(response)
+        return ["".join(part.text for part in candidate.content.parts) for candidate in response.candidates]
+
+    def _process_response(self, response) -> str:
+        """Extracts the answer and records the usage telemetry"""
+        result = response.text
+        self._record_response_usage(response)
+        logger.debug("Gemini returned: %s", result)
+        return result
+
+    def _record_response_usage(self, response) -> None:
+        """Records the usage metadata and the finish reason of the response"""
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            self._record_call_usage(usage.prompt_token_count, usage.candidates_token_count,
+                                    getattr(usage, "cached_content_token_count", None) or 0)
+        if len(response.candidates) > 0:
+            finish_reason = response.candidates[0].finish_reason
+            self._record_finish_reason(getattr(finish_reason, "name", finish_reason))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,152 @@
+#!/bin/python
+"""
+The AI-Agent implementation hedging the requests (hedge:<primary model>,<secondary model>):
+when the primary model did not answer within the hedge delay (e.g. its observed p95 latency),
+the same prompt is sent to the secondary model and the first answer is taken.
+When the primary model fails, the prompt fails over to the secondary model directly.
+"""
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dotenv import load_dotenv
+from app.agents.agent_cascade import AIAgentCascade, CascadeTier
+from app.agents.agent_config import AIAgentConfig
+from app.agents.agent_metrics import AgentMetrics
+
+
+load_dotenv()
+
+# Setup logging framework
+if not logging.getLogger().hasHandlers():
+    logging.basicConfig(level=os.getenv('LOGLEVEL', 'INFO').upper(),
+                        format=os.getenv('LOGFORMAT', '%(message)s'))
+logger = logging.getLogger(__name__)
+
+
+# app/agents/AIAgentHedge.py
+class AIAgentHedge(AIAgentCascade):
+    """
+    Sends a duplicate request to the secondary model when the primary model is slow or fails.
+    The conversation is kept in sync with both models like in the cascade, the agent of the losing model
+    is discarded (a blocking vendor call can not be interrupted) and rebuilt with the conversation on its next use.
+    """
+
+    PROVIDER = "hedge"
+    PREFIX = "hedge:"
+
+    PERCENTILE = "p"                # hedge delay as percentile of the primary latencies, e.g. p95
+    MIN_SAMPLES = 5                 # latencies needed for the percentile, the default delay is taken before
+    DEFAULT_DELAY_SEC = 10.0
+
+    def __init__(self, config: AIAgentConfig):
+        super().__init__(config)
+        if len(self.tiers) != 2:
+            raise ValueError(f"Hedging needs a primary and a secondary model: {self.model_name}")
+        self.delay = os.getenv('AI_HEDGE_DELAY', 'p95').strip().lower()
+        self.primary_latencies = []     # incl. the time until an abandoned primary request was hedged
+
+        self.requests = 0
+        self.hedged = 0                 # duplicate requests after the hedge delay
+        self.hedge_wins = 0             # ... answered first by the secondary model
+        self.failovers = 0              # requests failed over after an error of the primary model
+
+
+    def hedge_delay(self) -> float:
+        """Returns the delay in seconds after which the secondary model is asked too"""
+        if not self.delay.startswith(AIAgentHedge.PERCENTILE):
+            return float(self.delay)
+        if len(self.primary_latencies) < AIAgentHedge.MIN_SAMPLES:
+            return AIAgentHedge.DEFAULT_DELAY_SEC
+        return AgentMetrics.percentile(self.primary_latencies, float(self.delay[len(AIAgentHedge.PERCENTILE):]))
+
+
+    def _ask_cascade(self, ask) -> str:
+        """Asks the primary model with ask(agent), hedges or fails over to the secondary model, takes the first answer"""
+        self.requests += 1
+        delay = self.hedge_delay()
+        start_time = time.perf_counter()
+        executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="AIAgentHedge")
+        try:
+            futures = {executor.submit(self._ask_tier, self.tiers[0], ask): 0}
+            pending = set(futures)
+            winner = None
+            error = None
+            failed_over = False
+            while winner is None:
+                hedging = len(futures) > 1
+                done, pending = wait(pending, timeout=None if hedging else delay, return_when=FIRST_COMPLETED)
+                if len(done) == 0:
+                    logger.info("No answer of %s after %.2f sec, hedging with %s",
+                                self.tiers[0].model_name, delay, self.tiers[1].model_name)
+                    self.hedged += 1
+                    future = executor.submit(self._ask_tier, self.tiers[1], ask)
+                    futures[future] = 1
+                    pending.add(future)
+                    continue
+                for future in done:
+                    if future.exception() is None:
+                        winner = future
+                        break
+                    error = future.exception()
+                    logger.warning("Request to %s failed: %s", self.tiers[futures[future]].model_name, error)
+                    self._discard(self.tiers[futures[future]])
+                    if not hedging:
+                        logger.info("Failing over to %s", self.tiers[1].model_name)
+                        self.failovers += 1
+                        failed_over = True
+                        future = executor.submit(self._ask_tier, self.tiers[1], ask)
+                        futures[future] = 1
+                        pending.add(future)
+                if winner is None and len(pending) == 0:
+                    raise error
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        self._answered_by = futures[winner]
+        if self._answered_by == 0:
+            self.primary_latencies.append(time.perf_counter() - start_time)
+        elif not failed_over:
+            self.hedge_wins += 1
+        for future, i in futures.items():
+            if future is winner or (future.done() and future.exception() is not None):
+                continue
+            # the losing request is abandoned, its answer (if any) does not belong to the conversation
+            if future in pending and i == 0:
+                self.primary_latencies.append(time.perf_counter() - start_time)
+            logger.debug("Abandoning the request to %s", self.tiers[i].model_name)
+            self._discard(self.tiers[i])
+        self.answer(winner.result())
+        return self.last_result
+
+    def feedback(self, succeeded: bool) -> None:
+        """The feedback of the workflow does not change the models (in contrast to the cascade)"""
+
+
+    @property
+    def hedge_rate(self) -> float|None:
+        """Share of the requests, which were hedged"""
+        return self.hedged / self.requests if self.requests > 0 else None
+
+    @property
+    def win_rate(self) -> float|None:
+        """Share of the hedged requests, which were answered first by the secondary model"""
+        return self.hedge_wins / self.hedged if self.hedged > 0 else None
+
+
+    def _discard(self, tier: CascadeTier) -> None:
+        """Discards the agent of the tier, it is created with the conversation on its next use"""
+        with self._tiers_lock:
+            tier.rejected += 1
+            tier.agent = None
+            tier.synced_messages = 0
+
+
+if __name__ == "__main__":
+    main_agent = AIAgentHedge(AIAgentConfig("hedge:gpt-5-nano,gemini-2.0-flash-lite"))
+    main_agent.system("You are a helpful assistant")
+    MAIN_PROMPT = "What is the answer to life, the universe and everything?"
+    print(f"User Prompt:\n{MAIN_PROMPT}")
+    result = main_agent.ask(MAIN_PROMPT)
+    print(f"\nOutput:\n{result}")
+    print(f"Hedge rate: {main_agent.hedge_rate}, win rate: {main_agent.win_rate}")
@@ -0,0 +1,235 @@
+#!/bin/python
+"""
+Per-call metrics of the AI-Agents, with cumulative counters and latency histograms
+in a process-wide registry, which can be exported (CSV, JSON) or scraped by the server
+"""
+import bisect
+import csv
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+# Setup logging framework
+if not logging.getLogger().hasHandlers():
+    logging.basicConfig(level=os.getenv('LOGLEVEL', 'INFO').upper(),
+                        format=os.getenv('LOGFORMAT', '%(message)s'))
+logger = logging.getLogger(__name__)
+
+
+class CallMetrics:
+    """The metrics of one call of an AI-Agent (one answer)"""
+
+    FIELDS = ["timestamp", "provider", "model_name", "latency_sec", "time_to_first_token_sec", "queue_wait_sec",
+              "prompt_tokens", "completion_tokens", "cached_prompt_tokens", "finish_reason", "retries",
+              "cache_hit", "streamed", "error"]
+
+    def __init__(self, provider: str, model_name: str, streamed: bool = False):
+        self.timestamp = time.time()
+        self.provider = provider
+        self.model_name = model_name
+        self.latency_sec = 0.0      # sending until the complete answer, incl. retries
+        self.time_to_first_token_sec : float|None = None   # only of streamed answers
+        self.queue_wait_sec = 0.0   # waiting for the rate limiter
+        self.prompt_tokens : int|None = None    # None if not reported by the provider
+        self.completion_tokens : int|None = None
+        self.cached_prompt_tokens = 0
+        self.finish_reason : str|None = None
+        self.retries = 0
+        self.cache_hit = False      # answered by the response cache
+        self.streamed = streamed
+        self.error : str|None = None
+
+    def to_dict(self) -> dict:
+        """Returns the metrics as dictionary (in the order of FIELDS)"""
+        return {field: getattr(self, field) for field in CallMetrics.FIELDS}
+
+
+class Histogram:
+    """
+    Histogram with fixed (upper bound) buckets, the percentiles are interpolated within the buckets,
+    so that the memory stays constant for any number of observations
+    """
+
+    # Bucket bounds of the latencies in seconds
+    LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0]
+
+    def __init__(self, buckets: list|None = None):
+        self.buckets = buckets if buckets is not None else Histogram.LATENCY_BUCKETS
+        self.counts = [0] * (len(self.buckets) + 1)  # the last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        """Adds the value to its bucket"""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def percentile(self, p: float) -> float|None:
+        """Returns the estimated p-th percentile (0..100), or None without observations"""
+        if self.count == 0:
+            return None
+        rank = p / 100 * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count > 0 and cumulative + bucket_count >= rank:
+                lower = self.buckets[i-1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                return min(lower + (upper - lower) * (rank - cumulative) / bucket_count, self.max)
+            cumulative += bucket_count
+        return self.max
+
+    def to_dict(self) -> dict:
+        """Returns the count, sum, max and the p50/p90/p99 percentiles"""
+        return {"count": self.count, "sum": self.sum, "max": self.max,
+                "p50": self.percentile(50), "p90": self.percentile(90), "p99": self.percentile(99)}
+
+
+class AgentMetrics:
+    """
+    Registry of the call metrics of all agents in the process:
+    keeps the latest records (AI_METRICS_MAX_RECORDS) and cumulative counters and histograms per provider and model
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    COUNTERS = ["calls", "errors", "retries", "cache_hits", "prompt_tokens", "completion_tokens",
+                "cached_prompt_tokens"]
+
+
+    def __init__(self, max_records: int = 10000):
+        self._lock = threading.Lock()
+        self.records : deque = deque(maxlen=max_records)
+        self.counters : dict = {}   # (provider, model_name) -> {counter: value}
+        self.latency : dict = {}    # (provider, model_name) -> Histogram
+        self.time_to_first_token : dict = {}
+
+
+    @staticmethod
+    def get_instance() -> "AgentMetrics":
+        """Returns the registry of the process"""
+        with AgentMetrics._instance_lock:
+            if AgentMetrics._instance is None:
+                AgentMetrics._instance = AgentMetrics(int(os.getenv('AI_METRICS_MAX_RECORDS', '10000')))
+            return AgentMetrics._instance
+
+
+    def record(self, metrics: CallMetrics):
+        """Adds the metrics of a call to the records, counters and histograms"""
+        key = (metrics.provider, metrics.model_name)
+        with self._lock:
+            self.records.append(metrics)
+            counters = self.counters.setdefault(key, dict.fromkeys(AgentMetrics.COUNTERS, 0))
+            counters["calls"] += 1
+            counters["errors"] += 1 if metrics.error is not None else 0
+            counters["retries"] += metrics.retries
+            counters["cache_hits"] += 1 if metrics.cache_hit else 0
+            counters["prompt_tokens"] += metrics.prompt_tokens or 0
+            counters["completion_tokens"] += metrics.completion_tokens or 0
+            counters["cached_prompt_tokens"] += metrics.cached_prompt_tokens or 0
+            if not metrics.cache_hit:
+                self.latency.setdefault(key, Histogram()).observe(metrics.latency_sec)
+            if metrics.time_to_first_token_sec is not None:
+                self.time_to_first_token.setdefault(key, Histogram()).observe(metrics.time_to_first_token_sec)
+
+
+    @staticmethod
+    def percentile(values: list, p: float) -> float|None:
+        """Returns the exact p-th percentile (0..100) of the values (linear interpolation), or None if empty"""
+        if len(values) == 0:
+            return None
+        values = sorted(values)
+        rank = (len(values) - 1) * p / 100
+        lower = int(rank)
+        upper = min(lower + 1, len(values) - 1)
+        return values[lower] + (values[upper] - values[lower]) * (rank - lower)
+
+
+    def reset(self):
+        """Clears all records, counters and histograms"""
+        with self._lock:
+            self.records.clear()
+            self.counters.clear()
+            self.latency.clear()
+            self.time_to_first_token.clear()
+
+
+    def summary(self) -> dict:
+        """Returns the counters and histograms per provider and model"""
+        with self._lock:
+            return {"models": [
+                {"provider": provider, "model_name": model_name, **counters,
+                 "latency_sec": self.latency[(provider, model_name)].to_dict()
+                    if (provider, model_name) in self.latency else None,
+                 "time_to_first_token_sec": self.time_to_first_token[(provider, model_name)].to_dict()
+                    if (provider, model_name) in self.time_to_first_token else None}
+                for (provider, model_name), counters in self.counters.items()]}
+
+
+    def to_prometheus(self) -> str:
+        """Returns the counters and histograms in the Prometheus text format"""
+        lines = []
+        with self._lock:
+            for counter in AgentMetrics.COUNTERS:
+                lines.append(f"# TYPE codementor_agent_{counter}_total counter")
+                for (provider, model_name), counters in self.counters.items():
+                    lines.append(f"codementor_agent_{counter}_total{{provider=\"{provider}\"," +\
+                                 f"model=\"{model_name}\"}} {counters[counter]}")
+            for name, histograms in [("latency_seconds", self.latency),
+                                     ("time_to_first_token_seconds", self.time_to_first_token)]:
+                lines.append(f"# TYPE codementor_agent_{name} histogram")
+                for (provider, model_name), histogram in histograms.items():
+                    labels = f"provider=\"{provider}\",model=\"{model_name}\""
+                    cumulative = 0
+                    for bound, bucket_count in zip(histogram.buckets + ["+Inf"], histogram.counts):
+                        cumulative += bucket_count
+                        lines.append(f"codementor_agent_{name}_bucket{{{labels},le=\"{bound}\"}} {cumulative}")
+                    lines.append(f"codementor_agent_{name}_sum{{{labels}}} {histogram.sum}")
+                    lines.append(f"codementor_agent_{name}_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+    def export_csv(self, csv_file: str):
+        """Appends the records to the CSV file (with a header if it is new)"""
+        with self._lock:
+            records = list(self.records)
+        AgentMetrics.write_csv(csv_file, records)
+
+    @staticmethod
+    def write_csv(csv_file: str, records: list):
+        """Appends the call metrics to the CSV file (with a header if it is new)"""
+        new_file = not os.path.exists(csv_file)
+        with open(csv_file, "a", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=CallMetrics.FIELDS, delimiter=";")
+            if new_file:
+                writer.writeheader()
+            for metrics in records:
+                writer.writerow(metrics.to_dict())
+
+
+    def export_json(self, json_file: str):
+        """Writes the summary and the records to the JSON file"""
+        summary = self.summary()
+        with self._lock:
+            summary["calls"] = [metrics.to_dict() for metrics in self.records]
+        with open(json_file, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=4)
+
+
+if __name__ == "__main__":
+    main_metrics = AgentMetrics()
+    for main_latency in [0.2, 0.4, 0.8, 1.5, 3.0]:
+        main_call = CallMetrics("generic", "gpt-5-nano")
+        main_call.latency_sec = main_latency
+        main_metrics.record(main_call)
+    print(json.dumps(main_metrics.summary(), indent=4))
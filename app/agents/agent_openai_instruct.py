@@ -4,12 +4,11 @@ The AI-Agent implementation using the Platform OpenAI Instruct Models (gpt-5, o1
 """
 import logging
 import os
-import time
 from dotenv import load_dotenv
-from openai import OpenAI
-from app.util.string_utils import trunc_middle
+from openai import OpenAI, AsyncOpenAI
 from app.agents.agent_config import AIAgentConfig
 from app.agents.agent import AIAgent
+from app.agents.client_pool import ClientPool
 from app.agents.prompt import Prompt
 
 
@@ -29,14 +28,18 @@ logging.getLogger("openai").setLevel(log_level)
 class AIAgentOpenAIInstruct(AIAgent):
     """Accesses the OpenAI API, will keep track of the context"""
 
+    PROVIDER = "openai"
+
     def __init__(self, config):
         super().__init__(config)
         logger.info("Creating AIAgentOpenAI with %s", config)
 
-        self.client = OpenAI(
+        # the clients (and their HTTP connections) are shared by all agents
+        self.client_key = ("openai", config.openai_api_key, config.openai_organization_id)
+        self.client = ClientPool.get_client(self.client_key, lambda: OpenAI(
             api_key=config.openai_api_key,
             organization= config.openai_organization_id
-        )
+        ))
 
 
     def system(self, prompt: str) -> str:
@@ -51,45 +54,92 @@ class AIAgentOpenAIInstruct(AIAgent):
     def ask(self, prompt: str) -> str:
         """Sends a prompt to ChatGPT, will track the result in messages"""
         logger.debug("Ask AIAgentOpenAI: %s", prompt)
-        if len(prompt) > self.max_prompt_length:
-            prompt = trunc_middle(prompt, self.max_prompt_length)
-            logger.warning("Prompt is longer than %d (AI_MAX_PROMPT_LENGTH), so truncated in the middle:\n%s",
-                           self.max_prompt_length, prompt)
-        super().ask(prompt)
-
-        messages = [msg.to_dict() for msg in self.messages]
-
-        start_time = time.perf_counter()
-        chat_completion = self.client.chat.completions.create(
-            messages=messages,
-            model=self.model_name,
-            #temperature=self.temperature  # not supported on instruct models!
-            top_p=self.top_p,
-            frequency_penalty=self.frequency_penalty,
-            presence_penalty=self.presence_penalty,
-            max_completion_tokens=self.max_output_tokens,
-            stop=self.stop_sequences
-        )
-        self.total_duration_sec += time.perf_counter() - start_time
-
-        self.last_result = ""
+        super().ask(self._truncate_prompt(prompt))
+        return self._complete(self._send)
+
+    async def ask_async(self, prompt: str) -> str:
+        """Sends a prompt to ChatGPT using the async client, will track the result in messages"""
+        logger.debug("Ask AIAgentOpenAI (async): %s", prompt)
+        super().ask(self._truncate_prompt(prompt))
+        return await self._complete_async(self._send_async)
+
+    def ask_stream(self, prompt: str, stop_when=None):
+        """Sends a prompt to ChatGPT and yields the answer chunks while they are generated"""
+        logger.debug("Ask AIAgentOpenAI (stream): %s", prompt)
+        super().ask(self._truncate_prompt(prompt))
+        yield from self._complete_stream(self._send_stream, stop_when)
+
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        """The async OpenAI client of the running event loop"""
+        return ClientPool.get_async_client(self.client_key, lambda: AsyncOpenAI(
+            api_key=self.config.openai_api_key,
+            organization= self.config.openai_organization_id
+        ))
+
+    def _completion_args(self) -> dict:
+        """The request parameters for the chat completion of the current messages"""
+        return {
+            "messages": [msg.to_dict() for msg in self.messages],
+            "model": self.model_name,
+            #"temperature": self.temperature  # not supported on instruct models!
+            "top_p": self.top_p,
+            "frequency_penalty": self.frequency_penalty,
+            "presence_penalty": self.presence_penalty,
+            "max_completion_tokens": self.max_output_tokens,
+            "stop": self.stop_sequences
+        }
+
+    def _send(self) -> str:
+        """Sends the current messages to the chat completions API"""
+        chat_completion = self.client.chat.completions.create(**self._completion_args())
+        return self._process_completion(chat_completion)
+
+    async def _send_async(self) -> str:
+        """Sends the current messages to the chat completions API using the async client"""
+        chat_completion = await self.async_client.chat.completions.create(**self._completion_args())
+        return self._process_completion(chat_completion)
+
+    def _send_stream(self):
+        """Streams the chat completion of the current messages, yields the content deltas"""
+        stream = self.client.chat.completions.create(**self._completion_args(),
+            stream=True, stream_options={"include_usage": True})
+        try:
+            for chunk in stream:
+                for choice in chunk.choices:
+                    if choice.delta.content:
+                        yield choice.delta.content
+                    if choice.finish_reason is not None:
+                        self._record_finish_reason(choice.finish_reason)
+                        if choice.finish_reason != "stop":
+                            logger.warning("OpenAI Instruct model did not finish because of 'stop', but '%s'",
+                                           choice.finish_reason)
+                if chunk.usage is not None:
+                    # record telemetry (sent with the last chunk)
+                    self._record_usage(chunk.usage)
+        finally:
+            stream.close()
+
+    def _process_completion(self, chat_completion) -> str:
+        """Extracts the answer and records the token usage telemetry"""
+        result = ""
         for choice in chat_completion.choices:
-            self.last_result += choice.message.content + "\n"
+            result += choice.message.content + "\n"
+            self._record_finish_reason(choice.finish_reason)
             if choice.finish_reason != "stop":
                 logger.warning("OpenAI Instruct model did not finish because of 'stop', but '%s'",
                                choice.finish_reason)
-        self.messages.append( Prompt(Prompt.ASSISTANT, self.last_result) )
-        # record telemetry
-        self.total_iterations = len(self.messages)
-        self.total_completion_chars += len(self.last_result)
-        self.total_chars += len(self.last_result)
-        usage = chat_completion.usage
-        self.total_prompt_tokens = usage.prompt_tokens
-        self.total_completion_tokens = usage.completion_tokens
-        self.total_tokens = usage.total_tokens
-
-        logger.debug("OpenAI returned: %s", self.last_result)
-        return self.last_result
+        self._record_usage(chat_completion.usage)
+
+        logger.debug("OpenAI returned: %s", result)
+        return result
+
+    def _record_usage(self, usage) -> None:
+        """Records the token usage telemetry, including the prompt tokens read from the prompt cache"""
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = (getattr(details, "cached_tokens", None) or 0) if details is not None else 0
+        self._record_call_usage(usage.prompt_tokens, usage.completion_tokens, cached_tokens)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,328 @@
+#!/bin/python
+"""
+The AI-Agent implementation for record and replay (replay:<model>), so that workflows can be benchmarked
+offline and deterministically: in record mode the requests are sent by the wrapped agent of <model> and
+written to a transcript file, in replay mode the answers are served from the transcript file.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from dotenv import load_dotenv
+from app.agents.agent import AIAgent
+from app.agents.agent_config import AIAgentConfig
+from app.agents.agent_factory import AIAgentFactory
+from app.agents.context_window import ContextWindow
+from app.agents.rate_limiter import RateLimiter
+
+
+load_dotenv()
+
+# Setup logging framework
+if not logging.getLogger().hasHandlers():
+    logging.basicConfig(level=os.getenv('LOGLEVEL', 'INFO').upper(),
+                        format=os.getenv('LOGFORMAT', '%(message)s'))
+logger = logging.getLogger(__name__)
+
+
+class ReplayTranscript:
+    """
+    Transcript file (JSON Lines) of the recorded requests and answers, shared by all agents of the process.
+    Every recorded answer is replayed once, identical requests get their answers in the recorded order.
+    """
+
+    # One transcript instance per file
+    _instances : dict = {}
+    _instances_lock = threading.Lock()
+
+
+    def __init__(self, transcript_file: str, record: bool):
+        self.transcript_file = transcript_file
+        self.record = record
+        self._lock = threading.Lock()
+        self.entries : list = []
+        self._by_key : dict = {}    # key -> indexes of the entries
+        self._replayed : set = set()
+        self._next = 0              # the first entry not replayed yet
+
+        if record:
+            # a recording starts a new transcript
+            directory = os.path.dirname(os.path.abspath(transcript_file))
+            if not os.path.exists(directory):
+                os.makedirs(directory)
+            with open(transcript_file, "w", encoding="utf-8"):
+                pass
+            logger.info("Recording the AI-Agent requests to %s", transcript_file)
+        else:
+            with open(transcript_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    if len(line.strip()) > 0:
+                        self._add(json.loads(line))
+            logger.info("Replaying %d AI-Agent answers from %s", len(self.entries), transcript_file)
+
+
+    @staticmethod
+    def get_instance(transcript_file: str, record: bool) -> "ReplayTranscript":
+        """Returns the transcript of the file, it is opened (or created for recording) on first use"""
+        with ReplayTranscript._instances_lock:
+            if transcript_file not in ReplayTranscript._instances:
+                ReplayTranscript._instances[transcript_file] = ReplayTranscript(transcript_file, record)
+            return ReplayTranscript._instances[transcript_file]
+
+    @staticmethod
+    def close_all():
+        """Forgets all transcripts, so that they are opened again on next use"""
+        with ReplayTranscript._instances_lock:
+            ReplayTranscript._instances.clear()
+
+
+    @staticmethod
+    def create_key(messages: list) -> str:
+        """Creates the key of a request from its messages"""
+        messages_json = json.dumps([msg.to_dict() for msg in messages], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(messages_json.encode("utf-8")).hexdigest()
+
+
+    def append(self, entry: dict) -> None:
+        """Appends the recorded request and answer to the transcript file"""
+        with self._lock:
+            self._add(entry)
+            with open(self.transcript_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def _add(self, entry: dict) -> None:
+        self._by_key.setdefault(entry["key"], []).append(len(self.entries))
+        self.entries.append(entry)
+
+
+    def lookup(self, key: str, strict: bool) -> dict|None:
+        """
+        Returns the next recorded entry of the request, or None if not recorded.
+        If not strict, a request which was not recorded (e.g. because of a different command output)
+        gets the next entry in the recorded order.
+        """
+        with self._lock:
+            index = next((i for i in self._by_key.get(key, []) if i not in self._replayed), None)
+            if index is None and not strict:
+                while self._next < len(self.entries) and self._next in self._replayed:
+                    self._next += 1
+                if self._next < len(self.entries):
+                    index = self._next
+                    logger.warning("Request not found in the transcript %s, replaying the next answer #%d",
+                                   self.transcript_file, index)
+            if index is None:
+                return None
+            self._replayed.add(index)
+            return self.entries[index]
+
+
+# app/agents/AIAgentReplay.py
+class AIAgentReplay(AIAgent):
+    """Records the answers of the wrapped agent, or replays them from the transcript file"""
+
+    PROVIDER = "replay"
+    PREFIX = "replay:"
+
+    MODE_RECORD = "record"
+    MODE_REPLAY = "replay"
+
+    def __init__(self, config: AIAgentConfig):
+        super().__init__(config)
+        self.wrapped_model_name = self.model_name.removeprefix(AIAgentReplay.PREFIX)
+        self.mode = os.getenv('AI_REPLAY_MODE', AIAgentReplay.MODE_REPLAY).lower()
+        if self.mode not in [AIAgentReplay.MODE_RECORD, AIAgentReplay.MODE_REPLAY]:
+            raise ValueError(f"Unsupported AI_REPLAY_MODE: {self.mode}")
+        self.strict = os.getenv('AI_REPLAY_STRICT', 'FALSE').upper() == 'TRUE'
+        # the simulated latency of a replayed answer: 0, a fixed duration in seconds or "recorded"
+        self.latency = os.getenv('AI_REPLAY_LATENCY', '0')
+        transcript_file = os.getenv('AI_REPLAY_FILE', '') or os.path.join(
+            os.getenv('LOGFILES_DIR', './log'), "replay",
+            re.sub(r"[^A-Za-z0-9._-]", "_", self.wrapped_model_name) + ".jsonl")
+        logger.info("Creating AIAgentReplay (%s) of %s with %s", self.mode, self.wrapped_model_name, transcript_file)
+
+        # the answers are neither cached nor rate limited, the wrapped agent does both when recording
+        self.response_cache = None
+        self.rate_limiter = RateLimiter(0, 0, max_retries=0)
+        self.context_window = ContextWindow(self.wrapped_model_name, self.max_output_tokens)
+
+        self.wrapped : AIAgent|None = None
+        if self.mode == AIAgentReplay.MODE_RECORD:
+            wrapped_config = AIAgentConfig(self.wrapped_model_name)
+            wrapped_config.__dict__.update({key: value for key, value in config.__dict__.items()
+                                            if key != "model_name"})
+            self.wrapped = AIAgentFactory.create_agent(wrapped_config)
+        self._selector = None       # of the current ask_candidates(), the wrapped agent chooses the same answer
+        self.transcript = ReplayTranscript.get_instance(transcript_file, self.wrapped is not None)
+
+
+    def reset(self):
+        """Starts a new conversation, also of the wrapped agent"""
+        super().reset()
+        if self.wrapped is not None:
+            self.wrapped.reset()
+
+    def cleanup(self):
+        """Releases the resources, also of the wrapped agent"""
+        super().cleanup()
+        if self.wrapped is not None:
+            self.wrapped.cleanup()
+
+    def system(self, prompt: str) -> str:
+        """Starts with a new context (a reset), and provides the chat-systems general behavior"""
+        logger.debug("Init AIAgentReplay with system prompt: %s", prompt)
+        self.messages = []
+        if self.wrapped is not None:
+            self.wrapped.system(prompt)
+        return super().system(prompt)
+
+    def advice(self, question: str, answer: str):
+        """Store the advice interaction, also in the wrapped agent"""
+        if self.wrapped is not None:
+            self.wrapped.advice(question, answer)
+        super().advice(question, answer)
+
+    def ask(self, prompt: str) -> str:
+        """Sends the prompt to the wrapped agent or replays the recorded answer"""
+        logger.debug("Ask AIAgentReplay: %s", prompt)
+        super().ask(prompt)
+        return self._complete(self._send)
+
+    async def ask_async(self, prompt: str) -> str:
+        """Same as ask(), the simulated latency is awaited"""
+        logger.debug("Ask AIAgentReplay (async): %s", prompt)
+        super().ask(prompt)
+        return await self._complete_async(self._send_async)
+
+    def ask_candidates(self, prompt: str, n: int, selector=None) -> str:
+        """Same as AIAgent.ask_candidates(), the wrapped agent keeps the chosen candidate in its conversation"""
+        self._selector = selector
+        try:
+            return super().ask_candidates(prompt, n, selector)
+        finally:
+            self._selector = None
+
+    def ask_stream(self, prompt: str, stop_when=None):
+        """Streams the answer of the wrapped agent or the recorded answer"""
+        logger.debug("Ask AIAgentReplay (stream): %s", prompt)
+        super().ask(prompt)
+        yield from self._complete_stream(self._send_stream, stop_when)
+
+
+    def _send(self) -> str:
+        """Sends the prompt by the wrapped agent and records it, or replays the recorded answer"""
+        if self.wrapped is None:
+            entry = self._lookup()
+            time.sleep(self._latency_sec(entry))
+            return self._replay(entry)
+        start_time = time.perf_counter()
+        result = self.wrapped.ask(self.messages[-1].content)
+        return self._record(result, time.perf_counter() - start_time)
+
+    async def _send_async(self) -> str:
+        """Same as _send(), but awaits the wrapped agent and the simulated latency"""
+        if self.wrapped is None:
+            entry = self._lookup()
+            await asyncio.sleep(self._latency_sec(entry))
+            return self._replay(entry)
+        start_time = time.perf_counter()
+        result = await self.wrapped.ask_async(self.messages[-1].content)
+        return self._record(result, time.perf_counter() - start_time)
+
+    def _send_candidates(self, n: int) -> list[str]:
+        """Generates the candidates by the wrapped agent and records them, or replays the recorded candidates"""
+        if self.wrapped is None:
+            entry = self._lookup()
+            time.sleep(self._latency_sec(entry))
+            self._replay(entry)
+            return entry.get("candidates") or [entry["response"]]
+        start_time = time.perf_counter()
+        # the wrapped agent chooses the candidate with the selector, it is recorded at its original position
+        chosen = [0]
+        def select(candidates):
+            index = self._selector(candidates) if self._selector is not None else None
+            chosen[0] = index if index is not None else 0
+            return index
+        result = self.wrapped.ask_candidates(self.messages[-1].content, n, select)
+        candidates = list(self.wrapped.candidates)
+        candidates.insert(chosen[0], result)
+        self._record(result, time.perf_counter() - start_time, candidates)
+        return candidates
+
+    def _send_stream(self):
+        """Streams the answer of the wrapped agent and records it, or yields the recorded answer by lines"""
+        if self.wrapped is None:
+            entry = self._lookup()
+            time.sleep(self._latency_sec(entry))
+            result = self._replay(entry)
+            yield from (result or "").splitlines(keepends=True)
+            return
+        start_time = time.perf_counter()
+        result = ""
+        failed = False
+        stream = self.wrapped.ask_stream(self.messages[-1].content)
+        try:
+            for chunk in stream:
+                result += chunk
+                yield chunk
+        except Exception:
+            failed = True
+            raise
+        finally:
+            stream.close()
+            if not failed:
+                # a cancelled stream is recorded as far as it was generated
+                self._record(self.wrapped.last_result or result, time.perf_counter() - start_time)
+
+
+    def _lookup(self) -> dict:
+        """Returns the recorded entry of the current messages, raises a ValueError if not recorded"""
+        entry = self.transcript.lookup(ReplayTranscript.create_key(self.messages), self.strict)
+        if entry is None:
+            raise ValueError(f"No recorded answer of {self.wrapped_model_name} in {self.transcript.transcript_file}")
+        return entry
+
+    def _latency_sec(self, entry: dict) -> float:
+        """The simulated latency of the replayed answer"""
+        if self.latency.lower() == "recorded":
+            return entry.get("latency_sec", 0.0)
+        return float(self.latency)
+
+    def _replay(self, entry: dict) -> str:
+        """Records the telemetry of the recorded answer and returns it"""
+        self._record_call_usage(entry.get("prompt_tokens"), entry.get("completion_tokens"),
+                                entry.get("cached_prompt_tokens", 0))
+        self._record_finish_reason(entry.get("finish_reason"))
+        return entry["response"]
+
+    def _record(self, result: str, latency_sec: float, candidates: list|None = None) -> str:
+        """Writes the request and the answer of the wrapped agent (with its telemetry) to the transcript"""
+        wrapped_call = self.wrapped.call_metrics[-1] if len(self.wrapped.call_metrics) > 0 else None
+        entry = {
+            "key": ReplayTranscript.create_key(self.messages),
+            "model": self.wrapped_model_name,
+            "messages": [msg.to_dict() for msg in self.messages],
+            "response": result,
+            "latency_sec": latency_sec,
+            "prompt_tokens": wrapped_call.prompt_tokens if wrapped_call is not None else None,
+            "completion_tokens": wrapped_call.completion_tokens if wrapped_call is not None else None,
+            "cached_prompt_tokens": wrapped_call.cached_prompt_tokens if wrapped_call is not None else 0,
+            "finish_reason": wrapped_call.finish_reason if wrapped_call is not None else None,
+        }
+        if candidates is not None:
+            entry["candidates"] = candidates
+        self.transcript.append(entry)
+        return self._replay(entry)
+
+
+if __name__ == "__main__":
+    os.environ["AI_REPLAY_MODE"] = AIAgentReplay.MODE_RECORD
+    main_agent = AIAgentReplay(AIAgentConfig("replay:gpt-5-nano"))
+    main_agent.system("You are a helpful assistant")
+    MAIN_PROMPT = "What is the answer to life, the universe and everything?"
+    print(f"User Prompt:\n{MAIN_PROMPT}")
+    result = main_agent.ask(MAIN_PROMPT)
+    print(f"\nOutput:\n{result}")
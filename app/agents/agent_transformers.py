@@ -3,18 +3,21 @@
 The AI-Agent implementation using the CodeLLAMA model from Hugging Face Transformers.
 """
 import logging
-import time
 import os
 import gc
+import threading
+import time
+from collections import OrderedDict
 from dotenv import load_dotenv
-from transformers import AutoModelForCausalLM, AutoTokenizer, TextGenerationPipeline
+from transformers import AutoModelForCausalLM, AutoTokenizer, DynamicCache
 from transformers.utils import logging as hf_logging
 from huggingface_hub import HfApi
 import torch
 import psutil
-from app.util.string_utils import trunc_middle
 from app.agents.agent_config import AIAgentConfig
 from app.agents.agent import AIAgent
+from app.agents.context_window import ContextWindow
+from app.agents.transformers_batcher import TransformersBatcher
 from app.agents.prompt import Prompt
 
 
@@ -29,94 +32,350 @@ hf_logging.set_verbosity_error()  # Silence model loading logs
 
 
 
+class TransformersModel:
+    """The resources of a local model in the pool, shared by all agents using the model"""
+
+    def __init__(self, name: str, profile: str, model, tokenizer, load_duration_sec: float,
+                 size_bytes: int|None = None):
+        self.name = name
+        self.profile = profile
+        self.model = model
+        self.tokenizer = tokenizer
+        self.batcher : TransformersBatcher|None = None # collects the prompts of concurrent agents
+        self.supports_chat_template = hasattr(tokenizer, "apply_chat_template") and \
+            callable(tokenizer.apply_chat_template)
+        self.size_bytes = size_bytes if size_bytes is not None else model.get_memory_footprint()
+        self.load_duration_sec = load_duration_sec
+        # the generations in flight, the model is released after the last one when it was evicted
+        self._users = 0
+        self._evicted = False
+        self._users_lock = threading.Lock()
+
+    def acquire(self) -> "TransformersModel":
+        """Marks the model as used by a generation, until release()"""
+        with self._users_lock:
+            self._users += 1
+        return self
+
+    def release(self) -> bool:
+        """Ends a generation using the model, returns True if this released the evicted model"""
+        with self._users_lock:
+            self._users -= 1
+            released = self._evicted and self._users == 0
+        if released:
+            self._release()
+        return released
+
+    def close(self):
+        """Evicts the model, it is released when the generations in flight are finished"""
+        with self._users_lock:
+            self._evicted = True
+            released = self._users == 0
+        if released:
+            self._release()
+
+    def _release(self):
+        # the (small) tokenizer stays usable for agents, which still hold the evicted model
+        if self.batcher is not None:
+            self.batcher.close()
+            self.batcher = None
+        self.model = None
+
+
 class AIAgentTransformers(AIAgent):
     """
     Generic agent using Hugging Face Transformers 
     for causal LLMs with automatic chat formatting support
     """
 
-    # Singleton instance of the model resources (shared across all agents)
-    _model_name = None
-    _model = None
-    _tokenizer = None
-    _pipeline = None
+    PROVIDER = "transformers"
+
+    # Inference profiles (AI_TRANSFORMERS_PROFILE)
+    PROFILE_AUTO = "auto"   # float16 on CUDA, float32 on CPU
+    PROFILE_FP32 = "fp32"
+    PROFILE_BF16 = "bf16"   # half the memory, fast on CPUs with AVX512-BF16/AMX
+    PROFILE_INT8 = "int8"   # dynamic int8 quantization of the linear layers (CPU only)
+    PROFILES = [PROFILE_AUTO, PROFILE_FP32, PROFILE_BF16, PROFILE_INT8]
+
+    # Pool of the resident models (shared across all agents), the least-recently-used first
+    _models : OrderedDict = OrderedDict()
+    _models_lock = threading.RLock()
     _device = None
-    _supports_chat_template = False
+    # pool telemetry
+    _load_count = 0
+    _eviction_count = 0
+    _total_load_duration_sec = 0.0
 
 
     def __init__(self, config):
         super().__init__(config)
         logger.info("Creating AIAgentTransformers with %s", config)
 
-        self.model_name = self.load_model(config.model_name)
+        self.profile = getattr(config, "transformers_profile", None) or AIAgentTransformers.PROFILE_AUTO
+        self.num_threads = getattr(config, "transformers_threads", 0) or 0
+        self.model_name = self.load_model(config.model_name, self.profile)
+        # optional draft model for assisted (speculative) decoding, it must share the tokenizer of the model
+        self.draft_model_name = getattr(config, "transformers_draft_model", None) or None
+        self.draft_model : TransformersModel|None = None
+        with AIAgentTransformers._models_lock:
+            self.local_model : TransformersModel = AIAgentTransformers.get_model(self.model_name, self.profile)
+            if self.draft_model_name is not None:
+                self.draft_model = AIAgentTransformers.get_model(
+                    self.draft_model_name, self.profile, pinned=(self.model_name, self.profile))
+            max_position_embeddings = getattr(self.local_model.model.config, "max_position_embeddings", None)
+            tokenizer = self.local_model.tokenizer
+        # count the tokens with the tokenizer of the model, which is kept when the model is evicted
+        # the context window of the model, unless it is set by AI_CONTEXT_WINDOW
+        max_tokens = None if int(os.getenv('AI_CONTEXT_WINDOW', '0')) > 0 else max_position_embeddings
+        self.context_window = ContextWindow(
+            config.model_name, self.max_output_tokens, max_tokens,
+            count_tokens=lambda text: len(tokenizer.encode(text)))
+
+        # KV-cache of the conversation, so that only the new tokens of a turn are prefilled
+        self._kv_cache = None
+        self._kv_cache_ids : list[int] = []
+        self.prefill_duration_sec = 0.0 # of the last turn
+        self.total_prefill_tokens = 0
+        self.total_reused_tokens = 0
+
+        # telemetry of the assisted decoding
+        self.total_draft_tokens = 0     # proposed by the draft model
+        self.total_accepted_tokens = 0  # of the proposed tokens, accepted by the model
+        self.total_generated_tokens = 0
+        self.total_model_steps = 0      # forward passes of the model while generating
+        self.draft_acceptance_rate : float|None = None
+        self.draft_speedup : float|None = None  # generated tokens per forward pass of the model
 
         self.messages = []
 
 
+    def reset(self):
+        """Starts a new conversation, the KV-cache is dropped"""
+        super().reset()
+        self._drop_kv_cache()
+
+    def cleanup(self):
+        """Cleanup function to release ressources"""
+        self._drop_kv_cache()
+        super().cleanup()
+
+
     def system(self, prompt: str) -> str:
         """Starts with a new context (a reset), and provides the chat-system's general behavior"""
         logger.debug("Init AIAgentTransformers with system prompt: %s", prompt)
         self.messages = []
+        self._drop_kv_cache()
         return super().system(prompt)
 
     def ask(self, prompt: str) -> str:
         """Sends a prompt to the Transformer model, will track the result in messages"""
         logger.debug("Ask AIAgentTransformers: %s", prompt)
-        if len(prompt) > self.max_prompt_length:
-            prompt = trunc_middle(prompt, self.max_prompt_length)
-            logger.warning("Prompt is longer than %d (AI_MAX_PROMPT_LENGTH), so truncated in the middle:\n%s",
-                           self.max_prompt_length, prompt)
-        super().ask(prompt)
+        super().ask(self._truncate_prompt(prompt))
+        self._complete(self._send)
 
+        logger.debug("Execution stats: duration_sec=%d, iterations=%d, completion_chars=%d, total_chars=%d",
+                    self.total_duration_sec, self.total_iterations,
+                    self.total_completion_chars, self.total_chars)
+        return self.last_result
 
-        # Build the prompt
-        if AIAgentTransformers._supports_chat_template:
-            # Use chat template if available
+
+    def _send(self) -> str:
+        """Generates the answer to the current messages, the models are not released while they are used"""
+        with AIAgentTransformers._models_lock:
+            local_model = self._get_local_model()
+            models_in_use = [model.acquire() for model in (local_model, self.draft_model) if model is not None]
+        try:
+            return self._generate(local_model)
+        finally:
+            released = [model.release() for model in models_in_use]
+            if any(released):
+                AIAgentTransformers._free_memory()
+
+    def _generate(self, local_model: TransformersModel) -> str:
+        """Generates the answer to the current messages with the (acquired) model"""
+        if self.num_threads > 0 and torch.get_num_threads() != self.num_threads:
+            torch.set_num_threads(self.num_threads)   # process-wide intra-op threads
+        input_ids = self._build_input_ids()
+        reused_tokens = self.total_reused_tokens
+        if local_model.batcher is not None and self.draft_model is None:
+            # generated together with the prompts of the concurrent agents
+            output_ids = local_model.batcher.generate(input_ids, **self._generation_args())
+        else:
+            output_ids = self._generate_cached(input_ids)
+        # the prompt tokens of the KV-cache are reported as cached
+        self._record_call_usage(len(input_ids), len(output_ids), self.total_reused_tokens - reused_tokens)
+        self._record_finish_reason("length" if len(output_ids) >= self.max_output_tokens else "stop")
+        result = local_model.tokenizer.decode(output_ids, skip_special_tokens=True)
+        result = self._strip_stop_sequence(result).strip()
+
+        logger.debug("Transformers model returned: %s", result)
+        return result
+
+    def _send_candidates(self, n: int) -> list[str]:
+        """Generates the candidate answers one after the other, as they share the KV-cache of the conversation"""
+        return [self._send() for _ in range(n)]
+
+
+    def _get_local_model(self) -> TransformersModel:
+        """Returns the model from the pool (marked as recently used), it is loaded again if it was evicted"""
+        draft_key = (self.draft_model_name, self.profile) if self.draft_model is not None else None
+        local_model = AIAgentTransformers.get_model(self.model_name, self.profile, pinned=draft_key)
+        if local_model is not self.local_model:
+            self.local_model = local_model
+            self._drop_kv_cache()
+        if self.draft_model is not None:
+            self.draft_model = AIAgentTransformers.get_model(
+                self.draft_model_name, self.profile, pinned=(self.model_name, self.profile))
+        return local_model
+
+    def _build_input_ids(self) -> list[int]:
+        """Tokenizes the current messages, using the chat template of the model if available"""
+        tokenizer = self.local_model.tokenizer
+        if self.local_model.supports_chat_template:
             try:
-                tokenized_chat = AIAgentTransformers._tokenizer.apply_chat_template(
-                    self.messages, tokenize=True, add_generation_prompt=True, return_tensors="pt")
-                full_prompt = AIAgentTransformers._tokenizer.decode(tokenized_chat[0])
-                logger.debug("Full tokenized prompt: %s", full_prompt)
+                input_ids = tokenizer.apply_chat_template(
+                    [msg.to_dict() for msg in self.messages], tokenize=True, add_generation_prompt=True)
+                logger.debug("Tokenized chat: %d tokens", len(input_ids))
+                return input_ids
             except Exception as e:
                 logger.warning("Error tokenizing chat: %s", e)
                 # Fallback to basic formatting
-                AIAgentTransformers._supports_chat_template = False
-
-        if not AIAgentTransformers._supports_chat_template:
-            full_prompt = self._build_prompt()
-
-        start_time = time.perf_counter()
-        sequences = AIAgentTransformers._pipeline(
-            full_prompt,
-            do_sample=True,
-            top_k=10,
-            temperature=self.temperature,
-            top_p=self.top_p,
-            num_return_sequences=1,
-            eos_token_id=AIAgentTransformers._tokenizer.eos_token_id,
-            #max_length=self.max_output_tokens, # --> may lead to truncation
-            max_new_tokens=self.max_output_tokens,
-            #pad_token_id=self.tokenizer.pad_token_id,
-        )
-        self.total_duration_sec += time.perf_counter() - start_time
+                self.local_model.supports_chat_template = False
+        return tokenizer(self._build_prompt(), add_special_tokens=False)["input_ids"]
 
-        # Extract only newly generated text
-        output = ""
-        for seq in sequences:
-            output += f"{seq['generated_text']}\n"
-        print(f"Result: {output}")
-        self.last_result = output[len(full_prompt):].strip()
-        self.messages.append(Prompt(Prompt.ASSISTANT, self.last_result))
+    def _strip_stop_sequence(self, result: str) -> str:
+        """Removes the stop sequence (and anything after it) from the generated text"""
+        for stop_sequence in self.stop_sequences or []:
+            if stop_sequence in result:
+                result = result[:result.index(stop_sequence)]
+        return result
 
-        self.total_iterations = len(self.messages)
-        self.total_completion_chars += len(self.last_result)
-        self.total_chars += len(self.last_result)
 
-        logger.debug("Transformers model returned: %s", self.last_result)
-        logger.debug("Execution stats: duration_sec=%d, iterations=%d, completion_chars=%d, total_chars=%d",
-                    self.total_duration_sec, self.total_iterations,
-                    self.total_completion_chars, self.total_chars)
-        return self.last_result
+    def _generate_cached(self, input_ids: list[int]) -> list[int]:
+        """
+        Generates the answer reusing the KV-cache of the previous turns of the conversation,
+        only the tokens after the cached prefix are prefilled.
+        :return: the newly generated token ids
+        """
+        # the cache is valid for the common prefix of the cached and the new tokens
+        prefix_length = 0
+        if self._kv_cache is not None:
+            max_prefix = min(len(self._kv_cache_ids), len(input_ids) - 1)
+            while prefix_length < max_prefix and \
+                    self._kv_cache_ids[prefix_length] == input_ids[prefix_length]:
+                prefix_length += 1
+        if prefix_length == 0:
+            self._kv_cache = DynamicCache()
+        else:
+            self._kv_cache.crop(prefix_length)
+
+        model = self.local_model.model
+        tokenizer = self.local_model.tokenizer
+        input_tensor = torch.tensor([input_ids], device=model.device)
+        generation_args = self._generation_args()
+        if self.draft_model is not None:
+            generation_args["assistant_model"] = self.draft_model.model
+            # the draft model has no tokenizer for the stop strings, they are stripped after the generation
+            generation_args.pop("stop_strings", None)
+            generation_args.pop("tokenizer", None)
+        with torch.inference_mode():
+            # prefill the new tokens of the prompt (except the last one, which is processed by generate)
+            start_time = time.perf_counter()
+            if len(input_ids) - 1 > prefix_length:
+                model(input_ids=input_tensor[:, prefix_length:-1], past_key_values=self._kv_cache, use_cache=True)
+            self.prefill_duration_sec = time.perf_counter() - start_time
+            model_steps = [0]
+            draft_steps = [0]
+            hooks = [AIAgentTransformers._count_forward_passes(model, model_steps)]
+            if self.draft_model is not None:
+                hooks.append(AIAgentTransformers._count_forward_passes(self.draft_model.model, draft_steps))
+            try:
+                output = model.generate(
+                    input_ids=input_tensor,
+                    attention_mask=torch.ones_like(input_tensor),
+                    past_key_values=self._kv_cache,
+                    pad_token_id=tokenizer.pad_token_id if tokenizer.pad_token_id is not None \
+                        else tokenizer.eos_token_id,
+                    **generation_args)
+            finally:
+                for hook in hooks:
+                    hook.remove()
+        output_ids = output[0].tolist()
+        self._record_decoding(len(output_ids) - len(input_ids), model_steps[0], draft_steps[0])
+        self._kv_cache_ids = output_ids[:self._kv_cache.get_seq_length()]
+
+        self.total_prefill_tokens += len(input_ids) - prefix_length
+        self.total_reused_tokens += prefix_length
+        logger.debug("Prefilled %d tokens in %.3f sec, reused %d cached tokens",
+                     len(input_ids) - prefix_length, self.prefill_duration_sec, prefix_length)
+
+        output_ids = output_ids[len(input_ids):]
+        eos_token_id = tokenizer.eos_token_id
+        if eos_token_id in output_ids:
+            output_ids = output_ids[:output_ids.index(eos_token_id)]
+        return output_ids
+
+    def _record_decoding(self, generated_tokens: int, model_steps: int, draft_steps: int):
+        """
+        Records the telemetry of the assisted decoding: every forward pass of the model verifies the proposed tokens
+        and adds one token of its own, every forward pass of the draft model proposes one token
+        """
+        self.total_generated_tokens += generated_tokens
+        self.total_model_steps += model_steps
+        if self.draft_model is None:
+            return
+        self.total_draft_tokens += draft_steps
+        self.total_accepted_tokens += max(0, generated_tokens - model_steps)
+        if self.total_draft_tokens > 0:
+            self.draft_acceptance_rate = self.total_accepted_tokens / self.total_draft_tokens
+        if self.total_model_steps > 0:
+            self.draft_speedup = self.total_generated_tokens / self.total_model_steps
+        logger.debug("Assisted decoding: %d tokens in %d steps, %d of %d draft tokens accepted",
+                     generated_tokens, model_steps, max(0, generated_tokens - model_steps), draft_steps)
+
+    @staticmethod
+    def _count_forward_passes(model, counter: list):
+        """Counts the forward passes of the (shared) model by the calling thread in counter[0]"""
+        thread_id = threading.get_ident()
+        def hook(module, args, output):
+            if threading.get_ident() == thread_id:
+                counter[0] += 1
+        return model.register_forward_hook(hook)
+
+    def _drop_kv_cache(self):
+        """Drops the KV-cache of the conversation"""
+        self._kv_cache = None
+        self._kv_cache_ids = []
+
+    def _fit_context(self) -> None:
+        """Fits the messages into the context window, the KV-cache is dropped if turns were dropped"""
+        changes = self.context_window.evicted_messages + self.context_window.summarized_messages
+        super()._fit_context()
+        if changes != self.context_window.evicted_messages + self.context_window.summarized_messages:
+            self._drop_kv_cache()
+
+
+    def _generation_args(self) -> dict:
+        """The generation parameters for the model"""
+        args = {
+            "eos_token_id": self.local_model.tokenizer.eos_token_id,
+            #"max_length": self.max_output_tokens, # --> may lead to truncation
+            "max_new_tokens": self.max_output_tokens,
+        }
+        if self.temperature > 0:
+            args.update({
+                "do_sample": True,
+                "top_k": 10,
+                "temperature": self.temperature,
+                "top_p": self.top_p,
+            })
+        else:
+            args["do_sample"] = False   # greedy decoding
+        if self.stop_sequences:
+            # stop the generation as soon as a stop sequence was generated
+            args["stop_strings"] = self.stop_sequences
+            args["tokenizer"] = self.local_model.tokenizer
+        return args
 
 
     def _build_prompt(self) -> str:
@@ -161,62 +420,133 @@ class AIAgentTransformers(AIAgent):
 
 
     @staticmethod
-    def load_model(model_name: str = None)->str:
+    def load_model(model_name: str = None, profile: str = PROFILE_AUTO)->str:
+        """Loads the model into the pool of resident models (if not yet loaded), returns the model name"""
         if model_name is None:
             model_name = "microsoft/Phi-4-mini-instruct"
-        if AIAgentTransformers._model_name == model_name:
-            logger.debug("Model already loaded: %s", model_name)
-            return AIAgentTransformers._model_name
-        if AIAgentTransformers._model is not None:
-            logger.info("Unload previously loaded model %s and releasing resources.",
-                        AIAgentTransformers._model_name)
-            AIAgentTransformers.unload_model()
-
-        AIAgentTransformers._model_name = model_name
-        AIAgentTransformers._device = "cuda" if torch.cuda.is_available() else "cpu"
-
-        AIAgentTransformers.log_memory_usage("Before loading")
-        logger.info("Loading model '%s' on device: %s",
-                    AIAgentTransformers._model_name,
-                    AIAgentTransformers._device)
-        AIAgentTransformers._tokenizer = AutoTokenizer.from_pretrained(model_name)
-        AIAgentTransformers._model = AutoModelForCausalLM.from_pretrained(
+        AIAgentTransformers.get_model(model_name, profile)
+        return model_name
+
+
+    @staticmethod
+    def get_model(model_name: str, profile: str = PROFILE_AUTO, pinned: tuple|None = None) -> "TransformersModel":
+        """
+        Returns the resident model (with the inference profile) from the pool, or loads it.
+        The least-recently-used models are evicted to keep the pool within AI_TRANSFORMERS_RAM_BUDGET_MB.
+        :param pinned: the (model name, profile) of a model which is used together with this one and is not evicted
+        """
+        profile = profile.lower()
+        if profile not in AIAgentTransformers.PROFILES:
+            raise ValueError(f"Unknown inference profile '{profile}', expected one of {AIAgentTransformers.PROFILES}")
+        key = (model_name, profile)
+        with AIAgentTransformers._models_lock:
+            local_model = AIAgentTransformers._models.get(key)
+            if local_model is not None:
+                AIAgentTransformers._models.move_to_end(key)
+                return local_model
+
+            AIAgentTransformers._device = "cuda" if torch.cuda.is_available() else "cpu"
+            AIAgentTransformers._evict_models(keep=[pinned])
+            AIAgentTransformers.log_memory_usage("Before loading")
+            logger.info("Loading model '%s' (profile %s) on device: %s",
+                        model_name, profile, AIAgentTransformers._device)
+            start_time = time.perf_counter()
+            tokenizer = AutoTokenizer.from_pretrained(model_name)
+            model, size_bytes = AIAgentTransformers._load_weights(model_name, profile)
+            local_model = TransformersModel(model_name, profile, model, tokenizer,
+                                            time.perf_counter() - start_time, size_bytes)
+            max_batch_size = int(os.getenv('AI_TRANSFORMERS_MAX_BATCH_SIZE', '1'))
+            if max_batch_size > 1:
+                local_model.batcher = TransformersBatcher(
+                    model, tokenizer, max_batch_size, float(os.getenv('AI_TRANSFORMERS_MAX_WAIT_MS', '10')))
+
+            AIAgentTransformers._models[key] = local_model
+            AIAgentTransformers._load_count += 1
+            AIAgentTransformers._total_load_duration_sec += local_model.load_duration_sec
+            logger.info("Loaded model '%s' (%.2f MB) in %.2f sec", model_name,
+                        local_model.size_bytes / (1024 * 1024), local_model.load_duration_sec)
+            # now the size of the new model is known
+            AIAgentTransformers._evict_models(keep=[key, pinned])
+            AIAgentTransformers.log_memory_usage("After loading")
+            return local_model
+
+
+    @staticmethod
+    def _load_weights(model_name: str, profile: str) -> tuple:
+        """Loads the weights of the model in the data type of the profile, returns the model and its size in bytes"""
+        cuda = torch.cuda.is_available()
+        if profile == AIAgentTransformers.PROFILE_INT8 and cuda:
+            logger.warning("Profile %s is only supported on the CPU, using %s",
+                           profile, AIAgentTransformers.PROFILE_AUTO)
+            profile = AIAgentTransformers.PROFILE_AUTO
+        torch_dtype = {
+            AIAgentTransformers.PROFILE_AUTO: torch.float16 if cuda else torch.float32,
+            AIAgentTransformers.PROFILE_FP32: torch.float32,
+            AIAgentTransformers.PROFILE_BF16: torch.bfloat16,
+            AIAgentTransformers.PROFILE_INT8: torch.float32,
+        }[profile]
+        model = AutoModelForCausalLM.from_pretrained(
             model_name,
-            device_map="auto",
-            torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
+            device_map="auto" if cuda else None,
+            torch_dtype=torch_dtype,
             trust_remote_code=True  # needed for some community models
         )
-        AIAgentTransformers._pipeline = TextGenerationPipeline(
-            model=AIAgentTransformers._model,
-            tokenizer=AIAgentTransformers._tokenizer)
-        AIAgentTransformers._supports_chat_template = hasattr(AIAgentTransformers._tokenizer,
-            "apply_chat_template") and callable(AIAgentTransformers._tokenizer.apply_chat_template)
-        AIAgentTransformers.log_memory_usage("After loading")
+        model.eval()
+        size_bytes = model.get_memory_footprint()
+        if profile == AIAgentTransformers.PROFILE_INT8:
+            # the weights of the linear layers are quantized to int8, the activations at runtime
+            linear_bytes = sum(param.numel() * param.element_size()
+                               for module in model.modules() if isinstance(module, torch.nn.Linear)
+                               for param in module.parameters())
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            size_bytes -= linear_bytes * 3 // 4
+        return model, size_bytes
 
 
     @staticmethod
-    def unload_model():
-        """Release model, tokenizer and free up GPU/CPU memory"""
+    def unload_model(model_name: str = None):
+        """Release the model (in all profiles) or all models if None, and free up GPU/CPU memory"""
         logger.debug("Cleaning up AIAgentTransformers resources")
         AIAgentTransformers.log_memory_usage("Before cleanup")
+        with AIAgentTransformers._models_lock:
+            for key in list(AIAgentTransformers._models):
+                if model_name is None or key[0] == model_name:
+                    AIAgentTransformers._models.pop(key).close()
+        AIAgentTransformers._free_memory()
+        AIAgentTransformers.log_memory_usage("After cleanup")
+        logger.debug("Cleanup completed for AIAgentTransformers")
+
+
+    @staticmethod
+    def _evict_models(keep: list):
+        """
+        Evicts the least-recently-used models until the resident models fit into AI_TRANSFORMERS_RAM_BUDGET_MB,
+        without a budget only the models to keep stay resident
+        """
+        budget_bytes = float(os.getenv('AI_TRANSFORMERS_RAM_BUDGET_MB', '0')) * 1024 * 1024
+        evicted = False
+        for key in list(AIAgentTransformers._models):
+            if key in keep:
+                continue
+            resident_bytes = sum(m.size_bytes for m in AIAgentTransformers._models.values())
+            if budget_bytes > 0 and resident_bytes <= budget_bytes:
+                break
+            logger.info("Evicting least-recently-used model '%s' (profile %s) from the pool", key[0], key[1])
+            AIAgentTransformers._models.pop(key).close()
+            AIAgentTransformers._eviction_count += 1
+            evicted = True
+        if evicted:
+            AIAgentTransformers._free_memory()
 
-        # Explicitly delete objects
-        if AIAgentTransformers._model is not None:
-            del AIAgentTransformers._model
-        if AIAgentTransformers._tokenizer is not None:
-            del AIAgentTransformers._tokenizer
-        if AIAgentTransformers._pipeline is not None:
-            del AIAgentTransformers._pipeline
 
+    @staticmethod
+    def _free_memory():
         # If on CUDA: empty cache
         if torch.cuda.is_available():
             torch.cuda.empty_cache()
             torch.cuda.ipc_collect()  # optional: release inter-process cached memory
 
-        gc.collect()  
-
-        AIAgentTransformers.log_memory_usage("After cleanup")
-        logger.debug("Cleanup completed for AIAgentTransformers")
+        gc.collect()
 
 
     @staticmethod
@@ -224,11 +554,16 @@ class AIAgentTransformers(AIAgent):
         """Logs memory usage of GPU and CPU"""
         process = psutil.Process(os.getpid())
         cpu_mem = process.memory_info().rss / (1024 * 1024)  # in MB
+        resident_mem = sum(m.size_bytes for m in AIAgentTransformers._models.values()) / (1024 * 1024)
+        pool_stats = f"Resident Models: {len(AIAgentTransformers._models)} ({resident_mem:.2f} MB), " +\
+            f"Loads: {AIAgentTransformers._load_count} ({AIAgentTransformers._total_load_duration_sec:.2f} sec), " +\
+            f"Evictions: {AIAgentTransformers._eviction_count}"
         if torch.cuda.is_available():
             gpu_mem = torch.cuda.memory_allocated() / (1024 * 1024)  # in MB
-            logger.info("%s - CPU Memory Usage: %.2f MB | GPU Memory Usage: %.2f MB", label, cpu_mem, gpu_mem)
+            logger.info("%s - CPU Memory Usage: %.2f MB | GPU Memory Usage: %.2f MB | %s",
+                        label, cpu_mem, gpu_mem, pool_stats)
         else:
-            logger.info("%s - CPU Memory Usage: %.2f MB", label, cpu_mem)
+            logger.info("%s - CPU Memory Usage: %.2f MB | %s", label, cpu_mem, pool_stats)
 
 
 if __name__ == "__main__":
@@ -257,7 +592,7 @@ if __name__ == "__main__":
         main_agent1.cleanup()
         main_agent2.cleanup()
 
-    del main_agent1 # will also call .cleanup()
+    del main_agent1
     del main_agent2
 
     AIAgentTransformers.unload_model()
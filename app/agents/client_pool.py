@@ -0,0 +1,76 @@
+#!/bin/python
+"""
+Process-wide pool of the vendor SDK clients,
+so that all agents with the same credentials share one client and its keep-alive HTTP connections
+"""
+import asyncio
+import logging
+import os
+import threading
+import weakref
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+# Setup logging framework
+if not logging.getLogger().hasHandlers():
+    logging.basicConfig(level=os.getenv('LOGLEVEL', 'INFO').upper(),
+                        format=os.getenv('LOGFORMAT', '%(message)s'))
+logger = logging.getLogger(__name__)
+
+
+class ClientPool:
+    """
+    Process-wide pool of the vendor SDK clients, keyed by vendor and credentials.
+    The clients are created on first use and then borrowed by every agent (conversation).
+    """
+
+    _lock = threading.Lock()
+    _clients : dict = {}
+    # async clients are bound to the event loop they are used in
+    _async_clients : weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+    @staticmethod
+    def get_client(key: tuple, factory):
+        """
+        Returns the client for the given key, creates it with factory() on first use
+        :param key: the vendor name and the credentials, e.g. ("openai", api_key, organization_id)
+        :param factory: function creating the client
+        """
+        with ClientPool._lock:
+            client = ClientPool._clients.get(key)
+            if client is None:
+                logger.debug("Creating new %s client", key[0])
+                client = factory()
+                ClientPool._clients[key] = client
+            return client
+
+
+    @staticmethod
+    def get_async_client(key: tuple, factory):
+        """
+        Returns the async client for the given key and the running event loop,
+        creates it with factory() on first use in that loop
+        """
+        loop = asyncio.get_running_loop()
+        with ClientPool._lock:
+            clients = ClientPool._async_clients.setdefault(loop, {})
+            client = clients.get(key)
+            if client is None:
+                logger.debug("Creating new async %s client", key[0])
+                client = factory()
+                clients[key] = client
+            return client
+
+
+    @staticmethod
+    def clear():
+        """Closes and removes all (sync) clients from the pool"""
+        with ClientPool._lock:
+            for client in ClientPool._clients.values():
+                close = getattr(client, "close", None)
+                if callable(close):
+                    close()
+            ClientPool._clients.clear()
@@ -0,0 +1,248 @@
+#!/bin/python
+"""
+Token-budgeted context window of the AI-Agents,
+keeps the conversation (messages) within the context window of the model
+"""
+import logging
+import os
+import threading
+from dotenv import load_dotenv
+from app.agents.prompt import Prompt
+from app.util.string_utils import trunc_middle
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+
+load_dotenv()
+
+# Setup logging framework
+if not logging.getLogger().hasHandlers():
+    logging.basicConfig(level=os.getenv('LOGLEVEL', 'INFO').upper(),
+                        format=os.getenv('LOGFORMAT', '%(message)s'))
+logger = logging.getLogger(__name__)
+
+
+class ContextWindow:
+    """
+    Counts the tokens of the messages and fits the conversation into the context window of the model:
+    - oversized prompts are truncated in the middle (AI_MAX_PROMPT_TOKENS)
+    - older turns are evicted or summarized (AI_CONTEXT_POLICY), the system prompt is always kept
+    - a conversation that still does not fit is rejected before it is sent
+    """
+
+    # Policies for older turns, when the conversation does not fit into the context window
+    EVICT = "EVICT"         # remove the oldest turns
+    SUMMARIZE = "SUMMARIZE" # shorten the oldest turns to an excerpt first, then evict
+
+    # Context window sizes (in tokens) by model name prefix, the longest matching prefix wins
+    CONTEXT_WINDOWS = {
+        "gpt-3.5-turbo-instruct": 4096,
+        "gpt-3.5": 16385,
+        "gpt-4": 8192,
+        "gpt-4-turbo": 128000,
+        "gpt-4o": 128000,
+        "gpt-4.1": 1047576,
+        "gpt-5": 400000,
+        "o1": 200000,
+        "o3": 200000,
+        "o4": 200000,
+        "claude": 200000,
+        "gemini": 1048576,
+    }
+    DEFAULT_CONTEXT_WINDOW = 8192
+
+    # Additional tokens per message for the role and the message delimiters
+    TOKENS_PER_MESSAGE = 4
+    # Approximation of the tokens if no local tokenizer is available
+    CHARS_PER_TOKEN = 4
+
+    # The tiktoken encodings are loaded once per process
+    _encodings : dict = {}
+    _encodings_lock = threading.Lock()
+    # set when an encoding cannot be loaded (e.g. offline), then the tokens of all models are approximated
+    _encodings_unavailable = False
+    # The deprecation of AI_MAX_PROMPT_LENGTH is logged once per process
+    _length_deprecation_logged = False
+
+
+    def __init__(self, model_name: str, max_output_tokens: int, max_tokens: int|None = None,
+                 count_tokens=None):
+        """
+        :param max_tokens: size of the context window, if None it is taken from AI_CONTEXT_WINDOW
+            or the known context window of the model
+        :param count_tokens: optional function counting the tokens of a text (e.g. using the
+            tokenizer of a local model), by default tiktoken is used if available
+        """
+        self.model_name = model_name
+        self.max_output_tokens = max_output_tokens if max_output_tokens is not None else 0
+        if max_tokens is None:
+            max_tokens = int(os.getenv('AI_CONTEXT_WINDOW', '0'))
+        self.max_tokens = max_tokens if max_tokens > 0 else ContextWindow.get_context_window(model_name)
+        self.max_prompt_tokens = ContextWindow.get_max_prompt_tokens()
+        self.policy = os.getenv('AI_CONTEXT_POLICY', ContextWindow.EVICT).upper()
+        self.summary_tokens = int(os.getenv('AI_CONTEXT_SUMMARY_TOKENS', '100'))
+        self._count_tokens = count_tokens
+
+        # telemetry
+        self.evicted_messages = 0
+        self.summarized_messages = 0
+
+
+    @staticmethod
+    def get_max_prompt_tokens() -> int:
+        """
+        Returns the limit of the prompt tokens (AI_MAX_PROMPT_TOKENS), if it is unset it falls back to
+        the deprecated character limit AI_MAX_PROMPT_LENGTH converted with CHARS_PER_TOKEN
+        """
+        max_prompt_tokens = os.getenv('AI_MAX_PROMPT_TOKENS')
+        if max_prompt_tokens is not None:
+            return int(max_prompt_tokens)
+        max_prompt_length = os.getenv('AI_MAX_PROMPT_LENGTH')
+        if max_prompt_length is None:
+            return 500
+        if not ContextWindow._length_deprecation_logged:
+            ContextWindow._length_deprecation_logged = True
+            logger.warning("AI_MAX_PROMPT_LENGTH is deprecated for truncating prompts, "
+                           "use AI_MAX_PROMPT_TOKENS instead")
+        return int(max_prompt_length) // ContextWindow.CHARS_PER_TOKEN
+
+
+    @staticmethod
+    def get_context_window(model_name: str) -> int:
+        """Returns the context window size (in tokens) of the model"""
+        best_prefix = ""
+        for prefix in ContextWindow.CONTEXT_WINDOWS:
+            if model_name.startswith(prefix) and len(prefix) > len(best_prefix):
+                best_prefix = prefix
+        if len(best_prefix) == 0:
+            return ContextWindow.DEFAULT_CONTEXT_WINDOW
+        return ContextWindow.CONTEXT_WINDOWS[best_prefix]
+
+
+    def count_tokens(self, text: str) -> int:
+        """Counts the tokens of the text"""
+        if text is None:
+            return 0
+        if self._count_tokens is not None:
+            return self._count_tokens(text)
+        encoding = self._get_encoding()
+        if encoding is not None:
+            return len(encoding.encode(text, disallowed_special=()))
+        return (len(text) + ContextWindow.CHARS_PER_TOKEN - 1) // ContextWindow.CHARS_PER_TOKEN
+
+    def count_messages(self, messages: list) -> int:
+        """Counts the tokens of all messages including the per-message overhead"""
+        return sum(self.count_tokens(msg.content) + ContextWindow.TOKENS_PER_MESSAGE
+                   for msg in messages)
+
+
+    def truncate(self, text: str, max_tokens: int|None = None) -> str:
+        """Truncates the text in the middle, if it is longer than max_tokens (AI_MAX_PROMPT_TOKENS)"""
+        if max_tokens is None:
+            max_tokens = self.max_prompt_tokens
+        if text is None or max_tokens <= 0:
+            return text
+        token_count = self.count_tokens(text)
+        if token_count <= max_tokens:
+            return text
+        encoding = self._get_encoding() if self._count_tokens is None else None
+        if encoding is not None:
+            tokens = encoding.encode(text, disallowed_special=())
+            return encoding.decode(tokens[:max_tokens//2]) + "\n...(truncated)...\n" +\
+                encoding.decode(tokens[-(max_tokens//2):])
+        # approximate the length in characters, until the truncated text fits
+        length = len(text)
+        truncated = text
+        while token_count > max_tokens and length > 0:
+            length = length * max_tokens // token_count
+            truncated = trunc_middle(text, length)
+            token_count = self.count_tokens(truncated)
+        return truncated
+
+
+    def fit(self, messages: list, max_output_tokens: int|None = None) -> int:
+        """
+        Fits the messages into the context window (minus the reserved output tokens),
+        older turns are evicted or summarized according to the policy.
+        The system prompts and the newest message are always kept.
+        :param max_output_tokens: the reserved output tokens, if they differ from the configured ones
+        :return: the number of tokens of the fitted messages
+        :raises ValueError: if the messages still do not fit
+        """
+        if max_output_tokens is not None:
+            self.max_output_tokens = max_output_tokens
+        budget = self.max_tokens - self.max_output_tokens
+        total = self.count_messages(messages)
+        if total <= budget:
+            return total
+
+        if self.policy == ContextWindow.SUMMARIZE:
+            for i, msg in enumerate(messages[:-1]):
+                if total <= budget:
+                    break
+                if msg.role == Prompt.SYSTEM:
+                    continue
+                summary = self.truncate(msg.content, self.summary_tokens)
+                if summary != msg.content:
+                    total -= self.count_tokens(msg.content) - self.count_tokens(summary)
+                    messages[i] = Prompt(msg.role, summary)
+                    self.summarized_messages += 1
+
+        while total > budget:
+            index = self._oldest_turn(messages)
+            if index is None:
+                break
+            total -= self.count_tokens(messages[index].content) + ContextWindow.TOKENS_PER_MESSAGE
+            del messages[index]
+            self.evicted_messages += 1
+            # the conversation has to continue with a user message
+            index = self._oldest_turn(messages)
+            if index is not None and messages[index].role == Prompt.ASSISTANT:
+                total -= self.count_tokens(messages[index].content) + ContextWindow.TOKENS_PER_MESSAGE
+                del messages[index]
+                self.evicted_messages += 1
+        logger.info("Fitted conversation into context window of %s: %d tokens, %d messages " +\
+                    "(evicted=%d, summarized=%d)", self.model_name, total, len(messages),
+                    self.evicted_messages, self.summarized_messages)
+
+        if total > budget:
+            raise ValueError(f"Prompt of {total} tokens exceeds the context window of {self.model_name}" +\
+                             f" ({self.max_tokens} tokens, {self.max_output_tokens} reserved for output)")
+        return total
+
+
+    def _oldest_turn(self, messages: list) -> int|None:
+        """Returns the index of the oldest non-system message, the newest message is excluded"""
+        for i, msg in enumerate(messages[:-1]):
+            if msg.role != Prompt.SYSTEM:
+                return i
+        return None
+
+    def _get_encoding(self):
+        if tiktoken is None:
+            return None
+        with ContextWindow._encodings_lock:
+            if self.model_name not in ContextWindow._encodings:
+                encoding = None
+                if not ContextWindow._encodings_unavailable:
+                    try:
+                        try:
+                            encoding = tiktoken.encoding_for_model(self.model_name)
+                        except KeyError:
+                            encoding = tiktoken.get_encoding("o200k_base")
+                    except Exception as e:
+                        # e.g. the download of the encoding failed, it is not tried again for the other models
+                        ContextWindow._encodings_unavailable = True
+                        logger.warning("No tokenizer available (%s), approximating tokens with %d chars per token",
+                                       e, ContextWindow.CHARS_PER_TOKEN)
+                ContextWindow._encodings[self.model_name] = encoding
+            return ContextWindow._encodings[self.model_name]
+
+
+if __name__ == "__main__":
+    main_window = ContextWindow("gpt-4o-mini", 2000)
+    print(f"Context window: {main_window.max_tokens} tokens")
+    print(f"Tokens: {main_window.count_tokens('What is the answer to life, the universe and everything?')}")
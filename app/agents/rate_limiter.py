@@ -0,0 +1,179 @@
+#!/bin/python
+"""
+Process-wide rate limiter for the requests to the AI platforms,
+keeps the requests and tokens per minute within the limits of the provider
+"""
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+# Setup logging framework
+if not logging.getLogger().hasHandlers():
+    logging.basicConfig(level=os.getenv('LOGLEVEL', 'INFO').upper(),
+                        format=os.getenv('LOGFORMAT', '%(message)s'))
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Token-bucket rate limiter for the requests-per-minute (AI_RATE_LIMIT_RPM)
+    and tokens-per-minute (AI_RATE_LIMIT_TPM) of one provider and model.
+    When the provider answers with 429 (too many requests), all requests of the limiter
+    are paused for the Retry-After time or a jittered exponential backoff.
+    """
+
+    # One limiter per provider and model (shared across all agents of the process)
+    _instances : dict = {}
+    _instances_lock = threading.Lock()
+
+
+    def __init__(self, rpm: int, tpm: int, max_retries: int = 5, backoff_sec: float = 1.0):
+        """
+        :param rpm: requests per minute, 0 means unlimited
+        :param tpm: tokens per minute, 0 means unlimited
+        :param max_retries: number of retries after a 429 answer
+        :param backoff_sec: the initial backoff, doubled with every retry
+        """
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_retries = max_retries
+        self.backoff_sec = backoff_sec
+        self.max_backoff_sec = 60.0
+
+        self._lock = threading.Lock()
+        now = time.monotonic()
+        self._request_bucket = float(rpm)
+        self._token_bucket = float(tpm)
+        self._last_refill = now
+        self._blocked_until = now
+
+        # telemetry
+        self.total_requests = 0
+        self.total_wait_sec = 0.0
+        self.total_retries = 0
+
+
+    @staticmethod
+    def get_instance(provider: str, model_name: str) -> "RateLimiter":
+        """Returns the limiter of the provider and model, configured by the AI_RATE_LIMIT_* variables"""
+        key = (provider, model_name)
+        with RateLimiter._instances_lock:
+            if key not in RateLimiter._instances:
+                RateLimiter._instances[key] = RateLimiter(
+                    int(os.getenv('AI_RATE_LIMIT_RPM', '0')),
+                    int(os.getenv('AI_RATE_LIMIT_TPM', '0')),
+                    int(os.getenv('AI_RATE_LIMIT_MAX_RETRIES', '5')),
+                    float(os.getenv('AI_RATE_LIMIT_BACKOFF_SEC', '1.0')))
+            return RateLimiter._instances[key]
+
+
+    def acquire(self, tokens: int = 0) -> float:
+        """
+        Blocks until the request (with the estimated number of tokens) fits into the budgets
+        :return: the waiting time in seconds
+        """
+        waited = 0.0
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    async def acquire_async(self, tokens: int = 0) -> float:
+        """Same as acquire(), but awaits instead of blocking the event loop"""
+        waited = 0.0
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return waited
+            await asyncio.sleep(wait)
+            waited += wait
+
+
+    def backoff(self, error: Exception, attempt: int) -> float|None:
+        """
+        Returns the delay before retrying a request which failed with the error,
+        or None if it is no rate limit error (429) or the retries are exhausted.
+        The limiter is paused for the delay, so that also concurrent requests wait.
+        """
+        if not RateLimiter.is_rate_limit_error(error) or attempt >= self.max_retries:
+            return None
+        delay = min(self.backoff_sec * (2 ** attempt), self.max_backoff_sec)
+        retry_after = RateLimiter.get_retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        # jitter, so that the waiting requests do not retry at the same time
+        delay += random.uniform(0, delay / 2)
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+            self.total_retries += 1
+        return delay
+
+
+    @staticmethod
+    def is_rate_limit_error(error: Exception) -> bool:
+        """Checks whether the error of the vendor SDK is a 429 (too many requests) answer"""
+        return getattr(error, "status_code", None) == 429 or getattr(error, "code", None) == 429
+
+    @staticmethod
+    def get_retry_after(error: Exception) -> float|None:
+        """Returns the Retry-After time (in seconds) of the error's HTTP response, if available"""
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None)
+        if headers is None:
+            return None
+        try:
+            if headers.get("retry-after-ms") is not None:
+                return float(headers.get("retry-after-ms")) / 1000
+            if headers.get("retry-after") is not None:
+                return float(headers.get("retry-after"))
+        except ValueError:
+            pass    # e.g. a HTTP-date
+        return None
+
+
+    def _reserve(self, tokens: int) -> float:
+        """Takes the request and the tokens from the buckets, or returns the time to wait for them"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._blocked_until:
+                return self._blocked_until - now
+
+            elapsed = now - self._last_refill
+            self._last_refill = now
+            if self.rpm > 0:
+                self._request_bucket = min(float(self.rpm), self._request_bucket + elapsed * self.rpm / 60)
+            if self.tpm > 0:
+                self._token_bucket = min(float(self.tpm), self._token_bucket + elapsed * self.tpm / 60)
+                # a request bigger than the budget has to wait for a full bucket
+                tokens = min(tokens, self.tpm)
+
+            wait = 0.0
+            if self.rpm > 0 and self._request_bucket < 1:
+                wait = max(wait, (1 - self._request_bucket) * 60 / self.rpm)
+            if self.tpm > 0 and self._token_bucket < tokens:
+                wait = max(wait, (tokens - self._token_bucket) * 60 / self.tpm)
+            if wait > 0:
+                self.total_wait_sec += wait
+                return wait
+
+            if self.rpm > 0:
+                self._request_bucket -= 1
+            if self.tpm > 0:
+                self._token_bucket -= tokens
+            self.total_requests += 1
+            return 0.0
+
+
+if __name__ == "__main__":
+    main_limiter = RateLimiter(rpm=120, tpm=0)
+    for i in range(5):
+        print(f"Request {i}: waited {main_limiter.acquire():.2f} sec")
@@ -0,0 +1,158 @@
+#!/bin/python
+"""
+Persistent cache for the answers of the AI-Agents,
+so that re-running a workflow with an identical conversation does not call the LLM again
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+# Setup logging framework
+if not logging.getLogger().hasHandlers():
+    logging.basicConfig(level=os.getenv('LOGLEVEL', 'INFO').upper(),
+                        format=os.getenv('LOGFORMAT', '%(message)s'))
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    SQLite-backed response cache with a size limit (least-recently-used entries are evicted first)
+    and a time-to-live for every entry.
+    """
+
+    # One cache instance per database file (shared across all agents of the process)
+    _instances : dict = {}
+    _instances_lock = threading.Lock()
+
+
+    def __init__(self, db_file: str, max_size_bytes: int, ttl_sec: int):
+        self.db_file = db_file
+        self.max_size_bytes = max_size_bytes
+        self.ttl_sec = ttl_sec
+
+        directory = os.path.dirname(os.path.abspath(db_file))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_file, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS responses (" +\
+                         "key TEXT PRIMARY KEY, model TEXT, response TEXT, " +\
+                         "size INTEGER, created REAL, last_access REAL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_access " +\
+                         "ON responses (last_access)")
+        self._db.commit()
+        logger.info("Using response cache %s (max. %d bytes, TTL %d sec)",
+                    db_file, max_size_bytes, ttl_sec)
+
+
+    @staticmethod
+    def get_instance() -> "ResponseCache | None":
+        """
+        Returns the cache configured by AI_CACHE_FILE,
+        or None if caching is not enabled (the default)
+        """
+        db_file = os.getenv('AI_CACHE_FILE', '')
+        if len(db_file) == 0:
+            return None
+        with ResponseCache._instances_lock:
+            if db_file not in ResponseCache._instances:
+                ResponseCache._instances[db_file] = ResponseCache(
+                    db_file,
+                    int(os.getenv('AI_CACHE_MAX_MB', '256')) * 1024 * 1024,
+                    int(os.getenv('AI_CACHE_TTL_SEC', '604800')))
+            return ResponseCache._instances[db_file]
+
+
+    @staticmethod
+    def create_key(agent) -> str:
+        """Creates the cache key from the model, its parameters and the full message history"""
+        request = {
+            "model": agent.model_name,
+            "temperature": agent.temperature,
+            "top_p": agent.top_p,
+            "frequency_penalty": agent.frequency_penalty,
+            "presence_penalty": agent.presence_penalty,
+            "max_output_tokens": agent.max_output_tokens,
+            "stop_sequences": agent.stop_sequences,
+            "messages": [msg.to_dict() for msg in agent.messages],
+        }
+        request_json = json.dumps(request, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(request_json.encode("utf-8")).hexdigest()
+
+
+    def get(self, key: str) -> str | None:
+        """Returns the cached response, or None if not cached or expired"""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT response, created FROM responses WHERE key = ?",
+                                   (key,)).fetchone()
+            if row is None:
+                return None
+            response, created = row
+            if self.ttl_sec > 0 and now - created > self.ttl_sec:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._db.commit()
+        return response
+
+
+    def put(self, key: str, model: str, response: str) -> None:
+        """Stores the response and evicts expired and least-recently-used entries"""
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO responses " +\
+                             "(key, model, response, size, created, last_access) " +\
+                             "VALUES (?, ?, ?, ?, ?, ?)",
+                             (key, model, response, size, now, now))
+            self._evict(now)
+            self._db.commit()
+
+
+    def clear(self) -> None:
+        """Removes all entries from the cache"""
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+
+    def close(self) -> None:
+        """Closes the database connection"""
+        with self._lock:
+            self._db.close()
+
+
+    def _evict(self, now: float) -> None:
+        if self.ttl_sec > 0:
+            self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_sec,))
+
+        total_size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total_size <= self.max_size_bytes:
+            return
+        evicted = 0
+        for key, size in self._db.execute(
+                "SELECT key, size FROM responses ORDER BY last_access").fetchall():
+            if total_size <= self.max_size_bytes:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total_size -= size
+            evicted += 1
+        logger.debug("Evicted %d least-recently-used responses from cache", evicted)
+
+
+if __name__ == "__main__":
+    main_cache = ResponseCache("response_cache_sample.db", 1024, 60)
+    main_cache.put("key1", "gpt-5-nano", "The answer is 42")
+    print(f"Cached response: {main_cache.get('key1')}")
+    main_cache.clear()
+    main_cache.close()
@@ -0,0 +1,154 @@
+#!/bin/python
+"""
+Dynamic request batching for the local Hugging Face Transformers models,
+concurrent agents sharing one model are served with one generate() call
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dotenv import load_dotenv
+import torch
+
+
+load_dotenv()
+
+# Setup logging framework
+if not logging.getLogger().hasHandlers():
+    logging.basicConfig(level=os.getenv('LOGLEVEL', 'INFO').upper(),
+                        format=os.getenv('LOGFORMAT', '%(message)s'))
+logger = logging.getLogger(__name__)
+
+
+class TransformersBatcher:
+    """
+    Collects the pending generation requests for a shared model for up to max_wait_ms (or max_batch_size requests),
+    left-pads them into one generate() call and routes the generated tokens back to the requesting agents.
+    Only requests with the same generation parameters are batched together.
+    """
+
+    def __init__(self, model, tokenizer, max_batch_size: int = 8, max_wait_ms: float = 10.0):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_batch_size = max_batch_size
+        self.max_wait_sec = max_wait_ms / 1000
+        self.pad_token_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None \
+            else tokenizer.eos_token_id
+
+        self._queue : queue.Queue = queue.Queue()
+        self._deferred : list = []  # requests with other parameters than the running batch
+        self._closed = False
+
+        # telemetry
+        self.total_batches = 0
+        self.total_requests = 0
+
+        self._worker = threading.Thread(target=self._run, name="TransformersBatcher", daemon=True)
+        self._worker.start()
+
+
+    def generate(self, input_ids: list[int], **generate_args) -> list[int]:
+        """
+        Queues the prompt tokens for the next batch and blocks until they are generated
+        :param generate_args: the parameters for model.generate(), e.g. max_new_tokens, temperature
+        :return: the newly generated token ids (without the prompt, padding and EOS)
+        """
+        if self._closed:
+            raise RuntimeError("TransformersBatcher is closed")
+        future = Future()
+        self._queue.put((input_ids, generate_args, future))
+        return future.result()
+
+
+    def close(self):
+        """Stops the worker thread, pending requests are still processed"""
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join()
+
+
+    def _run(self):
+        while True:
+            if len(self._deferred) > 0:
+                request = self._deferred.pop(0)
+            else:
+                request = self._queue.get()
+            if request is None:
+                if len(self._deferred) == 0:
+                    return
+                self._queue.put(None)   # process the deferred requests first
+                continue
+
+            batch = [request]
+            for deferred in list(self._deferred):
+                if len(batch) < self.max_batch_size and deferred[1] == batch[0][1]:
+                    self._deferred.remove(deferred)
+                    batch.append(deferred)
+            deadline = time.monotonic() + self.max_wait_sec
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if request is None:
+                    self._queue.put(None)
+                    break
+                if request[1] == batch[0][1]:
+                    batch.append(request)
+                else:
+                    self._deferred.append(request)
+
+            try:
+                self._generate_batch(batch)
+            except Exception as e:
+                logger.warning("Error generating batch of %d requests: %s", len(batch), e)
+                for _, _, future in batch:
+                    future.set_exception(e)
+
+
+    def _generate_batch(self, batch: list):
+        generate_args = batch[0][1]
+        max_length = max(len(input_ids) for input_ids, _, _ in batch)
+        # left-padding, so that all prompts end at the same position
+        input_ids = torch.tensor([[self.pad_token_id] * (max_length - len(ids)) + ids
+                                  for ids, _, _ in batch], device=self.model.device)
+        attention_mask = torch.tensor([[0] * (max_length - len(ids)) + [1] * len(ids)
+                                       for ids, _, _ in batch], device=self.model.device)
+
+        start_time = time.perf_counter()
+        with torch.inference_mode():
+            output = self.model.generate(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                pad_token_id=self.pad_token_id,
+                **generate_args)
+        logger.debug("Generated batch of %d requests in %.2f sec",
+                     len(batch), time.perf_counter() - start_time)
+        self.total_batches += 1
+        self.total_requests += len(batch)
+
+        eos_token_ids = generate_args.get("eos_token_id", self.tokenizer.eos_token_id)
+        if not isinstance(eos_token_ids, list):
+            eos_token_ids = [eos_token_ids]
+        for row, (_, _, future) in zip(output[:, max_length:].tolist(), batch):
+            # finished sequences are filled up with padding
+            for i, token_id in enumerate(row):
+                if token_id in eos_token_ids:
+                    row = row[:i]
+                    break
+            future.set_result(row)
+
+
+if __name__ == "__main__":
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+    MAIN_MODEL_NAME = "Qwen/Qwen2.5-Coder-0.5B-Instruct"
+    main_tokenizer = AutoTokenizer.from_pretrained(MAIN_MODEL_NAME)
+    main_batcher = TransformersBatcher(AutoModelForCausalLM.from_pretrained(MAIN_MODEL_NAME), main_tokenizer)
+    main_ids = main_tokenizer("def fibonacci(n):", add_special_tokens=False)["input_ids"]
+    print(main_tokenizer.decode(main_batcher.generate(main_ids, max_new_tokens=32, do_sample=False)))
+    main_batcher.close()
@@ -0,0 +1,28 @@
+#!/bin/python
+"""
+RESTful API - Metrics of the AI-Agents
+"""
+
+from flask import jsonify, Response
+from app.agents.agent_metrics import AgentMetrics
+from app.commands.executor_pool import ExecutorPool
+
+
+def register_metrics_routes(app):
+    """
+    Register the metrics routes with the Flask app.
+    """
+    @app.route("/api/metrics", methods=["GET"])
+    def get_metrics():
+        # counters and latency histograms per provider and model
+        return jsonify(AgentMetrics.get_instance().summary())
+
+    @app.route("/api/metrics/prometheus", methods=["GET"])
+    def get_metrics_prometheus():
+        return Response(AgentMetrics.get_instance().to_prometheus(),
+                        mimetype="text/plain; version=0.0.4")
+
+    @app.route("/api/metrics/executors", methods=["GET"])
+    def get_metrics_executors():
+        # usage and reuse of the pool of warm command executors
+        return jsonify(ExecutorPool.get_instance().stats())
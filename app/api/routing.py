@@ -8,6 +8,7 @@ from flask import Flask, request, send_file
 from app.api.files import register_file_routes
 from app.api.workflow import register_workflow_routes
 from app.api.log import register_log_routes
+from app.api.metrics import register_metrics_routes
 from app.api.auth import authorize, register_auth_routes
 from app.api.frontend import register_frontend_routes
 
@@ -52,6 +53,7 @@ class ApiRouter:
         register_file_routes(self.app)
         register_workflow_routes(self.app)
         register_log_routes(self.app)
+        register_metrics_routes(self.app)
 
         # Install *before_request* guard last so that every route is protected
         self.app.before_request(self._check_auth)
@@ -10,11 +10,19 @@ class Command:
     # Static constant for the command-types
     SHELL = 'sh'
 
+    # Exit code if the end of the command was not seen (timeout or terminated shell)
+    NO_EXIT_CODE = -1
+
     def __init__(self, command_type: str, cmds: list[str]):
         self.type = Command.parse_command_type(command_type)
         self.cmds : list[str] = cmds
         self.exit_code : int = None
         self.output : str = None
+        # characters elided in the middle of the output, the full output is in output_file
+        self.elided_chars : int = 0
+        self.output_file : str|None = None
+        # directory of output_file, e.g. in the log directory of the workflow run (default OutputBuffer.SPILL_DIR)
+        self.output_dir : str|None = None
 
     def __str__(self):
         return f"{self.type}: {self.cmds}"
@@ -9,6 +9,12 @@ class CommandExecutor:
     """
     Class to execute commands
     """
+
+    # the environment of the new session, which is restored by reset()
+    SNAPSHOT_COMMAND = '__EXECUTOR_ENV="$(export -p)"'
+    RESET_COMMANDS = ["cd ~",
+                      'for __v in $(compgen -e); do unset "$__v" 2>/dev/null; done; eval "$__EXECUTOR_ENV"']
+
     def execute(self, command: Command) -> str:
         """
         Execute the given command
@@ -18,3 +24,19 @@ class CommandExecutor:
         """
         # Placeholder implementation
         return f"Executing command: {command.type} with args: {', '.join(command.cmds)}"
+
+    def reset(self) -> bool:
+        """
+        Resets the session for the next workflow run: the working directory and the exported environment
+        are restored to the state after the session was opened (shell variables, which are not exported, remain).
+
+        :return: True if the session answered, False if it must be discarded
+        """
+        command = Command(Command.SHELL, CommandExecutor.RESET_COMMANDS)
+        self.execute(command)
+        return command.exit_code != Command.NO_EXIT_CODE
+
+    def close(self):
+        """
+        Close the session of the executor
+        """
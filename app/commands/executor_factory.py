@@ -7,7 +7,6 @@ import os
 from dotenv import load_dotenv
 from app.commands.executor import CommandExecutor
 from app.commands.shell_executor import ShellCommandExecutor
-from app.commands.ssh_executor import SSHCommandExecutor
 
 
 # Setup logging framework
@@ -31,6 +30,8 @@ class ExecutorFactory:
 
         ssh_host = os.getenv("SHELLBOX_HOST")
         if ssh_host:
+            # imported on demand, paramiko is only needed for the remote shell
+            from app.commands.ssh_executor import SSHCommandExecutor
             return SSHCommandExecutor()
 
         return ShellCommandExecutor()
@@ -0,0 +1,167 @@
+#!/bin/python
+"""
+Pool of warm command executors (shell processes or SSH sessions), which are shared by the workflow runs:
+a run checks out a session on its first EXECUTE and returns it at its end, the session is reset
+(working directory and environment) and reused by the next run instead of spawning a new shell or SSH connection.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from dotenv import load_dotenv
+from app.commands.executor import CommandExecutor
+from app.commands.executor_factory import ExecutorFactory
+
+
+load_dotenv()
+
+# Setup logging framework
+if not logging.getLogger().hasHandlers():
+    logging.basicConfig(level=os.getenv('LOGLEVEL', 'INFO').upper(),
+                        format=os.getenv('LOGFORMAT', '%(message)s'))
+logger = logging.getLogger(__name__)
+
+
+class ExecutorPool:
+    """
+    Pool of warm command executors, which keeps at most SIZE idle sessions.
+    The number of checked out sessions is not limited: a new one is created when no session is idle.
+    With SIZE 0 every run gets a new executor, which is closed at the end of the run.
+    """
+
+    SIZE = int(os.getenv('COMMAND_EXECUTOR_POOL_SIZE', "4"))
+    MIN_IDLE = int(os.getenv('COMMAND_EXECUTOR_POOL_MIN_IDLE', "1"))
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+
+    @staticmethod
+    def get_instance() -> "ExecutorPool":
+        """Returns the pool of the process"""
+        with ExecutorPool._instance_lock:
+            if ExecutorPool._instance is None:
+                ExecutorPool._instance = ExecutorPool()
+                atexit.register(ExecutorPool._instance.close_all)
+            return ExecutorPool._instance
+
+
+    def __init__(self, size: int|None = None, min_idle: int|None = None,
+                 create_executor = ExecutorFactory.create_executor):
+        self.size = size if size is not None else ExecutorPool.SIZE
+        self.min_idle = min(min_idle if min_idle is not None else ExecutorPool.MIN_IDLE, self.size)
+        self.create_executor = create_executor
+
+        self._idle : list[CommandExecutor] = []
+        self._in_use : set[int] = set()         # ids of the checked out executors
+        self._used : set[int] = set()           # ids of the executors, which were checked out before
+        self._pending = 0                       # idle executors being created
+        self.lock = threading.Lock()
+
+        # statistics
+        self.created = 0
+        self.checkouts = 0
+        self.warm_hits = 0                      # checkouts of an idle executor
+        self.reuses = 0                         # ... which was used by a previous run
+        self.discarded = 0                      # executors closed after a failed reset
+        self.total_create_sec = 0.0             # time spent creating executors on checkout
+
+
+    def checkout(self) -> CommandExecutor:
+        """Returns a warm executor of the pool, or a new one if none is idle (it never waits for a checkin)"""
+        with self.lock:
+            self.checkouts += 1
+            executor = self._idle.pop() if len(self._idle) > 0 else None
+            if executor is not None:
+                self.warm_hits += 1
+                if id(executor) in self._used:
+                    self.reuses += 1
+                self._in_use.add(id(executor))
+                self._used.add(id(executor))
+
+        if executor is None:
+            start_time = time.monotonic()
+            executor = self.create_executor()
+            with self.lock:
+                self.created += 1
+                self.total_create_sec += time.monotonic() - start_time
+                self._in_use.add(id(executor))
+                self._used.add(id(executor))
+        self._refill()
+        return executor
+
+
+    def checkin(self, executor: CommandExecutor) -> None:
+        """Returns the executor to the pool after it was reset, it is closed if the reset fails or the pool is full"""
+        with self.lock:
+            checked_out = id(executor) in self._in_use
+            self._in_use.discard(id(executor))
+        if not checked_out or self.size <= 0:
+            self._close(executor)
+            return
+        reset = executor.reset()
+        with self.lock:
+            if not reset:
+                self.discarded += 1
+            elif len(self._idle) + self._pending < self.size:
+                self._idle.append(executor)
+                executor = None
+        if executor is not None:
+            if not reset:
+                logger.warning("Reset of the command executor failed, it is closed")
+            self._close(executor)
+        self._refill()
+
+
+    def warm_up(self) -> None:
+        """Creates the idle executors in the background, up to MIN_IDLE"""
+        self._refill()
+
+    def _refill(self) -> None:
+        with self.lock:
+            missing = min(self.min_idle, self.size) - len(self._idle) - self._pending
+            if missing <= 0:
+                return
+            self._pending += missing
+        for _ in range(missing):
+            threading.Thread(target=self._create_idle, name="ExecutorPool", daemon=True).start()
+
+    def _create_idle(self) -> None:
+        executor = None
+        try:
+            executor = self.create_executor()
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.error("Creating a command executor failed: %s", e)
+        with self.lock:
+            self._pending -= 1
+            if executor is not None:
+                self.created += 1
+                self._idle.append(executor)
+
+
+    def close_all(self) -> None:
+        """Closes the idle executors, e.g. at the end of the process"""
+        with self.lock:
+            idle, self._idle = self._idle, []
+        for executor in idle:
+            self._close(executor)
+
+    def _close(self, executor: CommandExecutor) -> None:
+        with self.lock:
+            self._used.discard(id(executor))
+        try:
+            executor.close()
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.warning("Closing the command executor failed: %s", e)
+
+
+    def stats(self) -> dict:
+        """Returns the size, the usage and the reuse of the pool"""
+        with self.lock:
+            cold_checkouts = self.checkouts - self.warm_hits
+            return {"size": self.size, "idle": len(self._idle), "in_use": len(self._in_use),
+                    "created": self.created, "checkouts": self.checkouts, "warm_hits": self.warm_hits,
+                    "reuses": self.reuses, "reuse_rate": self.reuses / self.checkouts if self.checkouts > 0 else None,
+                    "discarded": self.discarded,
+                    "mean_create_sec": self.total_create_sec / cold_checkouts if cold_checkouts > 0 else None}
@@ -0,0 +1,119 @@
+#!/bin/python
+"""
+I/O reactor multiplexing the output pipes of all shell sessions in one thread (see ShellCommandExecutor).
+
+ATTENTION: This does not work on Windows, as the selectors do not support pipes there!
+"""
+import os
+import logging
+import selectors
+import threading
+from queue import Queue, Empty
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+# Setup logging framework
+if not logging.getLogger().hasHandlers():
+    logging.basicConfig(level=os.getenv('LOGLEVEL', 'INFO').upper(),
+                        format=os.getenv('LOGFORMAT', '%(message)s'))
+logger = logging.getLogger(__name__)
+
+
+class IOReactor:
+    """
+    Waits for data on the registered file descriptors (non-blocking pipes) and passes it to their callbacks.
+    The callbacks run in the thread of the reactor, so they must not block.
+    """
+
+    READ_SIZE = 65536
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+
+    @staticmethod
+    def get_instance() -> "IOReactor":
+        """Returns the reactor of the process, it is started on first use"""
+        with IOReactor._instance_lock:
+            if IOReactor._instance is None:
+                IOReactor._instance = IOReactor()
+            return IOReactor._instance
+
+
+    def __init__(self):
+        self.selector = selectors.DefaultSelector()
+        # registrations are applied by the thread of the reactor, which is woken up by the pipe
+        self._changes = Queue()
+        self._wakeup_read, self._wakeup_write = os.pipe()
+        os.set_blocking(self._wakeup_read, False)
+        os.set_blocking(self._wakeup_write, False)
+        self.selector.register(self._wakeup_read, selectors.EVENT_READ)
+        self._thread = threading.Thread(target=self._run, name="IOReactor", daemon=True)
+        self._thread.start()
+
+
+    def register(self, fd: int, callback) -> None:
+        """
+        Passes the data of the file descriptor to callback(data: bytes), b"" at the end of the stream.
+        The file descriptor is set to non-blocking and unregistered at the end of the stream.
+        """
+        os.set_blocking(fd, False)
+        self._changes.put((fd, callback))
+        self._wakeup()
+
+    def unregister(self, fd: int) -> None:
+        """Stops waiting for data of the file descriptor, e.g. before it is closed"""
+        self._changes.put((fd, None))
+        self._wakeup()
+
+    def _wakeup(self) -> None:
+        try:
+            os.write(self._wakeup_write, b"\0")
+        except BlockingIOError:
+            pass    # a wakeup is pending anyway
+
+
+    def _run(self) -> None:
+        """Loop of the reactor, it sleeps until data arrives"""
+        while True:
+            for key, _ in self.selector.select():
+                if key.fd == self._wakeup_read:
+                    self._apply_changes()
+                    continue
+                try:
+                    data = os.read(key.fd, IOReactor.READ_SIZE)
+                except BlockingIOError:
+                    continue
+                except OSError as e:
+                    logger.error("Error reading from file descriptor %d: %s", key.fd, e)
+                    data = b""
+                if len(data) == 0:
+                    self.selector.unregister(key.fd)
+                self._callback(key.data, data)
+
+    def _apply_changes(self) -> None:
+        """Applies the pending (un-)registrations"""
+        try:
+            while os.read(self._wakeup_read, 1024):
+                pass
+        except BlockingIOError:
+            pass
+        while True:
+            try:
+                fd, callback = self._changes.get_nowait()
+            except Empty:
+                return
+            if fd in self.selector.get_map():
+                self.selector.unregister(fd)
+            if callback is not None:
+                self.selector.register(fd, selectors.EVENT_READ, callback)
+
+    @staticmethod
+    def _callback(callback, data: bytes) -> None:
+        try:
+            callback(data)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            # the reactor must keep running for the other sessions
+            logger.error("Error in the output callback: %s", e)
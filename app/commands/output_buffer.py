@@ -0,0 +1,116 @@
+#!/bin/python
+"""
+Bounded buffer for the output of a command: the head and the tail of the output are kept in memory,
+the full output is spilled to a file in the log directory once it exceeds them.
+"""
+import datetime
+import itertools
+import os
+import logging
+from collections import deque
+from dotenv import load_dotenv
+
+
+load_dotenv()
+
+# Setup logging framework
+if not logging.getLogger().hasHandlers():
+    logging.basicConfig(level=os.getenv('LOGLEVEL', 'INFO').upper(),
+                        format=os.getenv('LOGFORMAT', '%(message)s'))
+logger = logging.getLogger(__name__)
+
+
+class OutputBuffer:
+    """
+    Collects the output of a command in chunks (without copying the output collected so far).
+    The characters between the head and the tail are elided, the full output is in the spill file.
+    """
+
+    HEAD_CHARS = int(os.getenv('COMMAND_OUTPUT_HEAD_CHARS', "32768"))
+    TAIL_CHARS = int(os.getenv('COMMAND_OUTPUT_TAIL_CHARS', "32768"))
+    SPILL_DIR = os.path.join(os.getenv('LOGFILES_DIR', './log'), "output")
+
+    _spill_counter = itertools.count(1)
+
+
+    def __init__(self, head_chars: int|None = None, tail_chars: int|None = None, spill_dir: str|None = None):
+        self.head_chars = head_chars if head_chars is not None else OutputBuffer.HEAD_CHARS
+        self.tail_chars = tail_chars if tail_chars is not None else OutputBuffer.TAIL_CHARS
+        self.spill_dir = spill_dir if spill_dir is not None else OutputBuffer.SPILL_DIR
+
+        self._head = []
+        self._head_length = 0
+        self._tail = deque()
+        self._tail_length = 0
+        self.total_chars = 0
+        self.spill_file : str|None = None
+        self._spill = None
+        self._spill_failed = False
+
+
+    @property
+    def elided_chars(self) -> int:
+        """Number of characters, which are not in memory (only in the spill file)"""
+        return self.total_chars - self._head_length - self._tail_length
+
+
+    def append(self, text: str) -> None:
+        """Appends the text to the output"""
+        if len(text) == 0:
+            return
+        self.total_chars += len(text)
+        if self._spill is not None:
+            self._spill.write(text)
+        elif self.total_chars > self.head_chars + self.tail_chars and not self._spill_failed:
+            self._start_spill(text)
+
+        if self._head_length < self.head_chars:
+            head = text[:self.head_chars - self._head_length]
+            self._head.append(head)
+            self._head_length += len(head)
+            text = text[len(head):]
+            if len(text) == 0:
+                return
+        self._tail.append(text)
+        self._tail_length += len(text)
+        # only the last tail_chars are kept
+        while self._tail_length > self.tail_chars:
+            excess = self._tail_length - self.tail_chars
+            if len(self._tail[0]) <= excess:
+                self._tail_length -= len(self._tail.popleft())
+            else:
+                self._tail[0] = self._tail[0][excess:]
+                self._tail_length -= excess
+
+    def _start_spill(self, text: str) -> None:
+        """Opens the spill file with the output so far (nothing is elided yet)"""
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            self.spill_file = os.path.join(self.spill_dir,
+                                           f"{timestamp}_{os.getpid()}_{next(OutputBuffer._spill_counter)}.log")
+            self._spill = open(self.spill_file, "w", encoding="utf-8")  # pylint: disable=consider-using-with
+        except OSError as e:
+            logger.error("Cannot create the spill file for the command output: %s", e)
+            self.spill_file = None
+            self._spill_failed = True
+            return
+        self._spill.writelines(self._head)
+        self._spill.writelines(self._tail)
+        self._spill.write(text)
+
+
+    def close(self) -> None:
+        """Closes the spill file, the output stays readable"""
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
+
+    def getvalue(self) -> str:
+        """Returns the head and the tail of the output, with a note about the elided characters in between"""
+        if self.elided_chars == 0:
+            return "".join(self._head) + "".join(self._tail)
+        note = f"\n[... {self.elided_chars} characters elided"
+        note += f", full output in {self.spill_file} ...]\n" if self.spill_file is not None else " ...]\n"
+        return "".join(self._head) + note + "".join(self._tail)
@@ -35,7 +35,8 @@ class Parser:
         for line in agent_msg.splitlines():
             if current_code_block is None:
                 line = line.strip()
-            if line.startswith("```"):
+            # the fences may be indented, e.g. in a list
+            if line.lstrip().startswith("```"):
                 if current_code_block is None:
                     # Start of code block
                     current_code_block = Command.parse_command_type(line.replace("```", ""))
@@ -96,6 +97,52 @@ class Parser:
         return commands
 
 
+    @staticmethod
+    def has_closed_shell_block(agent_msg: str) -> bool:
+        """
+        Checks if the (partial) agent output already contains a closed code block with shell commands.
+        Used as stop condition while streaming the agent output.
+
+        :param agent_msg: The agent output received so far
+        :return: True if a shell code block was closed
+        """
+        return ShellBlockDetector()(agent_msg)
+
+
+class ShellBlockDetector:
+    """
+    Stop condition while streaming the agent output, detects the first closed code block with shell commands.
+    The growing output is processed incrementally: every call only looks at the lines received since the last call,
+    and only the closed code block is parsed.
+    """
+
+    def __init__(self):
+        self._offset = 0                    # end of the last complete line processed
+        self._block_start : int|None = None # offset of the opening fence of the current code block
+        self.closed = False
+
+    def __call__(self, agent_msg: str) -> bool:
+        """
+        :param agent_msg: The agent output received so far (the same output, which is extended by each call)
+        :return: True if a shell code block was closed
+        """
+        while not self.closed:
+            end = agent_msg.find("\n", self._offset)
+            if end < 0:
+                break   # the last line is not complete yet
+            start = self._offset
+            self._offset = end + 1
+            if not agent_msg[start:end].strip().startswith("```"):
+                continue
+            if self._block_start is None:
+                self._block_start = start
+                continue
+            commands = Parser().parse(agent_msg[self._block_start:self._offset])
+            self._block_start = None
+            self.closed = any(cmd.type == Command.SHELL for cmd in commands)
+        return self.closed
+
+
 if __name__ == "__main__":
     main_parser = Parser()
     # define a multi-line agent message
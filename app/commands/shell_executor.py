@@ -6,15 +6,19 @@ ATTENTION: This may not work on Windows,
 as the shell commands are written for bash on linux 
 and there are encoding problems between the different platforms!
 """
+import codecs
+import io
 import os
 import logging
 import subprocess
 import threading
-from queue import Queue, Empty
+from collections import deque
 import time
 from dotenv import load_dotenv
 from app.commands.command import Command
 from app.commands.executor import CommandExecutor
+from app.commands.io_reactor import IOReactor
+from app.commands.output_buffer import OutputBuffer
 
 
 load_dotenv()
@@ -29,8 +33,13 @@ logger = logging.getLogger(__name__)
 class ShellCommandExecutor(CommandExecutor):
     """
     Class to execute shell commands in a persistent shell session.
+    The output of stdout and stderr is read by the IOReactor, which serves all shell sessions in one thread,
+    so that waiting for the output does not consume CPU.
     """
 
+    STDOUT = "STDOUT"
+    STDERR = "STDERR"
+
     SHELL = os.getenv('SHELL', '/bin/bash')
     if os.getenv('COMMAND_TIMEOUT', None) is None:
         COMMAND_TIMEOUT = 600
@@ -49,21 +58,22 @@ class ShellCommandExecutor(CommandExecutor):
             stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1,
+            bufsize=0,
         )
         self.current_output = ""
-        self._stdout_queue = Queue()
-        self._stderr_queue = Queue()
+        self._output : OutputBuffer|None = None
+        # complete lines of output (stream, line), filled by the reactor
+        self._lines = deque()
+        self._lines_available = threading.Condition()
+        self._open_streams = 2
 
-        # Start threads to read from stdout and stderr
-        threading.Thread(target=self._enqueue_output,
-            args=(self.shell_process.stdout, self._stdout_queue), daemon=True).start()
-        threading.Thread(target=self._enqueue_output,
-            args=(self.shell_process.stderr, self._stderr_queue), daemon=True).start()
+        # The reactor reads from stdout and stderr
+        reactor = IOReactor.get_instance()
+        reactor.register(self.shell_process.stdout.fileno(), self._create_output_callback(ShellCommandExecutor.STDOUT))
+        reactor.register(self.shell_process.stderr.fileno(), self._create_output_callback(ShellCommandExecutor.STDERR))
 
         # Read the initial shell prompt and send init commands
-        self._send_command_to_shell(["cd ~"])
+        self._send_command_to_shell(["cd ~", CommandExecutor.SNAPSHOT_COMMAND])
 
 
     def execute(self, command: Command) -> int:
@@ -76,14 +86,19 @@ class ShellCommandExecutor(CommandExecutor):
         try:
             #self.current_output = ""
             logger.info("Execute: %s", command.cmds)
-            self._send_command_to_shell(command.cmds)
+            command.exit_code = self._send_command_to_shell(command.cmds, command.output_dir)
             command.output = self.current_output
+            command.elided_chars = self._output.elided_chars
+            command.output_file = self._output.spill_file
+            if command.elided_chars > 0:
+                logger.info("Output of %d characters, the full output is in %s",
+                            self._output.total_chars, command.output_file)
             if len(command.output) >100:
                 logger.info("Output:  %s...", command.output[:100].replace("\n", "\\n"))
             else:
                 logger.info("Output:  %s", command.output.replace("\n", "\\n"))
-            command.exit_code = 0  # Shell commands don't always return standard exit codes
-            return 0
+            logger.info("Exit code: %d", command.exit_code)
+            return command.exit_code
         except subprocess.CalledProcessError as e:
             logger.error("Error executing command: %s; Error: %s", command.cmds, e)
             command.output = self.current_output
@@ -91,42 +106,49 @@ class ShellCommandExecutor(CommandExecutor):
             return 1
 
 
-    def _send_command_to_shell(self, cmds):
+    def _send_command_to_shell(self, cmds, output_dir: str|None = None) -> int:
         """
         Send commands to the persistent shell.
 
         :param cmds: List of shell commands to execute.
+        :param output_dir: Directory of the spill file of a long output (see OutputBuffer).
+        :return: The exit code of the first failed command, 0 if all succeeded.
         """
         self.current_output = ""
+        self._output = OutputBuffer(spill_dir=output_dir)
+        exit_code = 0
 
         for cmd in cmds:
             # Command marker to signal the end of the command
             # format int as hex string
-            command_marker_end = f"COMMAND_{hex(abs(hash(cmd)))}_DONE_MARKER.\n"
+            command_marker_end = f"COMMAND_{hex(abs(hash(cmd)))}_DONE_MARKER."
             if self.shell_process.stdin:
                 # Write the command to the shell
                 logger.debug("  STDIN:  %s", cmd)
                 cmd = cmd.replace('\r\n', '\n')
-                self.shell_process.stdin.write(cmd)
+                self.shell_process.stdin.write(cmd.encode("utf-8"))
 
-                # Signal the end of the command
-                cmd = f"\nprintf '\\n{command_marker_end}\\n'\n"
+                # Signal the end of the command with its exit code
+                # (on both streams, so that stderr is complete too)
+                cmd = f"\nprintf '\\n{command_marker_end} %d\\n' $?; printf '{command_marker_end}\\n' >&2\n"
                 logger.debug("  STDIN:  %s",cmd)
                 cmd = cmd.replace('\r\n', '\n')
-                self.shell_process.stdin.write(cmd)
-
-                # TODO: Retrieve the exit code of the command
-                #    self.shell_process.stdin.write("\necho $?")
-
+                self.shell_process.stdin.write(cmd.encode("utf-8"))
                 self.shell_process.stdin.flush()
 
                 # Read the output until the shell prompt is displayed again
-                self._read_shell_output(command_marker_end)
+                cmd_exit_code = self._read_shell_output(command_marker_end)
+                if exit_code == 0:
+                    exit_code = cmd_exit_code if cmd_exit_code is not None else Command.NO_EXIT_CODE
+        self._output.close()
+        self.current_output = self._output.getvalue()
+        return exit_code
 
 
-    def _read_shell_output(self, command_marker: str, timeout : int = None):
+    def _read_shell_output(self, command_marker: str, timeout : int = None) -> int|None:
         """
-        Read combined stdout and stderr output.
+        Read combined stdout and stderr output into the output buffer.
+        Returns the exit code following the marker, None if the marker was not read (timeout or terminated shell).
         """
         if timeout is None:
             command_timeout = self.COMMAND_TIMEOUT
@@ -136,68 +158,96 @@ class ShellCommandExecutor(CommandExecutor):
             inactivity_timeout = timeout
 
 
-        start_time = time.time()
-        last_activity = time.time()
-        while True:
-            if time.time() - start_time > command_timeout:
-                logger.error("Command-Timeout of %d seconds reached " +\
-                    " while waiting for command to finish", command_timeout)
-                break
-            if time.time() - last_activity > inactivity_timeout:
-                logger.error("Inactivity-Timeout of %d seconds reached " +\
-                    " while waiting for command to finish", inactivity_timeout)
+        start_time = time.monotonic()
+        last_activity = start_time
+        streams_pending = {ShellCommandExecutor.STDOUT, ShellCommandExecutor.STDERR}
+        # the line-break of the last line of stdout is held back, as the one printed before the marker is removed
+        stdout_newline = ""
+        exit_code = None
+        while len(streams_pending) > 0:
+            with self._lines_available:
+                # sleeps until the reactor got a line or one of the timeouts is reached
+                while len(self._lines) == 0 and self._open_streams > 0:
+                    now = time.monotonic()
+                    if now - start_time > command_timeout:
+                        break
+                    if now - last_activity > inactivity_timeout:
+                        break
+                    self._lines_available.wait(min(start_time + command_timeout,
+                                                   last_activity + inactivity_timeout) - now)
+                stream, line = self._lines.popleft() if len(self._lines) > 0 else (None, None)
+
+            if line is None:
+                if self._open_streams == 0:
+                    logger.error("Shell terminated while waiting for command to finish")
+                elif time.monotonic() - start_time > command_timeout:
+                    logger.error("Command-Timeout of %d seconds reached " +\
+                        " while waiting for command to finish", command_timeout)
+                else:
+                    logger.error("Inactivity-Timeout of %d seconds reached " +\
+                        " while waiting for command to finish", inactivity_timeout)
                 break
 
-            try:
-                stdout_line = self._stdout_queue.get_nowait()
-                logger.debug("  STDOUT: %s", stdout_line[:-1])
-                if stdout_line == command_marker:
-                    break
-                if not stdout_line.endswith(command_marker):
-                    self.current_output += stdout_line
-                    last_activity = time.time()
-            except Empty:
-                pass
-
-            try:
-                stderr_line = self._stderr_queue.get_nowait()
-                logger.warning("STDERR: %s", stderr_line[:-1])
-                if stderr_line == command_marker:
-                    break
-                if not stderr_line.endswith(command_marker):
-                    self.current_output += stderr_line
-                    last_activity = time.time()
-            except Empty:
-                pass
-
-            #if self._stdout_queue.empty() and self._stderr_queue.empty():
-            #    break
-
-        # remove the first empty line and the last empty line from self.current_output
-        if self.current_output.startswith("\n"):
-            self.current_output = self.current_output[1:]
-        if self.current_output.endswith("\n\n"):
-            self.current_output = self.current_output[:-2]
-
-
-    def _enqueue_output(self, stream, queue):
+            last_activity = time.monotonic()
+            marker_pos = line.find(command_marker)
+            if marker_pos >= 0:
+                logger.debug("  %s: %s", stream, line[:-1])
+                streams_pending.discard(stream)
+                if stream == ShellCommandExecutor.STDOUT:
+                    exit_code = self._parse_exit_code(line[marker_pos + len(command_marker):])
+                    stdout_newline = ""
+                elif marker_pos > 0:
+                    # the marker follows an incomplete last line of stderr
+                    self._output.append(stdout_newline + line[:marker_pos] + "\n")
+                    stdout_newline = ""
+                continue
+
+            if stream == ShellCommandExecutor.STDOUT:
+                logger.debug("  STDOUT: %s", line[:-1])
+                newline = "\n" if line.endswith("\n") else ""
+                self._output.append(stdout_newline + line[:len(line) - len(newline)])
+                stdout_newline = newline
+            else:
+                logger.warning("STDERR: %s", line[:-1])
+                self._output.append(stdout_newline + line)
+                stdout_newline = ""
+        self._output.append(stdout_newline)
+        return exit_code
+
+
+    @staticmethod
+    def _parse_exit_code(value: str) -> int|None:
+        """Parses the exit code printed after the marker"""
+        try:
+            return int(value.strip())
+        except ValueError:
+            logger.error("Invalid exit code after the command marker: %s", value)
+            return None
+
+
+    def _create_output_callback(self, stream: str):
         """
-        Enqueue output from a given stream (stdout or stderr).
+        Creates the callback of the reactor for the output of a given stream (stdout or stderr),
+        it splits the data into lines (multi-byte characters and line-breaks may be split across reads).
         """
-        # First trial, works well in linux (but raises UnicodeDecodeError on Windows)
-        for line in iter(stream.readline, ''):
-            queue.put(line)
+        decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder("utf-8")(errors="replace"),
+                                               translate=True)
+        partial_line = ""
+
+        def on_output(data: bytes):
+            nonlocal partial_line
+            lines = (partial_line + decoder.decode(data, final=len(data) == 0)).split("\n")
+            partial_line = lines.pop()
+            lines = [line + "\n" for line in lines]
+            if len(data) == 0 and len(partial_line) > 0:
+                lines.append(partial_line)
+            with self._lines_available:
+                self._lines.extend((stream, line) for line in lines)
+                if len(data) == 0:
+                    self._open_streams -= 1
+                self._lines_available.notify()
 
-        # Second trial for windows: ignores UnicodeDecodeError and discards the line completely
-#        while True:
-#            try:
-#                line = stream.readline()
-#                if line:
-#                    queue.put(line)
-#                else:
-#                    break
-#            except (IOError, OSError, UnicodeDecodeError) as e:
-#                logger.error("Error reading output from stream: %s", e)
+        return on_output
 
 
 
@@ -206,7 +256,7 @@ class ShellCommandExecutor(CommandExecutor):
         Close the persistent shell session.
         """
         if self.shell_process:
-            self.shell_process.stdin.write('exit\n')
+            self.shell_process.stdin.write(b'exit\n')
             self.shell_process.stdin.flush()
             self.shell_process.wait()
 
@@ -3,9 +3,12 @@
 SSHCommandExecutor executes commands via a remote SSH shell session. 
 It handles command execution, output collection, inactivity/timeout logic, and is fully thread-safe.
 """
+import codecs
 import os
+import socket
 import threading
 import logging
+import re
 import time
 from queue import Queue, Empty
 import uuid
@@ -13,6 +16,7 @@ import paramiko
 from dotenv import load_dotenv
 from app.commands.command import Command
 from app.commands.executor import CommandExecutor
+from app.commands.output_buffer import OutputBuffer
 
 
 load_dotenv()
@@ -34,10 +38,14 @@ class SSHCommandExecutor(CommandExecutor):
     COMMAND_INACTIVITY_TIMEOUT = int(os.getenv('COMMAND_INACTIVITY_TIMEOUT', "120"))
     SHELLBOX_PORT = int(os.getenv('SHELLBOX_PORT', "22"))
 
+    RECV_SIZE = 32768           # bytes per read of the channel
+    RECV_TIMEOUT = 1.0          # seconds, the reader checks if the channel was closed in between
+
 
     def __init__(self):
         super().__init__()
         self.current_output = ""
+        self._output : OutputBuffer|None = None
         self._stdout_queue = Queue()
         self._stderr_queue = Queue()
 
@@ -50,11 +58,13 @@ class SSHCommandExecutor(CommandExecutor):
         self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
         self._connect()
 
+        # the commands and their output are small messages, which must not wait for Nagle's algorithm
+        self.client.get_transport().sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         self.channel = self.client.invoke_shell()
         self._channel_lock = threading.Lock()
         self._start_output_reader()
 
-        self._run_and_capture(["cd ~"])
+        self._run_and_capture(["cd ~", CommandExecutor.SNAPSHOT_COMMAND])
 
 
     def _connect(self):
@@ -83,36 +93,63 @@ class SSHCommandExecutor(CommandExecutor):
     def _enqueue_output(self):
         """
         Continuously reads output from SSH channel into queues.
+        The reader blocks until data arrives, the data is decoded incrementally
+        (multi-byte characters may be split across reads). None is queued when the channel is closed.
         """
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
         buf = ""
+        self.channel.settimeout(self.RECV_TIMEOUT)
         while True:
-            if self.channel.recv_ready():
-                recv = self.channel.recv(1024).decode("utf-8", errors="ignore")
-                buf += recv
-                while "\n" in buf:
-                    line, buf = buf.split("\n", 1)
+            try:
+                data = self.channel.recv(self.RECV_SIZE)
+            except socket.timeout:
+                if self.channel.closed:
+                    break
+                continue
+            except (OSError, EOFError) as e:
+                logger.warning("Reading from the SSH channel failed: %s", e)
+                break
+            if len(data) == 0:
+                break
+            buf += decoder.decode(data)
+            if "\n" in buf:
+                *lines, buf = buf.split("\n")
+                for line in lines:
                     self._stdout_queue.put(line + "\n")
-            time.sleep(0.1)
+        buf += decoder.decode(b"", final=True)
+        if len(buf) > 0:
+            self._stdout_queue.put(buf)
+        self._stdout_queue.put(None)
 
 
     def execute(self, command: Command) -> int:
         try:
             logger.info("Execute: %s", command.cmds)
-            self.current_output = self._run_and_capture(command.cmds)
+            self.current_output, command.exit_code = self._run_and_capture(command.cmds, command.output_dir)
             command.output = self.current_output
-            command.exit_code = 0
-            return 0
+            command.elided_chars = self._output.elided_chars
+            command.output_file = self._output.spill_file
+            if command.elided_chars > 0:
+                logger.info("Output of %d characters, the full output is in %s",
+                            self._output.total_chars, command.output_file)
+            logger.info("Exit code: %d", command.exit_code)
+            return command.exit_code
         except Exception as exc:
             logger.exception("SSH command failed: %s", exc)
+            if self._output is not None:
+                # the output until the failure
+                self._output.close()
+                self.current_output = self._output.getvalue()
             command.output = self.current_output
-            command.exit_code = 1
-            return 1
+            command.exit_code = Command.NO_EXIT_CODE
+            return command.exit_code
 
 
-    def _run_and_capture(self, cmds) -> str:
+    def _run_and_capture(self, cmds, output_dir: str|None = None) -> tuple[str, int]:
         """
         Send one or multiple commands separated by newlines and
-        return **only** their combined stdout/stderr.
+        return **only** their combined stdout/stderr, and the exit code of the first failed command.
+        A long output is spilled to a file in output_dir (see OutputBuffer).
         """
         # 1) unique token for this round-trip
         token = str(uuid.uuid4()).replace('-', '')
@@ -122,12 +159,12 @@ class SSHCommandExecutor(CommandExecutor):
         # 2) flush queues so we start with a clean slate
         self._drain_queues()
 
-        # 3) build the script to send
-        script_lines = [
-            f"echo {begin}",
-            *cmds,
-            f"echo {end}"
-        ]
+        # 3) build the script to send, the end marker reports the exit code of the first failed command
+        exit_code_var = f"__CMD_EXIT_{token}"
+        script_lines = [f"echo {begin}", f"{exit_code_var}=0"]
+        for cmd in cmds:
+            script_lines += [cmd, f"__CMD_RC_{token}=$?; [ ${exit_code_var} -eq 0 ] && {exit_code_var}=$__CMD_RC_{token}"]
+        script_lines.append(f"echo {end} ${exit_code_var}")
         payload = "\n".join(script_lines) + "\n"
 
         # 4) transmit
@@ -135,29 +172,37 @@ class SSHCommandExecutor(CommandExecutor):
             self.channel.send(payload)
 
         # 5) collect output
-        return self._collect_between_markers(begin, end)
+        return self._collect_between_markers(begin, end, token, output_dir)
 
 
-    def _collect_between_markers(self, begin: str, end: str) -> str:
+    def _collect_between_markers(self, begin: str, end: str, token: str,
+                                 output_dir: str|None = None) -> tuple[str, int]:
         """
         Ignore everything until *begin* appears, then record until *end* appears.
-        Returns the captured text (without the markers themselves).
+        Returns the captured text (without the markers themselves) and the exit code following *end*.
+        Lines with the *token* are the echoed marker commands of the shell (pty), which are left out.
         """
-        buffer = []
+        self._output = OutputBuffer(spill_dir=output_dir)
         started = False
+        end_pattern = re.compile("(^|\r)" + re.escape(end) + " (\\d+)$")
         start_time = time.time()
         last_activity = time.time()
 
         while True:
-            if time.time() - start_time > self.COMMAND_TIMEOUT:
+            now = time.time()
+            if now - start_time > self.COMMAND_TIMEOUT:
                 raise TimeoutError("command timed out")
-            if time.time() - last_activity > self.COMMAND_INACTIVITY_TIMEOUT:
+            if now - last_activity > self.COMMAND_INACTIVITY_TIMEOUT:
                 raise TimeoutError("inactivity timeout")
 
             try:
-                line = self._stdout_queue.get(timeout=0.1)
+                # sleeps until the next line or the next timeout
+                line = self._stdout_queue.get(timeout=min(start_time + self.COMMAND_TIMEOUT,
+                                                          last_activity + self.COMMAND_INACTIVITY_TIMEOUT) - now)
             except Empty:
                 continue
+            if line is None:
+                raise ConnectionError("SSH channel closed")
 
             last_activity = time.time()
             line_strip = line.rstrip("\r\n")
@@ -171,22 +216,26 @@ class SSHCommandExecutor(CommandExecutor):
                 continue
 
             # already inside capture window
-            if line_strip == end:
-                break
-            if line_strip.endswith("\r" + end):
+            end_match = end_pattern.search(line_strip)
+            if end_match is not None:
+                exit_code = int(end_match.group(2))
                 break
 
-            if not line_strip.endswith("echo " + end):
-                buffer.append(line)
+            if token not in line_strip:
+                self._output.append(line)
 
-        return "".join(buffer).rstrip("\r\n")
+        self._output.close()
+        return self._output.getvalue().rstrip("\r\n"), exit_code
 
 
     def _drain_queues(self) -> None:
         """Remove all items currently waiting in stdout/stderr queues."""
         while True:
             try:
-                self._stdout_queue.get_nowait()
+                if self._stdout_queue.get_nowait() is None:
+                    # the channel is closed, which must be noticed by the next command
+                    self._stdout_queue.put(None)
+                    break
             except Empty:
                 break
         while True:
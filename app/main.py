@@ -10,11 +10,6 @@ import argparse
 from dotenv import load_dotenv
 
 from app.version import __version__, __app_name__, __app_description__
-from app.agents.agent_config import AIAgentConfig
-from app.workflow.batch_config import BatchConfig
-from app.workflow.batch_runner import BatchRunner
-from app.workflow.workflow import Workflow
-from app.workflow.workflow_runner import WorkflowRunner
 
 # Setup logging framework
 load_dotenv()
@@ -115,6 +110,11 @@ if __name__ == "__main__":
         server.run()
     else:
         # normal run and exit after execution
+        # imported after parsing the arguments, so that --help and --version start fast
+        from app.workflow.batch_config import BatchConfig
+        from app.workflow.batch_runner import BatchRunner
+        from app.workflow.workflow import Workflow
+        from app.workflow.workflow_runner import WorkflowRunner
 
         if args.workflow_file is None:
             print("Error: No workflow-file or batch.-config specified")
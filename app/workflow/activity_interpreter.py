@@ -5,14 +5,15 @@ ActivityInterpreter module  - Interpreter for Activity instances
 import logging
 import os
 import re
+import time
 from dotenv import load_dotenv
 from app.util.string_utils import escape_linefeed, trunc_right, trunc_middle
-from app.agents.agent_factory import AIAgentFactory
 from app.agents.prompt import Prompt
-from app.commands.executor_factory import ExecutorFactory
+from app.commands.executor_pool import ExecutorPool
 from app.commands.command import Command
-from app.commands.parser import Parser
+from app.commands.parser import Parser, ShellBlockDetector
 from app.workflow.activity import Activity, ActivityVisitor
+from app.workflow.candidate_selector import CandidateSelector
 from app.workflow.workflow import Workflow
 from app.workflow.context import Context
 from app.workflow.writer import WorkflowWriter
@@ -36,6 +37,9 @@ logger = logging.getLogger(__name__)
 class ActivityInterpreter(ActivityVisitor):
     """Interprets the activities"""
 
+    # minimum interval to write the history while an answer is streamed
+    HISTORY_UPDATE_INTERVAL_SEC = 1.0
+
     def __init__(self, context : Context, history : History | None = None):
         self.context = context
         self.history = history
@@ -44,6 +48,10 @@ class ActivityInterpreter(ActivityVisitor):
         self.is_in_onfailed = False
         self.workflow_ended = False
         self.next_activity : Activity | None = None
+        # a CHECK failed since the last candidates were generated, so a retry may take an unused one
+        self.is_retry = False
+        # the last PROMPT, whose answer a following CHECK may validate
+        self.last_prompt : Activity | None = None
 
 
 
@@ -119,6 +127,21 @@ class ActivityInterpreter(ActivityVisitor):
         self._save_history(activity, f"{Activity.Kind.CHECK.value}: {activity.expression}",
             self.context.status, self.context.result)
         self.activity_succeeded = OperationInterpreter.interpret_operation(operation, left, right)
+        if self._validates_prompt(activity):
+            # only a CHECK looping back to the PROMPT judges its answer, other CHECKs just branch
+            if not self.activity_succeeded:
+                self.is_retry = True
+            self.context.agent.feedback(self.activity_succeeded)
+
+
+    def _validates_prompt(self, activity: Activity) -> bool:
+        """True if the failure path of the CHECK leads back to the last PROMPT (possibly via SET/ASSIGN activities)"""
+        other = activity.other
+        seen = set()
+        while other is not None and other.kind in (Activity.Kind.SET, Activity.Kind.ASSIGN) and other.name not in seen:
+            seen.add(other.name)
+            other = other.next
+        return other is not None and other is self.last_prompt
 
 
     def visit_prompt(self, activity: Activity) -> None:
@@ -142,17 +165,29 @@ class ActivityInterpreter(ActivityVisitor):
         logger.info("PROMPT: role=%s, content=%s", role,
             escape_linefeed(trunc_right(prompt_content)))
 
+        self.last_prompt = activity
         history_record = self._save_history(activity, f"{Activity.Kind.PROMPT.value}: {prompt_id}",
             self.context.status,
             f"{prompt_content}\n\n---\n\n...")
+        self.context.agent.use_cache = not self._is_enabled("NO_CACHE")
+        is_command_prompt = activity.next is not None and activity.next.kind == Activity.Kind.EXECUTE
+        # only the commands for an EXECUTE are validated (by a selector, see AIAgentCascade)
+        validator = self.context.get_value("AI_CASCADE_VALIDATOR", "")
+        self.context.agent.set_validator(self._create_validator(validator)
+                                         if is_command_prompt and len(validator) > 0 else None)
         if Prompt.SYSTEM == role.lower():
-            # The system prompt starts a new agent
-            self.context.agent = AIAgentFactory.create_agent(self.context.agent.config)
+            # The system prompt starts a new conversation
+            self.context.agent.reset()
             self.context.agent.system(prompt_content)
             self.context.result = ""
         elif Prompt.ASSISTANT == role.lower():
             self.context.agent.advice(None, prompt_content)
             self.context.result = prompt_content
+        elif int(self.context.get_value("AI_CANDIDATES", "1")) > 1 and is_command_prompt:
+            # only the commands for an EXECUTE are worth the candidates
+            self.context.result = self._ask_candidates(prompt_content)
+        elif self._is_enabled("AI_STREAM"):
+            self.context.result = self._ask_stream(prompt_content, history_record)
         else:   #if Prompt.USER == role.lower():
             self.context.result = self.context.agent.ask(prompt_content)
         logger.info("PROMPT: result: %s",
@@ -162,6 +197,49 @@ class ActivityInterpreter(ActivityVisitor):
         self.activity_succeeded = True
 
 
+    def _ask_candidates(self, prompt_content: str) -> str:
+        """
+        Asks the AI-agent for AI_CANDIDATES answers in one request and takes the one chosen by AI_CANDIDATE_SELECTOR,
+        a retry of the same prompt after a failed CHECK takes one of the unused candidates without another request
+        """
+        selector = CandidateSelector.create(self.context.get_value("AI_CANDIDATE_SELECTOR", CandidateSelector.COMMANDS))
+        if self.is_retry:
+            self.is_retry = False
+            candidate = self.context.agent.next_candidate(prompt_content, selector)
+            if candidate is not None:
+                logger.info("PROMPT: retry with an unused candidate, %d left", len(self.context.agent.candidates))
+                return candidate
+        result = self.context.agent.ask_candidates(prompt_content, int(self.context.get_value("AI_CANDIDATES")),
+                                                   selector)
+        return result
+
+
+    @staticmethod
+    def _create_validator(name: str):
+        """Creates a validator of an answer from the candidate selector of the name"""
+        selector = CandidateSelector.create(name)
+        return lambda answer: selector([answer]) is not None
+
+
+    def _ask_stream(self, prompt_content: str, history_record: HistoryRecord | None) -> str:
+        """Streams the answer of the AI-agent, the history record is updated while it is generated"""
+        stop_when = None
+        if self._is_enabled("AI_STREAM_STOP_AFTER_COMMAND"):
+            stop_when = ShellBlockDetector()
+
+        answer = ""
+        last_update = time.perf_counter()
+        for chunk in self.context.agent.ask_stream(prompt_content, stop_when):
+            answer += chunk
+            if history_record is not None and \
+                time.perf_counter() - last_update >= self.HISTORY_UPDATE_INTERVAL_SEC:
+                self._update_history(history_record, f"{prompt_content}\n\n---\n\n{answer}...")
+                last_update = time.perf_counter()
+        logger.info("PROMPT: streamed, time-to-first-token=%s sec, tokens/sec=%s",
+                    self.context.agent.time_to_first_token_sec, self.context.agent.tokens_per_sec)
+        return self.context.agent.last_result
+
+
     def visit_ask(self, activity: Activity) -> None:
         """Ask a question to the user via console"""
         logger.info("EXECUTE: %s", escape_linefeed(trunc_right(self.context.result)))
@@ -188,7 +266,8 @@ class ActivityInterpreter(ActivityVisitor):
 
         command = activity.expression
         if self.context.command_executor is None:
-            self.context.command_executor = ExecutorFactory.create_executor()
+            # a warm session of the pool, it is returned at the end of the workflow run
+            self.context.command_executor = ExecutorPool.get_instance().checkout()
 
         if command is not None and len(command) > 0:
             command = self._render_content(command)
@@ -199,8 +278,14 @@ class ActivityInterpreter(ActivityVisitor):
             self.context.status, "...")
         self.context.result = ""
         history_result = ""
+        exit_code = 0
         for cmd in commands:
+            if self.history is not None:
+                # a long output is written next to the history of the workflow run
+                cmd.output_dir = os.path.join(self.history.history_dir, "output")
             self.context.command_executor.execute(cmd)
+            if exit_code == 0 and cmd.exit_code is not None:
+                exit_code = cmd.exit_code
             history_result += "Input:\n```shell\n"
             for shell_cmd in cmd.cmds:
                 self.context.result += f"$ {shell_cmd}\n"
@@ -211,6 +296,8 @@ class ActivityInterpreter(ActivityVisitor):
             else:
                 self.context.result += "\n"
                 history_result += "```\n\nNo Output\n\n"
+        # the exit code of the first failed command, e.g. for CHECK EXIT_CODE == 0
+        self.context.set_value("EXIT_CODE", str(exit_code))
         if history_record is not None:
             self._update_history(history_record, history_result)
         self.activity_succeeded = True
@@ -314,6 +401,12 @@ class ActivityInterpreter(ActivityVisitor):
         self.activity_succeeded = False
 
 
+    def _is_enabled(self, name: str) -> bool:
+        """Checks if the variable with the given name is set to YES, TRUE, OK (or SUCCESS)"""
+        value = self.context.get_value(name, "")
+        return value.strip().upper() in Activity.Succeeded.__members__
+
+
     def _render_content(self, content: str)->str:
         """Render variables (the placeholders) values into the content (the template)"""
         # find all matches of {{...}} in the content string
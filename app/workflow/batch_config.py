@@ -23,6 +23,7 @@ class BatchConfig:
         self.ai_top_p_values = None
         self.ai_f_penalty_values = None
         self.ai_p_penalty_values = None
+        self.ai_draft_model_names = None   # draft models of local models, null runs without a draft model
 
         # Expected results
         self.expected_length = None
@@ -2,12 +2,16 @@
 """
 Configuration for the AI CodeMentor Batch-Processing Engine
 """
+import json
 import os
 import logging
 from dotenv import load_dotenv
 from app.workflow.batch_config import BatchConfig
+from app.workflow.writer import WorkflowWriter
 from app.agents.agent_config import AIAgentConfig
 from app.agents.agent_factory import AIAgentFactory
+from app.agents.agent_metrics import AgentMetrics
+from app.commands.executor_pool import ExecutorPool
 from app.workflow.workflow_runner import WorkflowRunner
 
 
@@ -24,6 +28,7 @@ class BatchRunner:
     """Batch runner for the AI CodeMentor Batch-Processing Engine"""
     def __init__(self, cfg: BatchConfig):
         self.cfg = cfg
+        self.metrics = AgentMetrics()   # the call metrics of all workflow runs of the batch
 
 
     def run_workflow(self, workflow_file:str, key_values:dict, agent_config:AIAgentConfig):
@@ -35,6 +40,10 @@ class BatchRunner:
 
         # Add the benchmark results to a CSV file
         workflow_runner.write_stats_to_csv(results, self.cfg)
+        agent = workflow_runner.get_agent()
+        if agent is not None:
+            for call in agent.call_metrics:
+                self.metrics.record(call)
 
 
     def run_workflow_configs(self, workflow_file: str):
@@ -57,12 +66,17 @@ class BatchRunner:
                             for p_penalty in self.cfg.ai_p_penalty_values or [AIAgentConfig.get_presence_penalty()]:
                                 os.environ['AI_PRESENCE_PENALTY'] = str(p_penalty)
 
-                                ac = AIAgentConfig(model_name)
-                                if isinstance(self.cfg.key_values, list):
-                                    for key_values in self.cfg.key_values:
-                                        self.run_workflow(workflow_file, key_values, ac)
-                                else:
-                                    self.run_workflow(workflow_file, self.cfg.key_values, ac)
+                                draft_model_names = getattr(self.cfg, "ai_draft_model_names", None) or \
+                                    [os.getenv('AI_TRANSFORMERS_DRAFT_MODEL', '')]
+                                for draft_model_name in draft_model_names:
+                                    os.environ['AI_TRANSFORMERS_DRAFT_MODEL'] = draft_model_name or ''
+
+                                    ac = AIAgentConfig(model_name)
+                                    if isinstance(self.cfg.key_values, list):
+                                        for key_values in self.cfg.key_values:
+                                            self.run_workflow(workflow_file, key_values, ac)
+                                    else:
+                                        self.run_workflow(workflow_file, self.cfg.key_values, ac)
 
 
     def run(self):
@@ -73,6 +87,9 @@ class BatchRunner:
         else:
             main_key_values = self.cfg.key_values
 
+        # the command sessions are started while the first workflow is loaded and prompted
+        ExecutorPool.get_instance().warm_up()
+
         if self.cfg.setup_workflow_file is not None:
             logger.info("Setting up the environment...")
             WorkflowRunner(self.cfg.setup_workflow_file, main_key_values).run()
@@ -87,7 +104,24 @@ class BatchRunner:
         else:
             self.run_workflow_configs(self.cfg.workflow_files)
 
+        self.write_metrics()
+
         if self.cfg.cleanup_workflow_file is not None:
             logger.info("Cleaning up the environment...")
             load_dotenv()   # reload the environment variables
             WorkflowRunner(self.cfg.cleanup_workflow_file, main_key_values).run()
+
+
+    def write_metrics(self):
+        """
+        Writes the call metrics of the batch (<name>.calls.csv), their summary (<name>.metrics.json)
+        and the usage of the command executor pool (<name>.executors.json)
+        """
+        directory = os.path.abspath(WorkflowWriter.LOGFILES_DIR)
+        os.makedirs(directory, exist_ok=True)
+        name = os.path.basename(self.cfg.config_file or "batch").replace(".cfg.json", "")
+        self.metrics.export_csv(os.path.join(directory, f"{name}.calls.csv"))
+        self.metrics.export_json(os.path.join(directory, f"{name}.metrics.json"))
+        with open(os.path.join(directory, f"{name}.executors.json"), "w", encoding="utf-8") as f:
+            json.dump(ExecutorPool.get_instance().stats(), f, indent=2)
+        logger.info("Wrote the metrics of %d calls to %s", len(self.metrics.records), directory)
@@ -0,0 +1,40 @@
+#!/bin/python
+"""Selects one of the candidate answers of a PROMPT (see AI_CANDIDATES and AI_CANDIDATE_SELECTOR)"""
+
+import re
+from app.commands.parser import Parser
+
+
+class CandidateSelector:
+    """
+    Registry of the selectors, which choose one of the candidate answers of a prompt.
+    A selector is a function returning the index of the chosen candidate, or None if no candidate fits.
+    """
+
+    FIRST = "first"         # the first candidate
+    COMMANDS = "commands"   # the first candidate containing commands to execute
+    REGEX = "regex:"        # the first candidate matching the regular expression, e.g. regex:git clone
+
+    _selectors : dict = {
+        FIRST: lambda candidates: 0 if len(candidates) > 0 else None,
+        COMMANDS: lambda candidates: next(
+            (i for i, candidate in enumerate(candidates) if len(Parser().parse(candidate)) > 0), None),
+    }
+
+
+    @staticmethod
+    def register(name: str, selector) -> None:
+        """Registers a selector function (list of candidates -> index or None) by name"""
+        CandidateSelector._selectors[name] = selector
+
+
+    @staticmethod
+    def create(name: str):
+        """Returns the selector function of the name, raises a ValueError if it is unknown"""
+        if name.startswith(CandidateSelector.REGEX):
+            pattern = re.compile(name[len(CandidateSelector.REGEX):], re.MULTILINE)
+            return lambda candidates: next(
+                (i for i, candidate in enumerate(candidates) if pattern.search(candidate) is not None), None)
+        if name not in CandidateSelector._selectors:
+            raise ValueError(f"Unknown candidate selector: {name}")
+        return CandidateSelector._selectors[name]
@@ -144,6 +144,9 @@ class WorkflowInterpreter:
         history_record = self._save_history(activity,
                 f"{Activity.Kind.CALL.value}: {sub_workflow_name}", Workflow.Status.DOING, "...")
         (sub_status, sub_result) = sub_interpreter.run(sub_context)
+        if self.context.command_executor is None:
+            # the session checked out by the sub-workflow is used (and returned) by the calling workflow
+            self.context.command_executor = sub_context.command_executor
         logger.info("CALL: Sub-Workflow %s completed with %s, Result:%s",
             sub_workflow_name, sub_status, escape_linefeed(trunc_right(sub_result)))
         self.context.status = sub_status
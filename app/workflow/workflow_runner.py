@@ -4,7 +4,10 @@ WorkflowRunner class to run the AI CodeMentor Workflow
 """
 
 import datetime
+import json
+import logging
 import os
+from dotenv import load_dotenv
 from app.workflow.workflow import Workflow
 from app.workflow.reader import WorkflowReader
 from app.workflow.writer import WorkflowWriter
@@ -13,13 +16,39 @@ from app.workflow.context import Context
 from app.workflow.batch_config import BatchConfig
 from app.agents.agent_factory import AIAgentFactory
 from app.commands.shell_executor import ShellCommandExecutor
+from app.commands.executor_pool import ExecutorPool
 from app.agents.agent_config import AIAgentConfig
 
 
+load_dotenv()
+
+# Setup logging framework
+if not logging.getLogger().hasHandlers():
+    logging.basicConfig(level=os.getenv('LOGLEVEL', 'INFO').upper(),
+                        format=os.getenv('LOGFORMAT', '%(message)s'))
+logger = logging.getLogger(__name__)
+
+
 class WorkflowRunner:
     """
     WorkflowRunner class to run the AI CodeMentor Workflow
     """
+
+    # columns of the benchmarking CSV file
+    CSV_HEADER = "nr;sourcefile;label;"+\
+                 "cfg_model;cfg_temperature;cfg_top_p;cfg_f_penalty;cfg_p_penalty;"+\
+                 "run_timestamp;run_duration_sec;" +\
+                 "result_status;result_file;result_length;"+\
+                 "total_duration_sec;total_iterations;"+\
+                 "total_prompt_tokens;total_completion_tokens;total_tokens;"+\
+                 "total_prompt_chars;total_completion_chars;total_chars;"+\
+                 "score_result_length;score_result_facts;"+\
+                 "cache_hits;cache_misses;"+\
+                 "cached_prompt_tokens;uncached_prompt_tokens;"+\
+                 "queue_wait_sec;"+\
+                 "draft_model;draft_acceptance_rate;draft_speedup;"+\
+                 "calls;errors;retries;latency_p50_sec;latency_p95_sec\n"
+
     def __init__(self, workflow_file, key_values:dict):
         self.workflow_file = workflow_file
         self.key_values = key_values
@@ -55,7 +84,12 @@ class WorkflowRunner:
         self.context = Context(main_workflow,
                                special_config,
                                None)
-        results = main_interpreter.run(self.context)
+        try:
+            results = main_interpreter.run(self.context)
+        finally:
+            if self.context.command_executor is not None:
+                ExecutorPool.get_instance().checkin(self.context.command_executor)
+                self.context.command_executor = None
         self.duration_sec = (datetime.datetime.now() - self.start_time).total_seconds()
         return results
 
@@ -85,19 +119,21 @@ class WorkflowRunner:
             if not os.path.exists(self.results_dir):
                 os.makedirs(self.results_dir)
 
+        if os.path.exists(self.csv_file):
+            with open(self.csv_file, "r", encoding="utf-8") as f:
+                lines = f.readlines()
+            if len(lines) > 0 and lines[0] == WorkflowRunner.CSV_HEADER:
+                self.counter = len(lines)
+            else:
+                # written with other columns (e.g. by an older version), the rows would not match the header
+                timestamp = datetime.datetime.fromtimestamp(os.path.getmtime(self.csv_file)).strftime("%Y%m%d_%H%M%S")
+                rotated_file = self.csv_file.replace(".csv", f".{timestamp}.csv")
+                logger.warning("The columns of %s changed, it is renamed to %s", self.csv_file, rotated_file)
+                os.replace(self.csv_file, rotated_file)
         if not os.path.exists(self.csv_file):
             with open(self.csv_file, "w", encoding="utf-8") as f:
-                f.write("nr;sourcefile;label;"+\
-                        "cfg_model;cfg_temperature;cfg_top_p;cfg_f_penalty;cfg_p_penalty;"+\
-                        "run_timestamp;run_duration_sec;" +\
-                        "result_status;result_file;result_length;"+\
-                        "total_duration_sec;total_iterations;"+\
-                        "total_prompt_tokens;total_completion_tokens;total_tokens;"+\
-                        "total_prompt_chars;total_completion_chars;total_chars;"+\
-                        "score_result_length;score_result_facts\n")
-        else:
-            with open(self.csv_file, "r", encoding="utf-8") as f:
-                self.counter = len(f.readlines())
+                f.write(WorkflowRunner.CSV_HEADER)
+            self.counter = 1
 
         return self.csv_file
 
@@ -147,6 +183,8 @@ class WorkflowRunner:
                 result_file_name += f"_{agent.frequency_penalty}"
             if cfg.ai_p_penalty_values is not None:
                 result_file_name += f"_{agent.presence_penalty}"
+            if getattr(cfg, "ai_draft_model_names", None) is not None:
+                result_file_name += f"_{getattr(agent, 'draft_model_name', None) or 'no-draft'}"
             result_file_name += ".md"
             result_file_name = result_file_name.replace(" ","_").replace(":","_").replace("/","_")
             result_file_path = os.path.join(self.results_dir, result_file_name)
@@ -159,9 +197,9 @@ class WorkflowRunner:
             if agent is not None:
                 f.write(f"{agent.total_duration_sec};"+\
                         f"{agent.total_iterations};")
-                f.write(f"{agent.total_prompt_tokens if agent.total_prompt_tokens is not None else ""};"+\
-                        f"{agent.total_completion_tokens if agent.total_completion_tokens is not None else ""};"+\
-                        f"{agent.total_tokens if agent.total_tokens is not None else ""};")
+                f.write(f"{agent.total_prompt_tokens if agent.total_prompt_tokens is not None else ''};"+\
+                        f"{agent.total_completion_tokens if agent.total_completion_tokens is not None else ''};"+\
+                        f"{agent.total_tokens if agent.total_tokens is not None else ''};")
                 f.write(f"{agent.total_prompt_chars};"+\
                         f"{agent.total_completion_chars};"+\
                         f"{agent.total_chars};")
@@ -174,6 +212,30 @@ class WorkflowRunner:
             content_items_score = cfg.score_result_facts(result_content)
             f.write(f"{content_items_score};")
 
+            if agent is not None:
+                f.write(f"{agent.cache_hits};"+\
+                        f"{agent.cache_misses};")
+                if agent.total_prompt_tokens is not None:
+                    f.write(f"{agent.total_cached_prompt_tokens};"+\
+                            f"{agent.total_prompt_tokens - agent.total_cached_prompt_tokens};")
+                else:
+                    f.write(";;")
+                f.write(f"{agent.total_queue_wait_sec};")
+                draft_acceptance_rate = getattr(agent, "draft_acceptance_rate", None)
+                draft_speedup = getattr(agent, "draft_speedup", None)
+                f.write(f"{getattr(agent, 'draft_model_name', None) or ''};"+\
+                        f"{draft_acceptance_rate if draft_acceptance_rate is not None else ''};"+\
+                        f"{draft_speedup if draft_speedup is not None else ''};")
+                latency_p50 = agent.latency_percentile(50)
+                latency_p95 = agent.latency_percentile(95)
+                f.write(f"{len(agent.call_metrics)};"+\
+                        f"{sum(1 for call in agent.call_metrics if call.error is not None)};"+\
+                        f"{agent.total_retries};"+\
+                        f"{latency_p50 if latency_p50 is not None else ''};"+\
+                        f"{latency_p95 if latency_p95 is not None else ''};")
+            else:
+                f.write(";;;;;;;;;;;;;")
+
             f.write("\n")
             f.flush()
             self.counter += 1
@@ -182,42 +244,60 @@ class WorkflowRunner:
     def write_stats_to_jsonfile(self, results:tuple[Workflow.Status, str]):
         """Scores the workflow results and writes to a JSON file"""
         json_file = self.workflow_file.replace(".wf.md", ".stats.json")
-        with open(json_file, "w", encoding="utf-8") as f:
-            f.write("{\n")
-
-            # Data of configuration
-            agent = self.get_agent()
-            if agent is not None:
-                f.write("\t\"config\": {\n" +\
-                        f"\t\t\"model_name\":\"{agent.model_name}\",\n"+\
-                        f"\t\t\"temperature\":\"{agent.temperature}\",\n"+\
-                        f"\t\t\"top_p\":\"{agent.top_p}\",\n"+\
-                        f"\t\t\"frequency_penalty\":\"{agent.frequency_penalty}\",\n"+\
-                        f"\t\t\"presence_penalty\":\"{agent.presence_penalty}\",\n"+\
-                        "\t},\n")
+        stats = {}
+
+        # Data of configuration
+        agent = self.get_agent()
+        if agent is not None:
+            stats["config"] = {"model_name": agent.model_name,
+                               "temperature": agent.temperature,
+                               "top_p": agent.top_p,
+                               "frequency_penalty": agent.frequency_penalty,
+                               "presence_penalty": agent.presence_penalty}
+
+        # Data of workflow run
+        result_status, result_content  = results
+        stats["start_time"] = self.start_time.strftime("%Y-%m-%d %H:%M:%S")
+        stats["duration_sec"] = self.duration_sec
+        stats["result_status"] = str(result_status)
+        stats["result_length"] = len(result_content)
+
+        # AI-Agent Statistics
+        if agent is not None:
+            statistics = {"total_duration_sec": agent.total_duration_sec,
+                          "total_iterations": agent.total_iterations,
+                          "total_prompt_tokens": agent.total_prompt_tokens,
+                          "total_completion_tokens": agent.total_completion_tokens,
+                          "total_tokens": agent.total_tokens,
+                          "total_prompt_chars": agent.total_prompt_chars,
+                          "total_completion_chars": agent.total_completion_chars,
+                          "total_chars": agent.total_chars,
+                          "cache_hits": agent.cache_hits,
+                          "cache_misses": agent.cache_misses}
+            if agent.total_prompt_tokens is not None:
+                statistics["cached_prompt_tokens"] = agent.total_cached_prompt_tokens
+                statistics["uncached_prompt_tokens"] = agent.total_prompt_tokens - agent.total_cached_prompt_tokens
+            statistics["queue_wait_sec"] = agent.total_queue_wait_sec
+            if getattr(agent, "draft_model_name", None) is not None:
+                statistics["draft_model"] = agent.draft_model_name
+                statistics["draft_acceptance_rate"] = agent.draft_acceptance_rate
+                statistics["draft_speedup"] = agent.draft_speedup
+            if getattr(agent, "hedged", None) is not None:
+                statistics["hedge_tiers"] = agent.tier_stats()
+                statistics["hedge_delay_sec"] = agent.hedge_delay()
+                statistics["hedge_rate"] = agent.hedge_rate
+                statistics["hedge_win_rate"] = agent.win_rate
+                statistics["hedge_failovers"] = agent.failovers
+            elif getattr(agent, "tiers", None) is not None:
+                statistics["cascade_tiers"] = agent.tier_stats()
+                statistics["cascade_escalations"] = agent.escalations
+                statistics["cascade_latency_saving_sec"] = agent.latency_saving_sec
+            statistics["calls"] = len(agent.call_metrics)
+            statistics["errors"] = sum(1 for call in agent.call_metrics if call.error is not None)
+            statistics["retries"] = agent.total_retries
+            statistics["latency_p50_sec"] = agent.latency_percentile(50)
+            statistics["latency_p95_sec"] = agent.latency_percentile(95)
+            stats["statistics"] = statistics
 
-            # Data of workflow run
-            result_status, result_content  = results
-            timestamp = self.start_time.strftime("%Y-%m-%d %H:%M:%S")
-            f.write(f"\"start_time\": \"{timestamp}\",\n"+\
-                    f"\"duration_sec\": \"{self.duration_sec}\",\n"+\
-                    f"\"result_status\": \"{result_status}\",\n"+\
-                    f"\"result_length\": \"{len(result_content)}\",\n")
-
-            # AI-Agent Statistics
-            if agent is not None:
-                f.write("\t\"statistics\": {\n")
-                f.write(f"\t\t\"total_duration_sec\":\"{agent.total_duration_sec}\",\n"+\
-                        f"\t\t\"total_iterations\":\"{agent.total_iterations}\",\n")
-                f.write("\t\t\"total_prompt_tokens\":"+\
-                        f"\"{agent.total_prompt_tokens if agent.total_prompt_tokens is not None else ""}\",\n"+\
-                        "\t\t\"total_completion_tokens\":"+\
-                        f"\"{agent.total_completion_tokens if agent.total_completion_tokens is not None else ""}\",\n"+\
-                        "\t\t\"total_tokens\":"+\
-                        f"\"{agent.total_tokens if agent.total_tokens is not None else ""}\",\n")
-                f.write(f"\t\t\"total_prompt_chars\":\"{agent.total_prompt_chars}\",\n"+\
-                        f"\t\t\"total_completion_chars\":\"{agent.total_completion_chars}\",\n"+\
-                        f"\t\t\"total_chars\":\"{agent.total_chars}\",\n")
-                f.write("\t},\n")
-
-            f.write("}\n")
+        with open(json_file, "w", encoding="utf-8") as f:
+            json.dump(stats, f, indent=4)
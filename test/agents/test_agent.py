@@ -2,6 +2,7 @@
 """UnitTests for AIAgent"""
 
 import unittest
+import asyncio
 from app.agents.agent import AIAgent
 from app.agents.agent_config import AIAgentConfig
 from app.agents.prompt import Prompt
@@ -47,5 +48,83 @@ class TestAIAgent(unittest.TestCase):
         self.assertEqual(self.agent.messages[1].content, answer)
         self.assertEqual(self.agent.last_result, answer)
 
+    def test_reset(self):
+        """Test that a reset starts a new conversation, but keeps the telemetry"""
+        self.agent.system("You are a helpful assistant")
+        self.agent.advice("What is the answer to life, the universe and everything?", "42")
+        chars = self.agent.total_chars
+        self.agent.reset()
+        self.assertEqual(len(self.agent.messages), 0)
+        self.assertIsNone(self.agent.last_result)
+        self.assertEqual(self.agent.total_chars, chars)
+
+    def test_user_prompt_async(self):
+        """Test storing a user prompt via the async API"""
+        prompt = "What is the answer to life, the universe and everything?"
+        asyncio.run(self.agent.system_async("You are a helpful assistant"))
+        result = asyncio.run(self.agent.ask_async(prompt))
+        self.assertEqual(result, prompt)
+        self.assertEqual(len(self.agent.messages), 2)
+        self.assertEqual(self.agent.messages[1].role, Prompt.USER)
+
+    def test_complete_async(self):
+        """Test that the async completion records the answer and telemetry"""
+        async def send_async():
+            await asyncio.sleep(0.01)
+            return "42"
+        self.agent.ask("What is the answer to life, the universe and everything?")
+        result = asyncio.run(self.agent._complete_async(send_async))
+        self.assertEqual(result, "42")
+        self.assertEqual(self.agent.messages[-1].role, Prompt.ASSISTANT)
+        self.assertEqual(self.agent.total_iterations, 2)
+        self.assertGreater(self.agent.total_duration_sec, 0.0)
+
+    def test_complete_stream(self):
+        """Test that streaming records the answer and is cancelled by the stop condition"""
+        closed = []
+        def send_stream():
+            try:
+                for chunk in ["Run:\n", "```bash\n", "ls\n", "```\n", "and a lot ", "of chatter"]:
+                    yield chunk
+            finally:
+                closed.append(True)
+        self.agent.ask("List the files")
+        chunks = list(self.agent._complete_stream(send_stream,
+            lambda answer: answer.endswith("```\n")))
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(closed, [True])
+        self.assertEqual(self.agent.messages[-1].role, Prompt.ASSISTANT)
+        self.assertEqual(self.agent.last_result, "Run:\n```bash\nls\n```\n")
+        self.assertIsNotNone(self.agent.time_to_first_token_sec)
+        self.assertIsNotNone(self.agent.tokens_per_sec)
+
+    def test_complete_stream_error(self):
+        """Test that a failed stream does not store the partial answer"""
+        def send_stream():
+            yield "Run:\n"
+            raise ConnectionError("stream interrupted")
+        self.agent.ask("List the files")
+        with self.assertRaises(ConnectionError):
+            list(self.agent._complete_stream(send_stream))
+        self.assertEqual(self.agent.messages[-1].role, Prompt.USER)
+        self.assertIsNotNone(self.agent.call_metrics[-1].error)
+
+        # the stream fails before the first chunk, e.g. the connection cannot be opened
+        def open_stream():
+            raise ConnectionError("connection refused")
+        calls = len(self.agent.call_metrics)
+        with self.assertRaises(ConnectionError):
+            list(self.agent._complete_stream(open_stream))
+        self.assertEqual(len(self.agent.call_metrics), calls + 1)
+        self.assertEqual(self.agent.call_metrics[-1].error, "ConnectionError")
+        self.assertIsNone(self.agent._current_call)
+        self.assertEqual(self.agent.messages[-1].role, Prompt.USER)
+
+    def test_send_not_implemented(self):
+        """Test that the base agent without a vendor fails clearly when candidates are requested"""
+        self.agent.response_cache = None
+        with self.assertRaises(NotImplementedError):
+            self.agent.ask_candidates("List the files", 2)
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,113 @@
+#!/bin/python
+"""UnitTests for AIAgentCascade, with stub agents instead of LLMs"""
+
+import tempfile
+import unittest
+from unittest.mock import patch
+from app.agents.agent_cascade import AIAgentCascade
+from app.agents.agent_config import AIAgentConfig
+from app.agents.agent_factory import AIAgentFactory
+from app.agents.prompt import Prompt
+from app.workflow.activity import Activity
+from app.workflow.candidate_selector import CandidateSelector
+from app.workflow.context import Context
+from app.workflow.interpreter import WorkflowInterpreter
+from app.workflow.workflow import Workflow
+from app.workflow.writer import WorkflowWriter
+from test.stub_agent import StubAgent as BaseStubAgent
+
+
+class StubAgent(BaseStubAgent):
+    """Answers with a fixed answer per model instead of calling a LLM"""
+
+    ANSWERS = {"stub-small": "There is nothing to do.",
+               "stub-large": "```shell\necho ok\n```"}
+
+    def _send(self) -> str:
+        return StubAgent.ANSWERS[self.model_name]
+
+
+class TestAIAgentCascade(unittest.TestCase):
+    """UnitTests for AIAgentCascade"""
+
+    def setUp(self):
+        AIAgentFactory.register_provider("stub-", StubAgent)
+        self.agent = AIAgentFactory.create_agent(AIAgentConfig("cascade:stub-small, stub-large"))
+        self.agent.system("You are a helpful assistant")
+
+    def tearDown(self):
+        AIAgentFactory.unregister_provider("stub-")
+
+    def test_create(self):
+        """Test the creation by the factory"""
+        self.assertIsInstance(self.agent, AIAgentCascade)
+        self.assertEqual([tier.model_name for tier in self.agent.tiers], ["stub-small", "stub-large"])
+        with self.assertRaises(ValueError):
+            AIAgentCascade(AIAgentConfig("cascade:stub-small,"))
+
+    def test_validator(self):
+        """Test that a rejected answer is asked again of the next tier"""
+        selector = CandidateSelector.create(CandidateSelector.COMMANDS)
+        self.agent.set_validator(lambda answer: selector([answer]) is not None)
+        self.assertEqual(self.agent.ask("Print ok"), StubAgent.ANSWERS["stub-large"])
+        self.assertEqual(self.agent.escalations, 1)
+        self.assertEqual(len(self.agent.call_metrics), 2)
+        self.assertEqual(len(self.agent.messages), 3)
+        # the large model got the same conversation
+        large_agent = self.agent.tiers[1].agent
+        self.assertEqual([message.role for message in large_agent.messages],
+                         [Prompt.SYSTEM, Prompt.USER, Prompt.ASSISTANT])
+
+        stats = self.agent.tier_stats()
+        self.assertEqual(stats[0]["hit_rate"], 0.0)
+        self.assertEqual(stats[1]["hit_rate"], 1.0)
+
+    def test_feedback(self):
+        """Test the escalation by a failed CHECK and the return to the cheapest tier"""
+        self.assertEqual(self.agent.ask("Print ok"), StubAgent.ANSWERS["stub-small"])
+        self.agent.feedback(False)
+        self.assertEqual(self.agent.tier, 1)
+        self.assertEqual(self.agent.ask("Try again"), StubAgent.ANSWERS["stub-large"])
+        self.agent.feedback(True)
+        self.assertEqual(self.agent.tier, 0)
+
+        # the small model catches up with the conversation before the next prompt
+        self.assertEqual(self.agent.ask("Next step"), StubAgent.ANSWERS["stub-small"])
+        small_agent = self.agent.tiers[0].agent
+        self.assertEqual([message.content for message in small_agent.messages],
+                         [message.content for message in self.agent.messages])
+        self.assertEqual(self.agent.tiers[0].calls, 2)
+        self.assertEqual(self.agent.tiers[0].rejected, 1)
+        self.assertIsNotNone(self.agent.latency_saving_sec)
+
+    def test_workflow_feedback(self):
+        """Test that only a CHECK looping back to the PROMPT escalates, not a CHECK branching to another path"""
+        workflow = Workflow("Test Workflow cascade")
+        workflow.prompts["User Ask"] = Prompt(Prompt.USER, "Print ok")
+        start = Activity(Activity.Kind.START, "START")
+        prompt = Activity(Activity.Kind.PROMPT, "PROMPT_ASK", "User Ask")
+        branch = Activity(Activity.Kind.CHECK, "CHECK_BRANCH", "RESULT CONTAINS never")
+        check = Activity(Activity.Kind.CHECK, "CHECK_OK", "RESULT CONTAINS echo ok")
+        success = Activity(Activity.Kind.SUCCESS, "SUCCESS")
+        for activity in [start, prompt, branch, check, success]:
+            workflow.activities[activity.name] = activity
+        workflow.start = start
+        start.next = prompt
+        prompt.next = branch
+        branch.next = check
+        branch.other = check
+        check.next = success
+        check.other = prompt
+
+        with tempfile.TemporaryDirectory() as temp_dir, patch.object(WorkflowWriter, "LOGFILES_DIR", temp_dir):
+            context = Context(workflow, AIAgentConfig("cascade:stub-small, stub-large"))
+            status, _ = WorkflowInterpreter(workflow).run(context)
+        self.assertEqual(status, Workflow.Status.SUCCESS)
+        self.assertEqual(context.agent.escalations, 1)
+        self.assertEqual(context.agent.tiers[0].rejected, 1)
+        self.assertEqual(context.agent.tiers[1].rejected, 0)
+        self.assertEqual(context.agent.tier, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
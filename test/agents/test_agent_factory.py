@@ -1,9 +1,14 @@
 #!/bin/python
 """UnitTests for AIAgentFactory"""
 
+import re
+import subprocess
+import sys
 import unittest
 from app.agents.prompt_factory import PromptFactory
 from app.agents.agent_factory import AIAgentFactory
+from app.agents.agent_openai_gpt import AIAgentOpenAIGpt
+from app.agents.agent_openai_instruct import AIAgentOpenAIInstruct
 
 
 class TestAIAgentFactory(unittest.TestCase):
@@ -21,5 +26,36 @@ class TestAIAgentFactory(unittest.TestCase):
         print(f"{result}")
         self.assertIsNotNone(result)
 
+    def test_get_agent_class(self):
+        """Test that the longest registered prefix of the model name wins"""
+        self.assertIs(AIAgentFactory.get_agent_class("gpt-4o-mini"), AIAgentOpenAIGpt)
+        self.assertIs(AIAgentFactory.get_agent_class("gpt-5-nano"), AIAgentOpenAIInstruct)
+        self.assertIs(AIAgentFactory.get_agent_class("o3-mini"), AIAgentOpenAIInstruct)
+        self.assertIsNone(AIAgentFactory.get_agent_class("codellama/CodeLlama-7b-Instruct-hf"))
+
+    def test_register_provider(self):
+        """Test registering a third-party provider, given by class name"""
+        AIAgentFactory.register_provider("custom-", "app.agents.agent_openai_gpt:AIAgentOpenAIGpt")
+        try:
+            self.assertIs(AIAgentFactory.get_agent_class("custom-model"), AIAgentOpenAIGpt)
+        finally:
+            AIAgentFactory.unregister_provider("custom-")
+        self.assertIsNone(AIAgentFactory.get_agent_class("custom-model"))
+
+    def test_import_time(self):
+        """Test that the factories are imported without the SDKs of the providers, within the time budget"""
+        budget_ms = 300
+        for module in ["app.agents.agent_factory", "app.commands.executor_factory"]:
+            output = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c",
+                 f"import sys, {module}; print([m for m in ['openai', 'anthropic', 'google.generativeai', " +\
+                 "'torch', 'paramiko'] if m in sys.modules])"],
+                capture_output=True, text=True, check=True)
+            self.assertEqual(output.stdout.strip(), "[]")
+            cumulative_us = int(re.search(rf"\|\s*(\d+)\s*\| {re.escape(module)}$",
+                                          output.stderr, re.MULTILINE).group(1))
+            self.assertLess(cumulative_us / 1000, budget_ms, f"import time of {module}")
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,100 @@
+#!/bin/python
+"""UnitTests for AIAgentGoogleGemini, without calling the Gemini API"""
+
+import datetime
+import json
+import os
+import tempfile
+import unittest
+from app.agents.agent_config import AIAgentConfig
+from app.agents.response_cache import ResponseCache
+
+try:
+    from app.agents.agent_google_gemini import AIAgentGoogleGemini
+except ImportError:
+    AIAgentGoogleGemini = None
+
+
+@unittest.skipIf(AIAgentGoogleGemini is None, "requires the Google Gemini SDK")
+class TestAIAgentGoogleGemini(unittest.TestCase):
+    """UnitTests for AIAgentGoogleGemini"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.client_secret_file = os.path.join(self.temp_dir.name, "client_secret.json")
+        # a valid token, so that neither the browser flow nor a refresh is needed
+        expiry = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=1)
+        with open(self.client_secret_file.replace(".json", "_token.json"), "w", encoding="utf-8") as f:
+            json.dump({"token": "token", "refresh_token": "refresh-token", "client_id": "client-id",
+                       "client_secret": "client-secret",
+                       "expiry": expiry.replace(tzinfo=None).isoformat() + "Z"}, f)
+
+    def tearDown(self):
+        AIAgentGoogleGemini._credentials.pop(self.client_secret_file, None)
+        self.temp_dir.cleanup()
+
+    def create_agent(self) -> "AIAgentGoogleGemini":
+        """Creates an agent using the client secret file of the test"""
+        config = AIAgentConfig("gemini-2.0-flash-lite")
+        config.google_client_secret_file = self.client_secret_file
+        return AIAgentGoogleGemini(config)
+
+    def test_credentials_cached(self):
+        """Test that the credentials are loaded once and shared by all agents"""
+        agent1 = self.create_agent()
+        os.remove(self.client_secret_file.replace(".json", "_token.json"))
+        agent2 = self.create_agent()
+        self.assertIs(agent1.credentials, agent2.credentials)
+        self.assertTrue(agent2.credentials.valid)
+
+    def test_system_instruction(self):
+        """Test that the system prompt is a native system instruction, without a request"""
+        agent = self.create_agent()
+        agent.system("You are a helpful assistant")
+        self.assertIn("You are a helpful assistant", str(agent.model._system_instruction))
+        self.assertEqual(len(agent.chat_session.history), 0)
+        self.assertEqual(len(agent.call_metrics), 0)
+        self.assertEqual(len(agent.messages), 1)
+
+    def test_cache_hit_rebuilds_session(self):
+        """Test that a request after cached answers is sent with the complete history"""
+        agent = self.create_agent()
+        agent.response_cache = ResponseCache(os.path.join(self.temp_dir.name, "response_cache.db"), 1024, 60)
+        sent = []
+
+        class FakeResponse:     # pylint: disable=too-few-public-methods
+            """Answer of the chat session"""
+            usage_metadata = None
+            candidates = []
+            def __init__(self, text):
+                self.text = text
+
+        class FakeSession:      # pylint: disable=too-few-public-methods
+            """Chat session, which keeps its history like the Gemini SDK"""
+            def __init__(self, history):
+                self.history = list(history)
+            def send_message(self, content, generation_config=None):   # pylint: disable=unused-argument
+                sent.append([message["parts"][0] for message in self.history] + [content])
+                self.history += [{"role": "user", "parts": [content]}, {"role": "model", "parts": ["a"]}]
+                return FakeResponse("a")
+
+        agent.model.start_chat = lambda history: FakeSession(history)
+        agent.chat_session = FakeSession([])
+        for prompt in ["q1", "q2"]:
+            agent.ask(prompt)
+        self.assertEqual(sent, [["q1"], ["q1", "a", "q2"]])
+
+        # the same conversation is answered from the cache, the next miss is sent with the cached turns
+        agent.messages = agent.messages[:0]
+        agent.chat_session = FakeSession([])
+        sent.clear()
+        agent.ask("q1")
+        agent.ask("q2")
+        self.assertEqual(sent, [])
+        agent.ask("q3")
+        self.assertEqual(sent, [["q1", "a", "q2", "a", "q3"]])
+        agent.response_cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/bin/python
+"""UnitTests for AIAgentHedge, with stub agents instead of LLMs"""
+
+import os
+import time
+import unittest
+from app.agents.agent_config import AIAgentConfig
+from app.agents.agent_factory import AIAgentFactory
+from app.agents.agent_hedge import AIAgentHedge
+from test.stub_agent import StubAgent as BaseStubAgent
+
+
+class StubAgent(BaseStubAgent):
+    """Answers with the model name after the delay of the model, instead of calling a LLM"""
+
+    DELAYS = {"stub-fast": 0.0, "stub-slow": 0.0}
+    FAILING = set()
+
+    def _send(self) -> str:
+        if self.model_name in StubAgent.FAILING:
+            raise ConnectionError(f"{self.model_name} is down")
+        time.sleep(StubAgent.DELAYS[self.model_name])
+        return self.model_name
+
+
+class TestAIAgentHedge(unittest.TestCase):
+    """UnitTests for AIAgentHedge"""
+
+    def setUp(self):
+        AIAgentFactory.register_provider("stub-", StubAgent)
+        os.environ["AI_HEDGE_DELAY"] = "0.05"
+        self.agent = AIAgentFactory.create_agent(AIAgentConfig("hedge:stub-slow,stub-fast"))
+        self.agent.system("You are a helpful assistant")
+
+    def tearDown(self):
+        AIAgentFactory.unregister_provider("stub-")
+        del os.environ["AI_HEDGE_DELAY"]
+        StubAgent.DELAYS["stub-slow"] = 0.0
+        StubAgent.FAILING.clear()
+
+    def test_primary(self):
+        """Test that a fast primary model is not hedged"""
+        self.assertIsInstance(self.agent, AIAgentHedge)
+        self.assertEqual(self.agent.ask("Hello"), "stub-slow")
+        self.assertEqual(self.agent.hedge_rate, 0.0)
+        self.assertIsNone(self.agent.win_rate)
+        self.assertIsNone(self.agent.tiers[1].agent)
+
+    def test_hedge(self):
+        """Test that the secondary model answers first when the primary model is slow"""
+        StubAgent.DELAYS["stub-slow"] = 1.0
+        start_time = time.perf_counter()
+        self.assertEqual(self.agent.ask("Hello"), "stub-fast")
+        self.assertLess(time.perf_counter() - start_time, 0.5)
+        self.assertEqual(self.agent.hedge_rate, 1.0)
+        self.assertEqual(self.agent.win_rate, 1.0)
+        self.assertEqual(self.agent.messages[-1].content, "stub-fast")
+        # the primary agent is rebuilt with the conversation on its next use
+        self.assertIsNone(self.agent.tiers[0].agent)
+        StubAgent.DELAYS["stub-slow"] = 0.0
+        self.assertEqual(self.agent.ask("Next"), "stub-slow")
+        self.assertEqual([message.content for message in self.agent.tiers[0].agent.messages],
+                         [message.content for message in self.agent.messages])
+
+    def test_failover(self):
+        """Test that the secondary model answers when the primary model fails"""
+        StubAgent.FAILING.add("stub-slow")
+        self.assertEqual(self.agent.ask("Hello"), "stub-fast")
+        self.assertEqual(self.agent.failovers, 1)
+        self.assertEqual(self.agent.hedged, 0)
+        StubAgent.FAILING.add("stub-fast")
+        with self.assertRaises(ConnectionError):
+            self.agent.ask("Hello again")
+
+    def test_percentile_delay(self):
+        """Test the hedge delay by the observed latencies of the primary model"""
+        os.environ["AI_HEDGE_DELAY"] = "p50"
+        agent = AIAgentHedge(AIAgentConfig("hedge:stub-slow,stub-fast"))
+        self.assertEqual(agent.hedge_delay(), AIAgentHedge.DEFAULT_DELAY_SEC)
+        agent.primary_latencies = [1.0, 2.0, 3.0, 4.0, 5.0]
+        self.assertEqual(agent.hedge_delay(), 3.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+#!/bin/python
+"""UnitTests for AgentMetrics"""
+
+import csv
+import json
+import os
+import tempfile
+import unittest
+from app.agents.agent import AIAgent
+from app.agents.agent_config import AIAgentConfig
+from app.agents.agent_metrics import AgentMetrics, CallMetrics, Histogram
+from app.agents.rate_limiter import RateLimiter
+from test.agents.test_rate_limiter import StubRateLimitError
+
+
+class TestAgentMetrics(unittest.TestCase):
+    """UnitTests for AgentMetrics"""
+
+    def create_call(self, latency_sec: float, model_name: str = "gpt-5-nano") -> CallMetrics:
+        """Creates the metrics of a call with token usage"""
+        call = CallMetrics("openai", model_name)
+        call.latency_sec = latency_sec
+        call.prompt_tokens = 100
+        call.completion_tokens = 20
+        call.finish_reason = "stop"
+        return call
+
+    def test_histogram(self):
+        """Test the percentiles interpolated within the buckets"""
+        histogram = Histogram([1.0, 2.0, 4.0])
+        self.assertIsNone(histogram.percentile(50))
+        for value in [0.5, 1.5, 1.5, 3.0, 10.0]:
+            histogram.observe(value)
+        self.assertEqual(histogram.counts, [1, 2, 1, 1])
+        self.assertEqual(histogram.count, 5)
+        self.assertEqual(histogram.max, 10.0)
+        self.assertGreater(histogram.percentile(50), 1.0)
+        self.assertLessEqual(histogram.percentile(50), 2.0)
+        self.assertEqual(histogram.percentile(100), 10.0)
+
+    def test_percentile(self):
+        """Test the exact percentiles"""
+        self.assertIsNone(AgentMetrics.percentile([], 50))
+        self.assertEqual(AgentMetrics.percentile([3.0, 1.0, 2.0], 50), 2.0)
+        self.assertEqual(AgentMetrics.percentile([1.0, 2.0], 50), 1.5)
+        self.assertEqual(AgentMetrics.percentile([1.0, 2.0, 3.0], 100), 3.0)
+
+    def test_record(self):
+        """Test the counters, the records and the exports"""
+        metrics = AgentMetrics(max_records=3)
+        for latency in [0.2, 0.4, 0.8, 1.6]:
+            metrics.record(self.create_call(latency))
+        failed = self.create_call(0.1, "gpt-5-mini")
+        failed.error = "TimeoutError"
+        failed.retries = 2
+        metrics.record(failed)
+        self.assertEqual(len(metrics.records), 3)
+
+        summary = {model["model_name"]: model for model in metrics.summary()["models"]}
+        self.assertEqual(summary["gpt-5-nano"]["calls"], 4)
+        self.assertEqual(summary["gpt-5-nano"]["prompt_tokens"], 400)
+        self.assertEqual(summary["gpt-5-nano"]["latency_sec"]["count"], 4)
+        self.assertEqual(summary["gpt-5-mini"]["errors"], 1)
+        self.assertEqual(summary["gpt-5-mini"]["retries"], 2)
+
+        prometheus = metrics.to_prometheus()
+        self.assertIn('codementor_agent_calls_total{provider="openai",model="gpt-5-nano"} 4', prometheus)
+        self.assertIn('codementor_agent_latency_seconds_count{provider="openai",model="gpt-5-nano"} 4', prometheus)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            csv_file = os.path.join(temp_dir, "calls.csv")
+            metrics.export_csv(csv_file)
+            metrics.export_csv(csv_file)
+            with open(csv_file, encoding="utf-8") as f:
+                rows = list(csv.DictReader(f, delimiter=";"))
+            self.assertEqual(len(rows), 6)
+            self.assertEqual(rows[-1]["error"], "TimeoutError")
+
+            json_file = os.path.join(temp_dir, "metrics.json")
+            metrics.export_json(json_file)
+            with open(json_file, encoding="utf-8") as f:
+                exported = json.load(f)
+            self.assertEqual(len(exported["models"]), 2)
+            self.assertEqual(len(exported["calls"]), 3)
+
+        metrics.reset()
+        self.assertEqual(metrics.summary()["models"], [])
+
+    def test_agent_calls(self):
+        """Test that the agent records one metrics record per call, incl. the retries"""
+        agent = AIAgent(AIAgentConfig("gpt-5-nano"))
+        agent.response_cache = None
+        agent.metrics_registry = AgentMetrics()
+        agent.rate_limiter = RateLimiter(0, 0, max_retries=2, backoff_sec=0.01)
+        calls = []
+        def send():
+            calls.append(True)
+            if len(calls) == 1:
+                raise StubRateLimitError()
+            agent._record_call_usage(100, 10, 64)
+            agent._record_finish_reason("stop")
+            return "42"
+
+        agent.ask("What is the answer to life, the universe and everything?")
+        agent._complete(send)
+        agent._complete(send)
+        self.assertEqual(len(agent.call_metrics), 2)
+        self.assertEqual(agent.call_metrics[0].retries, 1)
+        self.assertGreater(agent.call_metrics[0].queue_wait_sec, 0.0)
+        self.assertEqual(agent.call_metrics[1].retries, 0)
+        self.assertEqual(agent.call_metrics[1].finish_reason, "stop")
+        self.assertEqual(agent.total_retries, 1)
+        self.assertEqual(agent.total_prompt_tokens, 200)
+        self.assertEqual(agent.total_cached_prompt_tokens, 128)
+        self.assertIsNotNone(agent.latency_percentile(50))
+
+        def fail():
+            raise ValueError("invalid request")
+        with self.assertRaises(ValueError):
+            agent._complete(fail)
+        self.assertEqual(agent.call_metrics[-1].error, "ValueError")
+        self.assertEqual(agent.metrics_registry.summary()["models"][0]["calls"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+#!/bin/python
+"""UnitTests for AIAgentReplay"""
+
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from app.agents.agent_config import AIAgentConfig
+from app.agents.agent_factory import AIAgentFactory
+from app.agents.agent_replay import AIAgentReplay, ReplayTranscript
+from app.workflow.context import Context
+from app.workflow.interpreter import WorkflowInterpreter
+from app.workflow.reader import WorkflowReader
+from app.workflow.workflow import Workflow
+from test.stub_agent import StubAgent as BaseStubAgent
+
+
+class StubAgent(BaseStubAgent):
+    """Answers every prompt with the number of the answer, instead of calling a LLM"""
+
+    PROVIDER = "stub"
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.answers = 0
+
+    def _send(self) -> str:
+        self.answers += 1
+        self._record_call_usage(10 * len(self.messages), 2)
+        self._record_finish_reason("stop")
+        return f"{40 + self.answers}"
+
+
+class TestAIAgentReplay(unittest.TestCase):
+    """UnitTests for AIAgentReplay"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        os.environ["AI_REPLAY_FILE"] = os.path.join(self.temp_dir.name, "transcript.jsonl")
+        AIAgentFactory.register_provider("stub-", StubAgent)
+
+    def tearDown(self):
+        for name in ["AI_REPLAY_FILE", "AI_REPLAY_MODE", "AI_REPLAY_STRICT", "AI_REPLAY_LATENCY"]:
+            os.environ.pop(name, None)
+        AIAgentFactory.unregister_provider("stub-")
+        ReplayTranscript.close_all()
+        self.temp_dir.cleanup()
+
+    def record(self) -> list:
+        """Records a conversation of two prompts, returns the answers"""
+        os.environ["AI_REPLAY_MODE"] = AIAgentReplay.MODE_RECORD
+        agent = AIAgentFactory.create_agent(AIAgentConfig("replay:stub-model"))
+        self.assertIsInstance(agent, AIAgentReplay)
+        self.assertIsInstance(agent.wrapped, StubAgent)
+        agent.system("You are a helpful assistant")
+        answers = [agent.ask("What is the answer?"), agent.ask("Are you sure?")]
+        ReplayTranscript.close_all()
+        os.environ["AI_REPLAY_MODE"] = AIAgentReplay.MODE_REPLAY
+        return answers
+
+    def test_record_replay(self):
+        """Test that the recorded answers and their usage are replayed"""
+        self.assertEqual(self.record(), ["41", "42"])
+        with open(os.environ["AI_REPLAY_FILE"], encoding="utf-8") as f:
+            entries = [json.loads(line) for line in f]
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(entries[1]["model"], "stub-model")
+        self.assertEqual(entries[1]["prompt_tokens"], 40)
+
+        agent = AIAgentFactory.create_agent(AIAgentConfig("replay:stub-model"))
+        self.assertIsNone(agent.wrapped)
+        agent.system("You are a helpful assistant")
+        self.assertEqual(agent.ask("What is the answer?"), "41")
+        self.assertEqual(agent.ask("Are you sure?"), "42")
+        self.assertEqual(agent.total_prompt_tokens, 60)
+        self.assertEqual(agent.call_metrics[-1].finish_reason, "stop")
+
+        # all recorded answers are replayed
+        with self.assertRaises(ValueError):
+            agent.ask("And now?")
+
+    def test_replay_variants(self):
+        """Test the async and streamed replay, the simulated latency and the strict matching"""
+        self.record()
+        os.environ["AI_REPLAY_LATENCY"] = "0.05"
+        agent = AIAgentFactory.create_agent(AIAgentConfig("replay:stub-model"))
+        agent.system("You are a helpful assistant")
+        self.assertEqual(asyncio.run(agent.ask_async("What is the answer?")), "41")
+        self.assertGreaterEqual(agent.call_metrics[-1].latency_sec, 0.05)
+        # not strict: a different request gets the next recorded answer
+        self.assertEqual("".join(agent.ask_stream("Are you really sure?")), "42")
+
+        ReplayTranscript.close_all()
+        os.environ["AI_REPLAY_STRICT"] = "TRUE"
+        agent = AIAgentFactory.create_agent(AIAgentConfig("replay:stub-model"))
+        agent.system("You are a helpful assistant")
+        self.assertEqual(agent.ask("What is the answer?"), "41")
+        with self.assertRaises(ValueError):
+            agent.ask("Are you really sure?")
+
+    def test_candidates(self):
+        """Test that the wrapped agent keeps the candidate chosen by the selector, which is replayed too"""
+        def selector(candidates):
+            return candidates.index(max(candidates))
+        os.environ["AI_REPLAY_MODE"] = AIAgentReplay.MODE_RECORD
+        agent = AIAgentFactory.create_agent(AIAgentConfig("replay:stub-model"))
+        agent.system("You are a helpful assistant")
+        self.assertEqual(agent.ask_candidates("What is the answer?", 3, selector), "43")
+        self.assertEqual(agent.wrapped.messages[-1].content, "43")
+        self.assertEqual(sorted(agent.candidates), ["41", "42"])
+        self.assertEqual([msg.content for msg in agent.wrapped.messages], [msg.content for msg in agent.messages])
+
+        ReplayTranscript.close_all()
+        os.environ["AI_REPLAY_MODE"] = AIAgentReplay.MODE_REPLAY
+        agent = AIAgentFactory.create_agent(AIAgentConfig("replay:stub-model"))
+        agent.system("You are a helpful assistant")
+        self.assertEqual(agent.ask_candidates("What is the answer?", 3, selector), "43")
+
+    def test_workflow(self):
+        """Test running a workflow offline with the replayed answers"""
+        statuses = []
+        results = []
+        for mode in [AIAgentReplay.MODE_RECORD, AIAgentReplay.MODE_REPLAY]:
+            os.environ["AI_REPLAY_MODE"] = mode
+            ReplayTranscript.close_all()
+            workflow = WorkflowReader.load_from_mdfile("tutorial/lesson1.wf.md")
+            context = Context(workflow, AIAgentConfig("replay:stub-model"))
+            status, result = WorkflowInterpreter(workflow).run(context)
+            statuses.append(status)
+            results.append(result)
+        self.assertEqual(statuses, [Workflow.Status.SUCCESS, Workflow.Status.SUCCESS])
+        self.assertEqual(results, ["41", "41"])
+
+
+if __name__ == "__main__":
+    unittest.main()
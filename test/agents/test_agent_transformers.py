@@ -0,0 +1,254 @@
+#!/bin/python
+"""UnitTests for AIAgentTransformers, using a tiny randomly initialized model"""
+
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+from app.agents.agent_config import AIAgentConfig
+
+try:
+    import torch
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+    from transformers import LlamaConfig, LlamaForCausalLM, PreTrainedTokenizerFast
+    from app.agents.agent_transformers import AIAgentTransformers
+    from app.agents.transformers_batcher import TransformersBatcher
+except ImportError:
+    torch = None
+
+
+def create_tiny_model(model_dir: str):
+    """Creates a tiny Llama model with a BPE tokenizer and a chat template in model_dir"""
+    bpe = Tokenizer(models.BPE(unk_token="<unk>"))
+    bpe.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    bpe.decoder = decoders.ByteLevel()
+    trainer = trainers.BpeTrainer(vocab_size=300, special_tokens=["<unk>", "<s>", "</s>", "<pad>"],
+                                  initial_alphabet=pre_tokenizers.ByteLevel.alphabet())
+    bpe.train_from_iterator(["You are a helpful assistant. " +\
+                             "What is the answer to life, the universe and everything? 42"] * 10, trainer)
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=bpe, bos_token="<s>", eos_token="</s>",
+                                        unk_token="<unk>", pad_token="<pad>")
+    tokenizer.chat_template = "{% for m in messages %}<s>{{ m['role'] }}: {{ m['content'] }}</s>{% endfor %}" +\
+        "{% if add_generation_prompt %}<s>assistant: {% endif %}"
+    torch.manual_seed(42)
+    model = LlamaForCausalLM(LlamaConfig(
+        vocab_size=len(tokenizer), hidden_size=32, intermediate_size=64,
+        num_hidden_layers=2, num_attention_heads=4, num_key_value_heads=4,
+        max_position_embeddings=512, bos_token_id=1, eos_token_id=2, pad_token_id=3))
+    tokenizer.save_pretrained(model_dir)
+    model.save_pretrained(model_dir)
+
+
+@unittest.skipIf(torch is None, "requires the packages of requirements-cuda.txt")
+class TestAIAgentTransformers(unittest.TestCase):
+    """UnitTests for AIAgentTransformers"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        cls.model_dir = os.path.join(cls.temp_dir.name, "tiny-llama")
+        create_tiny_model(cls.model_dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        AIAgentTransformers.unload_model()
+        cls.temp_dir.cleanup()
+
+    def create_agent(self) -> "AIAgentTransformers":
+        """Creates an agent using the tiny model with short answers"""
+        return self.create_agent_with_config(AIAgentConfig(self.model_dir))
+
+    def create_agent_with_config(self, config: AIAgentConfig) -> "AIAgentTransformers":
+        """Creates an agent using the configuration with short answers"""
+        agent = AIAgentTransformers(config)
+        agent.response_cache = None
+        agent.max_output_tokens = 8
+        return agent
+
+    def test_ask(self):
+        """Test a conversation with the local model"""
+        agent = self.create_agent()
+        agent.system("You are a helpful assistant")
+        result = agent.ask("What is the answer to life, the universe and everything?")
+        self.assertIsNotNone(result)
+        self.assertEqual(len(agent.messages), 3)
+
+    def test_stop_sequences(self):
+        """Test greedy decoding and stopping at a stop sequence"""
+        agent = self.create_agent()
+        agent.temperature = 0.0
+        agent.max_output_tokens = 16
+        agent.system("You are a helpful assistant")
+        result = agent.ask("What is the answer to life, the universe and everything?")
+        self.assertGreater(len(result), 4)
+
+        stop_sequence = result[len(result)//2:len(result)//2+2]
+        agent.stop_sequences = [stop_sequence]
+        agent.system("You are a helpful assistant")
+        result_stopped = agent.ask("What is the answer to life, the universe and everything?")
+        self.assertEqual(result_stopped, result[:result.index(stop_sequence)].strip())
+
+    def test_kv_cache_reuse(self):
+        """Test that the KV-cache of the previous turns is reused and dropped on a new conversation"""
+        agent = self.create_agent()
+        agent.system("You are a helpful assistant")
+        agent.ask("What is the answer to life, the universe and everything?")
+        self.assertEqual(agent.total_reused_tokens, 0)
+        first_prefill = agent.total_prefill_tokens
+
+        agent.ask("What is the answer to life, the universe and everything?")
+        self.assertGreater(agent.total_reused_tokens, first_prefill // 2)
+        self.assertLess(agent.total_prefill_tokens - first_prefill, first_prefill * 2)
+
+        agent.system("You are a helpful assistant")
+        self.assertIsNone(agent._kv_cache)
+
+    def test_ask_batched(self):
+        """Test that concurrent agents are answered using the batcher"""
+        agents = [self.create_agent() for _ in range(3)]
+        local_model = AIAgentTransformers.get_model(self.model_dir)
+        local_model.batcher = TransformersBatcher(
+            local_model.model, local_model.tokenizer, max_batch_size=3, max_wait_ms=200)
+        try:
+            threads = []
+            for agent in agents:
+                agent.system("You are a helpful assistant")
+                threads.append(threading.Thread(target=agent.ask, args=("What is the answer?",)))
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(local_model.batcher.total_requests, 3)
+            for agent in agents:
+                self.assertEqual(len(agent.messages), 3)
+        finally:
+            local_model.batcher.close()
+            local_model.batcher = None
+
+    def test_batcher(self):
+        """Test that concurrent requests are generated in batches"""
+        local_model = AIAgentTransformers.get_model(self.model_dir)
+        batcher = TransformersBatcher(local_model.model, local_model.tokenizer, max_batch_size=4, max_wait_ms=200)
+        prompts = ["What is the answer?", "You are a helpful assistant", "42", "the universe and everything"]
+        results = [None] * len(prompts)
+        def generate(i):
+            input_ids = local_model.tokenizer(prompts[i], add_special_tokens=False)["input_ids"]
+            results[i] = batcher.generate(input_ids, max_new_tokens=5, do_sample=False)
+        threads = [threading.Thread(target=generate, args=(i,)) for i in range(len(prompts))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        batcher.close()
+
+        self.assertEqual(batcher.total_requests, 4)
+        self.assertLess(batcher.total_batches, 4)
+        for result in results:
+            self.assertLessEqual(len(result), 5)
+
+    def test_model_pool(self):
+        """Test that the models stay resident within the RAM budget and the least-recently-used is evicted"""
+        other_dir = os.path.join(self.temp_dir.name, "tiny-llama-2")
+        create_tiny_model(other_dir)
+        AIAgentTransformers.unload_model()
+        size_mb = AIAgentTransformers.get_model(self.model_dir).size_bytes / (1024 * 1024)
+        try:
+            # both models fit into the budget
+            os.environ["AI_TRANSFORMERS_RAM_BUDGET_MB"] = str(size_mb * 2.5)
+            loads = AIAgentTransformers._load_count
+            evictions = AIAgentTransformers._eviction_count
+            self.assertEqual(AIAgentTransformers.load_model(other_dir), other_dir)
+            self.assertEqual(AIAgentTransformers.load_model(self.model_dir), self.model_dir)
+            self.assertEqual([key[0] for key in AIAgentTransformers._models], [other_dir, self.model_dir])
+            self.assertEqual(AIAgentTransformers._load_count, loads + 1)
+
+            # only one model fits, the least-recently-used is evicted
+            os.environ["AI_TRANSFORMERS_RAM_BUDGET_MB"] = str(size_mb * 1.5)
+            third_dir = os.path.join(self.temp_dir.name, "tiny-llama-3")
+            create_tiny_model(third_dir)
+            agent = AIAgentTransformers(AIAgentConfig(third_dir))
+            self.assertEqual([key[0] for key in AIAgentTransformers._models], [third_dir])
+            self.assertEqual(AIAgentTransformers._eviction_count, evictions + 2)
+
+            # an agent of an evicted model loads it again
+            agent.max_output_tokens = 4
+            agent.response_cache = None
+            AIAgentTransformers.load_model(self.model_dir)
+            agent.system("You are a helpful assistant")
+            self.assertIsNotNone(agent.ask("What is the answer?"))
+            self.assertEqual([key[0] for key in AIAgentTransformers._models], [third_dir])
+        finally:
+            del os.environ["AI_TRANSFORMERS_RAM_BUDGET_MB"]
+            AIAgentTransformers.unload_model()
+
+    def test_context_window(self):
+        """Test that the context window of the model is used, unless it is set by AI_CONTEXT_WINDOW"""
+        agent = self.create_agent()
+        self.assertEqual(agent.context_window.max_tokens, agent.local_model.model.config.max_position_embeddings)
+        with patch.dict(os.environ, {"AI_CONTEXT_WINDOW": "1234"}):
+            agent = self.create_agent()
+        self.assertEqual(agent.context_window.max_tokens, 1234)
+
+    def test_evict_in_flight(self):
+        """Test that an evicted model is released only after the generations in flight"""
+        AIAgentTransformers.unload_model()
+        local_model = AIAgentTransformers.get_model(self.model_dir).acquire()
+        AIAgentTransformers.unload_model()
+        self.assertIsNotNone(local_model.model)
+        self.assertTrue(local_model.release())
+        self.assertIsNone(local_model.model)
+        self.assertIsNotNone(local_model.tokenizer)
+
+        # an agent holding the evicted model generates with the model loaded again
+        agent = self.create_agent()
+        agent.system("You are a helpful assistant")
+        AIAgentTransformers.unload_model()
+        self.assertIsNone(agent.local_model.model)
+        # counting the tokens does not load the model again
+        loads = AIAgentTransformers._load_count
+        self.assertGreater(agent.context_window.count_tokens("What is the answer?"), 0)
+        self.assertEqual(AIAgentTransformers._load_count, loads)
+        self.assertIsNotNone(agent.ask("What is the answer?"))
+        self.assertIsNotNone(agent.local_model.model)
+
+    def test_profiles(self):
+        """Test the inference profiles, each profile is a separate model in the pool"""
+        fp32_model = AIAgentTransformers.get_model(self.model_dir, AIAgentTransformers.PROFILE_FP32)
+        for profile in [AIAgentTransformers.PROFILE_BF16, AIAgentTransformers.PROFILE_INT8]:
+            config = AIAgentConfig(self.model_dir)
+            config.transformers_profile = profile
+            config.transformers_threads = 1
+            agent = AIAgentTransformers(config)
+            agent.response_cache = None
+            agent.max_output_tokens = 4
+            agent.system("You are a helpful assistant")
+            self.assertIsNotNone(agent.ask("What is the answer?"))
+            self.assertEqual(agent.local_model.profile, profile)
+            self.assertLess(agent.local_model.size_bytes, fp32_model.size_bytes)
+
+        with self.assertRaises(ValueError):
+            AIAgentTransformers.get_model(self.model_dir, "fp8")
+
+    def test_assisted_decoding(self):
+        """Test that a draft model speeds up the greedy decoding without changing the answer"""
+        draft_dir = os.path.join(self.temp_dir.name, "tiny-llama-draft")
+        create_tiny_model(draft_dir)
+        results = []
+        for draft_model in [None, draft_dir]:
+            config = AIAgentConfig(self.model_dir)
+            config.transformers_draft_model = draft_model
+            agent = self.create_agent_with_config(config)
+            agent.temperature = 0.0
+            agent.max_output_tokens = 16
+            agent.system("You are a helpful assistant")
+            results.append(agent.ask("What is the answer to life, the universe and everything?"))
+        self.assertEqual(results[0], results[1])
+        # the draft model is a copy of the model, so all proposed tokens are accepted
+        self.assertEqual(agent.draft_acceptance_rate, 1.0)
+        self.assertGreater(agent.draft_speedup, 1.0)
+        self.assertEqual(agent.total_generated_tokens, agent.total_model_steps + agent.total_accepted_tokens)
+
+
+if __name__ == "__main__":
+    unittest.main()
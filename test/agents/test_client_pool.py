@@ -0,0 +1,42 @@
+#!/bin/python
+"""UnitTests for ClientPool"""
+
+import asyncio
+import unittest
+from app.agents.agent_config import AIAgentConfig
+from app.agents.agent_openai_gpt import AIAgentOpenAIGpt
+from app.agents.client_pool import ClientPool
+
+
+class TestClientPool(unittest.TestCase):
+    """UnitTests for ClientPool"""
+
+    def test_get_client(self):
+        """Test that clients are shared per key"""
+        client1 = ClientPool.get_client(("test", "key1"), object)
+        client2 = ClientPool.get_client(("test", "key1"), object)
+        client3 = ClientPool.get_client(("test", "key2"), object)
+        self.assertIs(client1, client2)
+        self.assertIsNot(client1, client3)
+
+    def test_get_async_client(self):
+        """Test that async clients are shared per key within one event loop"""
+        async def get_clients():
+            return (ClientPool.get_async_client(("test", "key1"), object),
+                    ClientPool.get_async_client(("test", "key1"), object))
+        client1, client2 = asyncio.run(get_clients())
+        client3, _ = asyncio.run(get_clients())
+        self.assertIs(client1, client2)
+        self.assertIsNot(client1, client3)
+
+    def test_agents_share_client(self):
+        """Test that agents with the same credentials borrow the same client"""
+        config = AIAgentConfig("gpt-4o-mini")
+        config.openai_api_key = "test_api_key"
+        agent1 = AIAgentOpenAIGpt(config)
+        agent2 = AIAgentOpenAIGpt(config)
+        self.assertIs(agent1.client, agent2.client)
+
+
+if __name__ == "__main__":
+    unittest.main()
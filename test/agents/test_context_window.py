@@ -0,0 +1,121 @@
+#!/bin/python
+"""UnitTests for ContextWindow"""
+
+import os
+import unittest
+from unittest.mock import patch
+from app.agents.agent import AIAgent
+from app.agents.agent_config import AIAgentConfig
+from app.agents.context_window import ContextWindow
+from app.agents.prompt import Prompt
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+
+def count_words(text: str) -> int:
+    """Simple tokenizer for the tests: one token per word"""
+    return len(text.split())
+
+
+class TestContextWindow(unittest.TestCase):
+    """UnitTests for ContextWindow"""
+
+    def setUp(self):
+        self.window = ContextWindow("gpt-5-nano", 10, 60, count_tokens=count_words)
+        self.messages = [
+            Prompt(Prompt.SYSTEM, "You are a helpful assistant"),
+            Prompt(Prompt.USER, "one two three four five six seven eight nine ten"),
+            Prompt(Prompt.ASSISTANT, "one two three four five six seven eight nine ten"),
+            Prompt(Prompt.USER, "What is the answer to life, the universe and everything?"),
+        ]
+
+    def test_get_context_window(self):
+        """Test the context window sizes of the known models"""
+        self.assertEqual(ContextWindow.get_context_window("gpt-4o-mini"), 128000)
+        self.assertEqual(ContextWindow.get_context_window("gpt-3.5-turbo-instruct"), 4096)
+        self.assertEqual(ContextWindow.get_context_window("claude-3-5-haiku-latest"), 200000)
+        self.assertEqual(ContextWindow.get_context_window("unknown-model"),
+                         ContextWindow.DEFAULT_CONTEXT_WINDOW)
+
+    def test_fit_unchanged(self):
+        """Test that a conversation within the context window is not changed"""
+        self.window.max_tokens = 1000
+        self.window.fit(self.messages)
+        self.assertEqual(len(self.messages), 4)
+
+    def test_fit_evict(self):
+        """Test that the oldest turn is evicted, but the system prompt is kept"""
+        total = self.window.fit(self.messages)
+        self.assertLessEqual(total, 50)
+        self.assertEqual([msg.role for msg in self.messages], [Prompt.SYSTEM, Prompt.USER])
+        self.assertEqual(self.messages[0].content, "You are a helpful assistant")
+        self.assertTrue(self.messages[-1].content.startswith("What is the answer"))
+        self.assertEqual(self.window.evicted_messages, 2)
+
+    def test_fit_summarize(self):
+        """Test that the oldest turns are shortened before evicting them"""
+        self.window.policy = ContextWindow.SUMMARIZE
+        self.window.summary_tokens = 4
+        self.window.fit(self.messages)
+        self.assertEqual(len(self.messages), 4)
+        self.assertIn("(truncated)", self.messages[1].content)
+        self.assertEqual(self.window.evicted_messages, 0)
+        self.assertGreater(self.window.summarized_messages, 0)
+
+    def test_fit_overflow(self):
+        """Test that a prompt that does not fit is rejected"""
+        self.messages.append(Prompt(Prompt.USER, "word " * 100))
+        with self.assertRaises(ValueError):
+            self.window.fit(self.messages)
+
+    def test_max_prompt_tokens(self):
+        """Test the fallback to the deprecated AI_MAX_PROMPT_LENGTH"""
+        with patch.dict(os.environ, {"AI_MAX_PROMPT_LENGTH": "2000"}):
+            os.environ.pop("AI_MAX_PROMPT_TOKENS", None)
+            with self.assertLogs("app.agents.context_window", level="WARNING"):
+                ContextWindow._length_deprecation_logged = False
+                self.assertEqual(ContextWindow.get_max_prompt_tokens(), 500)
+            os.environ["AI_MAX_PROMPT_TOKENS"] = "300"
+            self.assertEqual(ContextWindow.get_max_prompt_tokens(), 300)
+        with patch.dict(os.environ, {}):
+            os.environ.pop("AI_MAX_PROMPT_TOKENS", None)
+            os.environ.pop("AI_MAX_PROMPT_LENGTH", None)
+            self.assertEqual(ContextWindow.get_max_prompt_tokens(), 500)
+
+    def test_encoding_unavailable(self):
+        """Test that a failed download of the encoding is logged once and the tokens are approximated"""
+        if tiktoken is None:
+            self.skipTest("requires tiktoken")
+        with patch.object(tiktoken, "encoding_for_model", side_effect=OSError("offline")), \
+             patch.object(ContextWindow, "_encodings", {}), \
+             patch.object(ContextWindow, "_encodings_unavailable", False):
+            with self.assertLogs("app.agents.context_window", level="WARNING") as logs:
+                self.assertEqual(ContextWindow("gpt-4o", 0).count_tokens("12345678"), 2)
+                self.assertEqual(ContextWindow("gpt-5", 0).count_tokens("12345678"), 2)
+            self.assertEqual(len(logs.output), 1)
+
+    def test_truncate(self):
+        """Test truncating an oversized prompt in the middle"""
+        text = " ".join(str(i) for i in range(1000))
+        truncated = self.window.truncate(text, 100)
+        self.assertIn("(truncated)", truncated)
+        self.assertLess(count_words(truncated), 110)
+        self.assertTrue(truncated.startswith("0 1 2"))
+        self.assertTrue(truncated.endswith("998 999"))
+
+    def test_agent_fits_context(self):
+        """Test that the agent fits the messages before sending them"""
+        agent = AIAgent(AIAgentConfig("gpt-5-nano"))
+        agent.context_window = self.window
+        agent.max_output_tokens = 10
+        agent.messages = self.messages
+        agent._complete(lambda: "42")
+        self.assertEqual([msg.role for msg in agent.messages],
+                         [Prompt.SYSTEM, Prompt.USER, Prompt.ASSISTANT])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+#!/bin/python
+"""UnitTests for the provider-side prompt caching, using a local stub server"""
+
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from anthropic import Anthropic
+from openai import OpenAI
+from app.agents.agent_config import AIAgentConfig
+from app.agents.agent_anthropic_claude import AIAgentAnthropicClaude
+from app.agents.agent_openai_gpt import AIAgentOpenAIGpt
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers the Anthropic messages and OpenAI chat completions requests with the received cache markers"""
+
+    def do_POST(self):
+        """Handles the POST requests of the SDK clients"""
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if self.path.endswith("/messages"):
+            blocks = [block for content in [request["system"]] + [msg["content"] for msg in request["messages"]]
+                if isinstance(content, list) for block in content]
+            markers = sum(1 for block in blocks if "cache_control" in block)
+            response = {
+                "id": "msg_stub", "type": "message", "role": "assistant", "model": request["model"],
+                "content": [{"type": "text", "text": f"cache_control={markers}"}],
+                "stop_reason": "end_turn", "stop_sequence": None,
+                "usage": {"input_tokens": 10, "output_tokens": 5,
+                          "cache_creation_input_tokens": 0, "cache_read_input_tokens": 1200},
+            }
+        else:
+            response = {
+                "id": "chatcmpl-stub", "object": "chat.completion", "created": 0, "model": request["model"],
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant",
+                                         "content": f"prompt_cache_key={request.get('prompt_cache_key')}"}}],
+                "usage": {"prompt_tokens": 1500, "completion_tokens": 5, "total_tokens": 1505,
+                          "prompt_tokens_details": {"cached_tokens": 1024}},
+            }
+        body = json.dumps(response).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args): # pylint: disable=redefined-builtin
+        pass
+
+
+class TestPromptCache(unittest.TestCase):
+    """UnitTests for the provider-side prompt caching"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_anthropic_cache_control(self):
+        """Test that the system prompt and the newest prompt are marked as cache breakpoints"""
+        config = AIAgentConfig("claude-3-5-haiku-latest")
+        config.anthropic_api_key = "test_api_key"
+        agent = AIAgentAnthropicClaude(config)
+        agent.client = Anthropic(api_key="test_api_key", base_url=self.base_url)
+        agent.system("You are a helpful assistant")
+        result = agent.ask("What is the answer to life, the universe and everything?")
+        self.assertEqual(result, "cache_control=2")
+        self.assertEqual(agent.total_prompt_tokens, 1210)
+        self.assertEqual(agent.total_cached_prompt_tokens, 1200)
+
+        agent.use_prompt_cache = False
+        self.assertEqual(agent.ask("And why?"), "cache_control=0")
+
+    def test_openai_prompt_cache_key(self):
+        """Test that a stable prompt cache key is sent and the cached tokens are recorded"""
+        config = AIAgentConfig("gpt-4o-mini")
+        config.openai_api_key = "test_api_key"
+        agent = AIAgentOpenAIGpt(config)
+        agent.client = OpenAI(api_key="test_api_key", base_url=self.base_url)
+        agent.system("You are a helpful assistant")
+        result1 = agent.ask("What is the answer to life, the universe and everything?")
+        result2 = agent.ask("And why?")
+        self.assertEqual(result1.strip(), f"prompt_cache_key={agent.prompt_cache_key()}")
+        self.assertEqual(result1, result2)
+        # the usage is accumulated over both calls
+        self.assertEqual(agent.total_prompt_tokens, 3000)
+        self.assertEqual(agent.total_cached_prompt_tokens, 2048)
+        self.assertEqual(agent.call_metrics[-1].prompt_tokens, 1500)
+        self.assertEqual(agent.call_metrics[-1].cached_prompt_tokens, 1024)
+
+        agent.use_prompt_cache = False
+        self.assertEqual(agent.ask("And why not?").strip(), "prompt_cache_key=None")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/bin/python
+"""UnitTests for RateLimiter"""
+
+import asyncio
+import unittest
+from app.agents.agent import AIAgent
+from app.agents.agent_config import AIAgentConfig
+from app.agents.rate_limiter import RateLimiter
+
+
+class StubResponse:
+    """HTTP response of a stub rate limit error"""
+    def __init__(self, headers: dict):
+        self.headers = headers
+
+
+class StubRateLimitError(Exception):
+    """Rate limit error as raised by the vendor SDKs"""
+    def __init__(self, retry_after: str|None = None):
+        super().__init__("Error code: 429")
+        self.status_code = 429
+        self.response = StubResponse({"retry-after": retry_after} if retry_after is not None else {})
+
+
+class TestRateLimiter(unittest.TestCase):
+    """UnitTests for RateLimiter"""
+
+    def test_unlimited(self):
+        """Test that requests are not delayed without limits"""
+        limiter = RateLimiter(0, 0)
+        for _ in range(100):
+            self.assertEqual(limiter.acquire(1000), 0.0)
+        self.assertEqual(limiter.total_requests, 100)
+
+    def test_requests_per_minute(self):
+        """Test that the requests exceeding the RPM budget wait for the bucket to refill"""
+        limiter = RateLimiter(600, 0)   # 10 requests per second
+        for _ in range(600):
+            self.assertEqual(limiter.acquire(), 0.0)
+        waited = limiter.acquire()
+        self.assertGreater(waited, 0.0)
+        self.assertLess(waited, 0.5)
+        self.assertGreater(limiter.total_wait_sec, 0.0)
+
+    def test_tokens_per_minute(self):
+        """Test that the requests exceeding the TPM budget wait for the bucket to refill"""
+        limiter = RateLimiter(0, 6000)  # 100 tokens per second
+        self.assertEqual(limiter.acquire(5990), 0.0)
+        waited = asyncio.run(limiter.acquire_async(20))
+        self.assertGreater(waited, 0.0)
+        self.assertLess(waited, 0.5)
+
+    def test_backoff(self):
+        """Test the jittered exponential backoff and the Retry-After header"""
+        limiter = RateLimiter(0, 0, max_retries=3, backoff_sec=1.0)
+        self.assertIsNone(limiter.backoff(ValueError("other error"), 0))
+        delay = limiter.backoff(StubRateLimitError(), 2)
+        self.assertGreaterEqual(delay, 4.0)
+        self.assertLessEqual(delay, 6.0)
+        delay = limiter.backoff(StubRateLimitError("10"), 0)
+        self.assertGreaterEqual(delay, 10.0)
+        self.assertIsNone(limiter.backoff(StubRateLimitError(), 3))
+
+    def test_agent_retries(self):
+        """Test that the agent retries a request rejected with 429"""
+        agent = AIAgent(AIAgentConfig("gpt-5-nano"))
+        agent.response_cache = None
+        agent.rate_limiter = RateLimiter(0, 0, max_retries=2, backoff_sec=0.01)
+        calls = []
+        def send():
+            calls.append(True)
+            if len(calls) < 3:
+                raise StubRateLimitError()
+            return "42"
+        agent.ask("What is the answer to life, the universe and everything?")
+        self.assertEqual(agent._complete(send), "42")
+        self.assertEqual(len(calls), 3)
+        self.assertGreater(agent.total_queue_wait_sec, 0.0)
+
+        calls.clear()
+        agent.rate_limiter = RateLimiter(0, 0, max_retries=1, backoff_sec=0.01)
+        with self.assertRaises(StubRateLimitError):
+            agent._complete(send)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+#!/bin/python
+"""UnitTests for ResponseCache"""
+
+import os
+import tempfile
+import time
+import unittest
+from app.agents.agent import AIAgent
+from app.agents.agent_config import AIAgentConfig
+from app.agents.response_cache import ResponseCache
+
+
+class TestResponseCache(unittest.TestCase):
+    """UnitTests for ResponseCache"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.temp_dir.name, "response_cache.db")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_put_and_get(self):
+        """Test storing and retrieving a response"""
+        cache = ResponseCache(self.db_file, 1024, 60)
+        self.assertIsNone(cache.get("key1"))
+        cache.put("key1", "gpt-5-nano", "42")
+        self.assertEqual(cache.get("key1"), "42")
+        cache.close()
+
+    def test_ttl(self):
+        """Test that expired responses are not returned"""
+        cache = ResponseCache(self.db_file, 1024, 1)
+        cache.put("key1", "gpt-5-nano", "42")
+        time.sleep(1.1)
+        self.assertIsNone(cache.get("key1"))
+        cache.close()
+
+    def test_lru_eviction(self):
+        """Test that the least-recently-used responses are evicted when the size limit is reached"""
+        cache = ResponseCache(self.db_file, 20, 60)
+        cache.put("key1", "gpt-5-nano", "0123456789")
+        cache.put("key2", "gpt-5-nano", "0123456789")
+        cache.get("key1")   # key2 is now the least-recently-used
+        cache.put("key3", "gpt-5-nano", "0123456789")
+        self.assertEqual(cache.get("key1"), "0123456789")
+        self.assertIsNone(cache.get("key2"))
+        self.assertEqual(cache.get("key3"), "0123456789")
+        cache.close()
+
+    def test_key(self):
+        """Test that the key covers the model parameters and the message history"""
+        agent = AIAgent(AIAgentConfig("gpt-5-nano"))
+        agent.system("You are a helpful assistant")
+        key1 = ResponseCache.create_key(agent)
+        agent.temperature = 0.0
+        key2 = ResponseCache.create_key(agent)
+        agent.ask("What is the answer to life, the universe and everything?")
+        key3 = ResponseCache.create_key(agent)
+        self.assertNotEqual(key1, key2)
+        self.assertNotEqual(key2, key3)
+
+    def test_agent_uses_cache(self):
+        """Test that an identical conversation is answered from the cache"""
+        agent = AIAgent(AIAgentConfig("gpt-5-nano"))
+        agent.response_cache = ResponseCache(self.db_file, 1024, 60)
+        calls = []
+        def send():
+            calls.append(True)
+            return "42"
+
+        for _ in range(2):
+            agent.messages.clear()
+            agent.system("You are a helpful assistant")
+            agent.ask("What is the answer to life, the universe and everything?")
+            self.assertEqual(agent._complete(send), "42")
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(agent.cache_hits, 1)
+        self.assertEqual(agent.cache_misses, 1)
+
+        agent.use_cache = False
+        agent.messages.clear()
+        agent.system("You are a helpful assistant")
+        agent.ask("What is the answer to life, the universe and everything?")
+        agent._complete(send)
+        self.assertEqual(len(calls), 2)
+        agent.response_cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
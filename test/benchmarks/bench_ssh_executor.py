@@ -0,0 +1,48 @@
+#!/bin/python
+"""
+Benchmark: round-trips of SSHCommandExecutor against a local sshd stand-in (see test.commands.test_sshexecutor),
+so the result is the overhead of the executor and the SSH channel, not of the network.
+
+Usage: python -m test.benchmarks.bench_ssh_executor [--commands 200] [--lines 20000]
+"""
+import argparse
+import time
+from app.commands.command import Command
+from app.commands.ssh_executor import SSHCommandExecutor
+from test.commands.test_sshexecutor import LocalSSHServer
+
+
+def run_commands(executor: SSHCommandExecutor, commands: int) -> float:
+    """Executes short commands, returns the commands per second"""
+    start_time = time.perf_counter()
+    for i in range(commands):
+        executor.execute(Command(Command.SHELL, [f"echo {i}"]))
+    return commands / (time.perf_counter() - start_time)
+
+
+def run_verbose_command(executor: SSHCommandExecutor, lines: int) -> tuple[float, int]:
+    """Executes a command with verbose output, returns the duration and the output size in bytes"""
+    start_time = time.perf_counter()
+    command = Command(Command.SHELL, [f"for i in $(seq 1 {lines}); do echo \"[INFO] line $i of the build\"; done"])
+    executor.execute(command)
+    return time.perf_counter() - start_time, len(command.output.encode("utf-8"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the round-trips of SSHCommandExecutor")
+    parser.add_argument("--commands", type=int, default=200)
+    parser.add_argument("--lines", type=int, default=20000)
+    args = parser.parse_args()
+
+    server = LocalSSHServer()
+    server.configure()
+    main_executor = SSHCommandExecutor()
+    try:
+        main_rate = run_commands(main_executor, args.commands)
+        print(f"Short commands: {main_rate:.1f} commands/sec ({1000 / main_rate:.1f} ms per round-trip)")
+        main_duration, main_size = run_verbose_command(main_executor, args.lines)
+        print(f"Verbose command: {main_size / 1024:.0f} KB in {main_duration:.3f} sec " +\
+              f"({main_size / 1024 / 1024 / main_duration:.1f} MB/sec)")
+    finally:
+        main_executor.close()
+        server.close()
@@ -0,0 +1,78 @@
+#!/bin/python
+"""
+Benchmark: tokens/second of concurrent AIAgentTransformers agents on the CPU,
+each prompt generated on its own (pipeline) vs. dynamically batched (TransformersBatcher)
+
+Usage: python -m test.benchmarks.bench_transformers_batching [--model <name>] [--agents 4] [--max-new-tokens 64]
+"""
+import argparse
+import os
+import threading
+import time
+from app.agents.agent_config import AIAgentConfig
+from app.agents.agent_transformers import AIAgentTransformers
+from app.agents.transformers_batcher import TransformersBatcher
+
+
+PROMPTS = [
+    "Explain polymorphism in OOP with a Python sample.",
+    "Explain what is a decorator with a Python sample.",
+    "Write a Java method that reverses a string.",
+    "What is the difference between a list and a tuple in Python?",
+    "Explain the REST verbs GET, POST and PUT.",
+    "Write a bash command that counts the lines of all .java files.",
+    "What is dependency injection in Spring Boot?",
+    "Explain the Big-O notation with an example.",
+]
+
+
+def run_agents(model_name: str, agent_count: int, max_new_tokens: int) -> tuple[float, int]:
+    """Runs one prompt per agent concurrently, returns the duration and the number of generated tokens"""
+    agents = []
+    for i in range(agent_count):
+        agent = AIAgentTransformers(AIAgentConfig(model_name))
+        agent.response_cache = None
+        agent.max_output_tokens = max_new_tokens
+        agent.system("You are a helpful assistant for software engineering tasks.")
+        agents.append(agent)
+
+    threads = [threading.Thread(target=agent.ask, args=(PROMPTS[i % len(PROMPTS)],))
+               for i, agent in enumerate(agents)]
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - start_time
+
+    tokenizer = AIAgentTransformers.get_model(model_name).tokenizer
+    tokens = sum(len(tokenizer(agent.last_result or "", add_special_tokens=False)["input_ids"])
+                 for agent in agents)
+    return duration, tokens
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark dynamic batching of AIAgentTransformers")
+    parser.add_argument("--model", default=os.getenv("AI_MODEL_NAME", "Qwen/Qwen2.5-Coder-0.5B-Instruct"))
+    parser.add_argument("--agents", type=int, default=4)
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=10.0)
+    args = parser.parse_args()
+
+    AIAgentTransformers.load_model(args.model)
+    run_agents(args.model, 1, 4)  # warm-up
+
+    print(f"Model: {args.model}, agents: {args.agents}, max_new_tokens: {args.max_new_tokens}")
+    pipeline_duration, pipeline_tokens = run_agents(args.model, args.agents, args.max_new_tokens)
+    print(f"- pipeline: {pipeline_tokens} tokens in {pipeline_duration:.2f} sec = " +\
+          f"{pipeline_tokens / pipeline_duration:.2f} tokens/sec")
+
+    local_model = AIAgentTransformers.get_model(args.model)
+    local_model.batcher = TransformersBatcher(local_model.model, local_model.tokenizer,
+                                              args.agents, args.max_wait_ms)
+    batched_duration, batched_tokens = run_agents(args.model, args.agents, args.max_new_tokens)
+    print(f"- batched:  {batched_tokens} tokens in {batched_duration:.2f} sec = " +\
+          f"{batched_tokens / batched_duration:.2f} tokens/sec " +\
+          f"({local_model.batcher.total_batches} batches)")
+
+    AIAgentTransformers.unload_model()
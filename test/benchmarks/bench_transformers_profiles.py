@@ -0,0 +1,82 @@
+#!/bin/python
+"""
+Benchmark: load time, peak RSS and tokens/second of the AIAgentTransformers inference profiles
+(fp32, bf16, int8) on the CPU, using the prompts of the workflows/benchmarks summarize workflows.
+Every profile is measured in its own process, so that the peak RSS is not shared.
+
+Usage: python -m test.benchmarks.bench_transformers_profiles [--model <name>] [--profiles fp32,bf16,int8]
+           [--threads 0] [--max-new-tokens 128]
+"""
+import argparse
+import glob
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from app.agents.agent_config import AIAgentConfig
+from app.agents.agent_transformers import AIAgentTransformers
+from app.agents.prompt import Prompt
+from app.workflow.reader import WorkflowReader
+
+
+WORKFLOW_FILES = "benchmarks/summarize-sourcefile_*.wf.md"   # in WorkflowReader.WORKFLOWS_DIR
+
+
+def run_profile(model_name: str, profile: str, threads: int, max_new_tokens: int) -> dict:
+    """Runs the summarize workflow prompts with the profile, returns the measurements"""
+    config = AIAgentConfig(model_name)
+    config.transformers_profile = profile
+    config.transformers_threads = threads
+    agent = AIAgentTransformers(config)
+    agent.response_cache = None
+    agent.temperature = 0.0
+    agent.max_output_tokens = max_new_tokens
+    local_model = agent.local_model
+
+    tokens = 0
+    start_time = time.perf_counter()
+    for workflow_file in sorted(glob.glob(WORKFLOW_FILES, root_dir=WorkflowReader.WORKFLOWS_DIR)):
+        prompts = WorkflowReader.load_from_mdfile(workflow_file).prompts.values()
+        for prompt in prompts:
+            if prompt.role == Prompt.SYSTEM:
+                agent.system(prompt.content)
+            elif prompt.role == Prompt.USER:
+                result = agent.ask(prompt.content)
+                tokens += len(local_model.tokenizer(result or "", add_special_tokens=False)["input_ids"])
+    duration = time.perf_counter() - start_time
+
+    return {
+        "profile": profile,
+        "load_sec": local_model.load_duration_sec,
+        "size_mb": local_model.size_bytes / (1024 * 1024),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "tokens": tokens,
+        "tokens_per_sec": tokens / duration if duration > 0 else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the inference profiles of AIAgentTransformers")
+    parser.add_argument("--model", default=os.getenv("AI_MODEL_NAME", "Qwen/Qwen2.5-Coder-0.5B-Instruct"))
+    parser.add_argument("--profiles", default="fp32,bf16,int8")
+    parser.add_argument("--threads", type=int, default=0, help="intra-op threads, 0 = torch default")
+    parser.add_argument("--max-new-tokens", type=int, default=128)
+    parser.add_argument("--single", action="store_true", help="measure one profile in this process")
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_profile(args.model, args.profiles, args.threads, args.max_new_tokens)))
+        sys.exit(0)
+
+    print(f"Model: {args.model}, threads: {args.threads or 'default'}, max_new_tokens: {args.max_new_tokens}")
+    for main_profile in args.profiles.split(","):
+        output = subprocess.run([sys.executable, "-m", "test.benchmarks.bench_transformers_profiles",
+                                 "--model", args.model, "--profiles", main_profile,
+                                 "--threads", str(args.threads), "--max-new-tokens", str(args.max_new_tokens),
+                                 "--single"], capture_output=True, text=True, check=True).stdout
+        stats = json.loads(output.strip().splitlines()[-1])
+        print(f"- {stats['profile']:5s}: load {stats['load_sec']:.2f} sec, " +\
+              f"model {stats['size_mb']:.1f} MB, peak RSS {stats['peak_rss_mb']:.0f} MB, " +\
+              f"{stats['tokens']} tokens = {stats['tokens_per_sec']:.2f} tokens/sec")
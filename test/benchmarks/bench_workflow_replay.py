@@ -0,0 +1,60 @@
+#!/bin/python
+"""
+Benchmark: overhead of the workflow engine (reader, interpreter, history writer, executor) without LLM calls,
+the answers of the AI-Agent are replayed from a transcript recorded once with the real model (AIAgentReplay).
+
+Usage: python -m test.benchmarks.bench_workflow_replay [--workflow sample-project-eval.wf.md] [--model gpt-5-nano]
+           [--record] [--runs 5] [--latency 0]
+"""
+import argparse
+import os
+import time
+from app.agents.agent_config import AIAgentConfig
+from app.agents.agent_replay import AIAgentReplay, ReplayTranscript
+from app.commands.executor_factory import ExecutorFactory
+from app.workflow.context import Context
+from app.workflow.interpreter import WorkflowInterpreter
+from app.workflow.reader import WorkflowReader
+
+
+def run_workflow(workflow_file: str, model_name: str) -> tuple[str, float, float]:
+    """Runs the workflow once, returns the status, the duration and the time spent in the AI-Agent"""
+    start_time = time.perf_counter()
+    workflow = WorkflowReader.load_from_mdfile(workflow_file)
+    context = Context(workflow, AIAgentConfig(AIAgentReplay.PREFIX + model_name),
+                      ExecutorFactory.create_executor())
+    status, _ = WorkflowInterpreter(workflow).run(context)
+    duration = time.perf_counter() - start_time
+    # sub-workflows have their own agents, so the time is taken from all recorded calls of the process
+    agent_sec = sum(call.latency_sec for call in context.agent.metrics_registry.records)
+    context.agent.metrics_registry.reset()
+    return status.name, duration, agent_sec
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the workflow engine with replayed AI-Agent answers")
+    parser.add_argument("--workflow", default="sample-project-eval.wf.md", help="in the workflows directory")
+    parser.add_argument("--model", default=os.getenv("AI_MODEL_NAME", "gpt-5-nano"))
+    parser.add_argument("--record", action="store_true", help="record the transcript with the real model first")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency", default="0", help="simulated latency in seconds, or 'recorded'")
+    args = parser.parse_args()
+
+    os.environ["AI_REPLAY_LATENCY"] = args.latency
+    if args.record:
+        os.environ["AI_REPLAY_MODE"] = AIAgentReplay.MODE_RECORD
+        main_status, main_duration, main_agent_sec = run_workflow(args.workflow, args.model)
+        print(f"Recorded {args.workflow}: {main_status} in {main_duration:.2f} sec " +\
+              f"(AI-Agent {main_agent_sec:.2f} sec)")
+        ReplayTranscript.close_all()
+
+    os.environ["AI_REPLAY_MODE"] = AIAgentReplay.MODE_REPLAY
+    print(f"Workflow: {args.workflow}, model: {args.model}, runs: {args.runs}, latency: {args.latency}")
+    durations = []
+    for main_run in range(args.runs):
+        ReplayTranscript.close_all()
+        main_status, main_duration, main_agent_sec = run_workflow(args.workflow, args.model)
+        durations.append(main_duration)
+        print(f"- run {main_run + 1}: {main_status} in {main_duration:.3f} sec, " +\
+              f"AI-Agent {main_agent_sec:.3f} sec, engine and executor {main_duration - main_agent_sec:.3f} sec")
+    print(f"Mean: {sum(durations) / len(durations):.3f} sec, min: {min(durations):.3f} sec")
@@ -0,0 +1,146 @@
+#!/bin/python
+"""UnitTests for ExecutorPool"""
+
+import threading
+import time
+import unittest
+from app.commands.command import Command
+from app.commands.executor import CommandExecutor
+from app.commands.executor_pool import ExecutorPool
+from app.commands.shell_executor import ShellCommandExecutor
+
+
+class FakeExecutor(CommandExecutor):
+    """Executor without a session, it counts the resets and closes"""
+
+    def __init__(self, reset_succeeds: bool = True):
+        self.reset_succeeds = reset_succeeds
+        self.resets = 0
+        self.closed = False
+
+    def reset(self) -> bool:
+        self.resets += 1
+        return self.reset_succeeds
+
+    def close(self):
+        self.closed = True
+
+
+class TestExecutorPool(unittest.TestCase):
+    """UnitTests for ExecutorPool"""
+
+    def setUp(self):
+        self.executors = []
+
+    def create_executor(self) -> FakeExecutor:
+        """Factory of the pool under test"""
+        executor = FakeExecutor()
+        self.executors.append(executor)
+        return executor
+
+    def wait_for_idle(self, pool: ExecutorPool, idle: int):
+        """Waits until the background creation of the idle executors is done"""
+        deadline = time.monotonic() + 5
+        while pool.stats()["idle"] < idle and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+
+    def test_reuse(self):
+        """Test that a checked in executor is reset and reused by the next checkout"""
+        pool = ExecutorPool(size=2, min_idle=0, create_executor=self.create_executor)
+        first = pool.checkout()
+        pool.checkin(first)
+        self.assertEqual(first.resets, 1)
+        self.assertFalse(first.closed)
+        second = pool.checkout()
+        self.assertIs(second, first)
+        pool.checkin(second)
+
+        stats = pool.stats()
+        self.assertEqual(stats["created"], 1)
+        self.assertEqual(stats["checkouts"], 2)
+        self.assertEqual(stats["reuses"], 1)
+        self.assertEqual(stats["reuse_rate"], 0.5)
+        pool.close_all()
+        self.assertTrue(first.closed)
+
+
+    def test_warm_up(self):
+        """Test that the idle executors are created in the background and handed out without creating one"""
+        pool = ExecutorPool(size=2, min_idle=1, create_executor=self.create_executor)
+        pool.warm_up()
+        self.wait_for_idle(pool, 1)
+        self.assertEqual(len(self.executors), 1)
+        executor = pool.checkout()
+        self.assertIs(executor, self.executors[0])
+        self.assertEqual(pool.stats()["warm_hits"], 1)
+        pool.checkin(executor)
+        pool.close_all()
+
+
+    def test_failed_reset(self):
+        """Test that an executor, which cannot be reset, is closed and not reused"""
+        pool = ExecutorPool(size=2, min_idle=0, create_executor=lambda: FakeExecutor(reset_succeeds=False))
+        first = pool.checkout()
+        pool.checkin(first)
+        self.assertTrue(first.closed)
+        second = pool.checkout()
+        self.assertIsNot(second, first)
+        self.assertEqual(pool.stats()["discarded"], 1)
+        pool.checkin(second)
+
+
+    def test_exhausted(self):
+        """Test that a checkout creates a new executor when none is idle, only SIZE of them are kept at checkin"""
+        pool = ExecutorPool(size=1, min_idle=0, create_executor=self.create_executor)
+        first = pool.checkout()
+        second = pool.checkout()
+        self.assertIsNot(second, first)
+        pool.checkin(first)
+        pool.checkin(second)
+        self.assertFalse(first.closed)
+        self.assertTrue(second.closed)
+        self.assertEqual(pool.stats()["idle"], 1)
+
+
+    def test_concurrent_checkin(self):
+        """Test that concurrent checkins do not keep more than SIZE idle executors"""
+        pool = ExecutorPool(size=2, min_idle=0, create_executor=self.create_executor)
+        executors = [pool.checkout() for _ in range(8)]
+        threads = [threading.Thread(target=pool.checkin, args=(executor,)) for executor in executors]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(pool.stats()["idle"], 2)
+        self.assertEqual(sum(1 for executor in executors if executor.closed), 6)
+
+
+    def test_size_zero(self):
+        """Test that without a pool every checkout creates an executor, which is closed at the checkin"""
+        pool = ExecutorPool(size=0, create_executor=self.create_executor)
+        first = pool.checkout()
+        pool.checkin(first)
+        self.assertTrue(first.closed)
+        self.assertEqual(first.resets, 0)
+        self.assertIsNot(pool.checkout(), first)
+
+
+    def test_reset_shell(self):
+        """Test that the reset restores the working directory and the environment of a shell session"""
+        pool = ExecutorPool(size=1, min_idle=0, create_executor=ShellCommandExecutor)
+        executor = pool.checkout()
+        try:
+            executor.execute(Command(Command.SHELL, ["cd /tmp", "export POOL_TEST_VAR=dirty"]))
+            pool.checkin(executor)
+            self.assertIs(pool.checkout(), executor)
+            cmd = Command(Command.SHELL, ['pwd; echo "var=$POOL_TEST_VAR"'])
+            executor.execute(cmd)
+            self.assertNotIn("/tmp", cmd.output)
+            self.assertIn("var=\n", cmd.output)
+        finally:
+            executor.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
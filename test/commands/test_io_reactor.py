@@ -0,0 +1,66 @@
+#!/bin/python
+"""UnitTests for IOReactor and the reading of the shell output"""
+
+import os
+import threading
+import time
+import unittest
+from app.commands.command import Command
+from app.commands.io_reactor import IOReactor
+from app.commands.shell_executor import ShellCommandExecutor
+
+
+class TestIOReactor(unittest.TestCase):
+    """UnitTests for IOReactor"""
+
+    def test_multiplex(self):
+        """Test that the data of several pipes is passed to their callbacks, until the end of the streams"""
+        reactor = IOReactor.get_instance()
+        received = {0: b"", 1: b""}
+        closed = threading.Semaphore(0)
+
+        def create_callback(i):
+            def on_data(data):
+                received[i] += data
+                if len(data) == 0:
+                    closed.release()
+            return on_data
+
+        pipes = [os.pipe() for _ in range(2)]
+        for i, (read_fd, _) in enumerate(pipes):
+            reactor.register(read_fd, create_callback(i))
+        for i, (_, write_fd) in enumerate(pipes):
+            os.write(write_fd, f"data {i}\n".encode("utf-8"))
+            os.close(write_fd)
+        for _ in pipes:
+            self.assertTrue(closed.acquire(timeout=5))
+        self.assertEqual(received, {0: b"data 0\n", 1: b"data 1\n"})
+        for read_fd, _ in pipes:
+            os.close(read_fd)
+
+    def test_idle_shell(self):
+        """Test that waiting for the output of a command does not consume CPU"""
+        executor = ShellCommandExecutor()
+        try:
+            start_cpu = time.process_time()
+            command = Command(Command.SHELL, ["sleep 1 && echo \"Grüße\" && echo \"failed\" >&2"])
+            executor.execute(command)
+            self.assertLess(time.process_time() - start_cpu, 0.3)
+            self.assertEqual(sorted(command.output.splitlines()), ["Grüße", "failed"])
+        finally:
+            executor.close()
+
+    def test_inactivity_timeout(self):
+        """Test that the waiting for the output ends with the inactivity timeout"""
+        executor = ShellCommandExecutor()
+        try:
+            executor.COMMAND_INACTIVITY_TIMEOUT = 0.5
+            start_time = time.monotonic()
+            executor.execute(Command(Command.SHELL, ["sleep 3"]))
+            self.assertLess(time.monotonic() - start_time, 2.5)
+        finally:
+            executor.shell_process.kill()
+
+
+if __name__ == "__main__":
+    unittest.main()
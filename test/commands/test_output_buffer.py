@@ -0,0 +1,57 @@
+#!/bin/python
+"""UnitTests for OutputBuffer"""
+
+import os
+import tempfile
+import unittest
+from app.commands.output_buffer import OutputBuffer
+
+
+class TestOutputBuffer(unittest.TestCase):
+    """UnitTests for OutputBuffer"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_small_output(self):
+        """Test that an output within the limits is kept completely, without a spill file"""
+        buffer = OutputBuffer(10, 10, self.temp_dir.name)
+        for chunk in ["Hello", ", ", "World!\n"]:
+            buffer.append(chunk)
+        buffer.close()
+        self.assertEqual(buffer.getvalue(), "Hello, World!\n")
+        self.assertEqual(buffer.elided_chars, 0)
+        self.assertIsNone(buffer.spill_file)
+        self.assertEqual(os.listdir(self.temp_dir.name), [])
+
+    def test_head_and_tail(self):
+        """Test that only the head and the tail are kept, the full output is in the spill file"""
+        buffer = OutputBuffer(10, 10, self.temp_dir.name)
+        lines = [f"line {i}\n" for i in range(1000)]
+        for line in lines:
+            buffer.append(line)
+        buffer.close()
+        full_output = "".join(lines)
+        self.assertEqual(buffer.total_chars, len(full_output))
+        self.assertEqual(buffer.elided_chars, len(full_output) - 20)
+        self.assertTrue(buffer.getvalue().startswith(full_output[:10]))
+        self.assertTrue(buffer.getvalue().endswith(full_output[-10:]))
+        self.assertIn(f"{len(full_output) - 20} characters elided", buffer.getvalue())
+        with open(buffer.spill_file, "r", encoding="utf-8") as f:
+            self.assertEqual(f.read(), full_output)
+
+    def test_large_chunk(self):
+        """Test a single chunk larger than the head and the tail"""
+        buffer = OutputBuffer(3, 3, self.temp_dir.name)
+        buffer.append("abcdefghij")
+        buffer.close()
+        self.assertEqual(buffer.elided_chars, 4)
+        self.assertTrue(buffer.getvalue().startswith("abc\n"))
+        self.assertTrue(buffer.getvalue().endswith("\nhij"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,7 @@
 #!/bin/python
 """UnitTests for Parser"""
 import unittest
-from app.commands.parser import Parser
+from app.commands.parser import Parser, ShellBlockDetector
 from app.commands.command import Command
 
 class TestParser(unittest.TestCase):
@@ -109,6 +109,35 @@ class TestParser(unittest.TestCase):
         self.assertTrue(commands[0].cmds[0].startswith("for file in"))
         self.assertTrue(commands[0].cmds[0].endswith("done"))
 
+    def test_has_closed_shell_block(self):
+        """Test detecting the first closed shell block in a partial agent output"""
+        agent_msg = "Check the git version:\n```bash\ngit --version\n```\nThen clone the repo..."
+        self.assertFalse(Parser.has_closed_shell_block(agent_msg[:30]))
+        self.assertFalse(Parser.has_closed_shell_block(agent_msg[:agent_msg.index("```\n")+3]))
+        self.assertTrue(Parser.has_closed_shell_block(agent_msg[:agent_msg.index("```\n")+4]))
+        self.assertTrue(Parser.has_closed_shell_block(agent_msg))
+        self.assertFalse(Parser.has_closed_shell_block("```python\nprint('hello')\n```\n"))
+        # indented fences, e.g. in a list
+        self.assertTrue(Parser.has_closed_shell_block("1. Check git:\n   ```bash\n   git --version\n   ```\n"))
+
+    def test_shell_block_detector(self):
+        """Test the incremental detection of the first closed shell block while streaming"""
+        agent_msg = "Some python:\n```python\nprint('hello')\n```\nCheck git:\n```bash\ngit --version\n```\nThen..."
+        detector = ShellBlockDetector()
+        received = ""
+        closed_at = None
+        for i, char in enumerate(agent_msg):
+            received += char
+            if detector(received) and closed_at is None:
+                closed_at = i
+        self.assertEqual(closed_at, agent_msg.rindex("```\n") + 3)
+
+    def test_indented_fences(self):
+        """Test parsing a shell block with indented fences"""
+        commands = self.parser.parse("1. Check git:\n   ```bash\n   git --version\n   ```\n2. Done\n")
+        self.assertEqual(len(commands), 1)
+        self.assertEqual(commands[0].cmds[0].strip(), "git --version")
+
 
 if __name__ == "__main__":
     unittest.main()
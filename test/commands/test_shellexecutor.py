@@ -1,9 +1,12 @@
 #!/bin/python
 """UnitTests for ShellCommandExecutor"""
 
+import tempfile
 import unittest
+from unittest.mock import patch
 from app.commands.shell_executor import ShellCommandExecutor
 from app.commands.command import Command
+from app.commands.output_buffer import OutputBuffer
 
 class TestShellCommandExecutor(unittest.TestCase):
     """UnitTests for ShellCommandExecutor"""
@@ -31,5 +34,27 @@ class TestShellCommandExecutor(unittest.TestCase):
         self.assertEqual(len(lines), 2)
         self.assertTrue(lines[0].find("PersistentShell") >= 0)
 
+    def test_exit_code(self):
+        """Test that the exit code of the first failed command is returned"""
+        command = Command(Command.SHELL, ["ls /nonexistent", "echo \"Hello, World!\""])
+        self.assertEqual(self.executor.execute(command), 2)
+        self.assertEqual(command.exit_code, 2)
+        self.assertTrue(command.output.endswith("Hello, World!\n"))
+        command = Command(Command.SHELL, ["true"])
+        self.assertEqual(self.executor.execute(command), 0)
+        self.assertEqual(command.exit_code, 0)
+
+    def test_large_output(self):
+        """Test that a large output is elided in the middle and spilled to a file"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with patch.multiple(OutputBuffer, HEAD_CHARS=100, TAIL_CHARS=100, SPILL_DIR=temp_dir):
+                command = Command(Command.SHELL, ["seq 1 100000"])
+                self.assertEqual(self.executor.execute(command), 0)
+            self.assertTrue(command.output.startswith("1\n2\n"))
+            self.assertTrue(command.output.endswith("99999\n100000\n"))
+            self.assertGreater(command.elided_chars, 500000)
+            with open(command.output_file, "r", encoding="utf-8") as f:
+                self.assertEqual(len(f.read().splitlines()), 100000)
+
 if __name__ == "__main__":
     unittest.main()
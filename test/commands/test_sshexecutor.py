@@ -0,0 +1,149 @@
+#!/bin/python
+"""UnitTests for SSHCommandExecutor, against a local sshd stand-in"""
+
+import os
+import socket
+import subprocess
+import threading
+import unittest
+import paramiko
+from app.commands.command import Command
+from app.commands.ssh_executor import SSHCommandExecutor
+
+
+class LocalSSHServer(paramiko.ServerInterface):
+    """sshd stand-in on localhost (password authentication), the shell of a session is a local bash"""
+
+    USER = "mentor"
+    PASSWORD = "mentor-password"
+
+    def __init__(self):
+        self.host_key = paramiko.RSAKey.generate(2048)
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind(("127.0.0.1", 0))
+        self.socket.listen(8)
+        self.port = self.socket.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def configure(self) -> None:
+        """Sets the environment of SSHCommandExecutor to the server"""
+        os.environ["SHELLBOX_HOST"] = "127.0.0.1"
+        os.environ["SHELLBOX_USER"] = LocalSSHServer.USER
+        os.environ["SHELLBOX_PASSWORD"] = LocalSSHServer.PASSWORD
+        SSHCommandExecutor.SHELLBOX_PORT = self.port
+
+    def close(self) -> None:
+        """Stops accepting connections"""
+        self.socket.close()
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                client, _ = self.socket.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(client,), daemon=True).start()
+
+    def _serve(self, client: socket.socket) -> None:
+        """Forwards the channel of the session to a local bash and back"""
+        client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        transport = paramiko.Transport(client)
+        transport.add_server_key(self.host_key)
+        transport.start_server(server=self)
+        channel = transport.accept(10)
+        if channel is None:
+            transport.close()
+            return
+        shell = subprocess.Popen(["/bin/bash"], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                 stderr=subprocess.STDOUT, bufsize=0)
+
+        def forward_output():
+            try:
+                for data in iter(lambda: os.read(shell.stdout.fileno(), 32768), b""):
+                    channel.sendall(data)
+                channel.close()
+            except (OSError, EOFError):
+                pass    # the client closed the session
+
+        threading.Thread(target=forward_output, daemon=True).start()
+        try:
+            for data in iter(lambda: channel.recv(32768), b""):
+                shell.stdin.write(data)
+        except (OSError, EOFError):
+            pass
+        shell.kill()
+        transport.close()
+
+    def check_auth_password(self, username, password):
+        if username == LocalSSHServer.USER and password == LocalSSHServer.PASSWORD:
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_pty_request(self, channel, term, width, height, pixelwidth, pixelheight, modes):
+        return True
+
+    def check_channel_shell_request(self, channel):
+        return True
+
+
+class TestSSHCommandExecutor(unittest.TestCase):
+    """UnitTests for SSHCommandExecutor"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = LocalSSHServer()
+        cls.server.configure()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.close()
+
+    def setUp(self):
+        self.executor = SSHCommandExecutor()
+
+    def tearDown(self):
+        self.executor.close()
+
+    def test_single_command(self):
+        """Test executing a single command"""
+        command = Command(Command.SHELL, ["echo \"Hello, World!\""])
+        self.assertEqual(self.executor.execute(command), 0)
+        self.assertEqual(command.exit_code, 0)
+        self.assertEqual(command.output, "Hello, World!")
+
+    def test_large_utf8_output(self):
+        """Test that large output with multi-byte characters split across reads is complete"""
+        command = Command(Command.SHELL, ["for i in $(seq 1 2000); do echo \"Zeile $i: Grüße – ✓\"; done"])
+        self.assertEqual(self.executor.execute(command), 0)
+        lines = command.output.splitlines()
+        self.assertEqual(len(lines), 2000)
+        self.assertEqual(lines[-1], "Zeile 2000: Grüße – ✓")
+        self.assertNotIn("�", command.output)
+
+    def test_closed_channel(self):
+        """Test that a closed shell fails the next command at once, instead of waiting for the timeout"""
+        self.executor.execute(Command(Command.SHELL, ["exit"]))
+        command = Command(Command.SHELL, ["echo \"Hello, World!\""])
+        self.assertEqual(self.executor.execute(command), Command.NO_EXIT_CODE)
+
+    def test_exit_code(self):
+        """Test that the exit code of the first failed command is returned"""
+        command = Command(Command.SHELL, ["ls /nonexistent", "echo \"Hello, World!\""])
+        self.assertEqual(self.executor.execute(command), 2)
+        self.assertEqual(command.exit_code, 2)
+        self.assertTrue(command.output.endswith("Hello, World!"))
+        command = Command(Command.SHELL, ["true"])
+        self.assertEqual(self.executor.execute(command), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
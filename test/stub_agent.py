@@ -0,0 +1,29 @@
+#!/bin/python
+"""AI-Agent for the UnitTests, which answers without calling a LLM"""
+
+from app.agents.agent import AIAgent
+
+
+class StubAgent(AIAgent):
+    """
+    Answers every prompt with ANSWER, register it for a model prefix with
+    AIAgentFactory.register_provider("stub-", StubAgent) (and unregister_provider() afterwards).
+    Subclasses override _send() or _send_candidates() for other answers.
+    """
+
+    ANSWER = "There is nothing to do."
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.response_cache = None
+
+    def system(self, prompt: str) -> str:
+        self.messages = []
+        return super().system(prompt)
+
+    def ask(self, prompt: str) -> str:
+        super().ask(prompt)
+        return self._complete(self._send)
+
+    def _send(self) -> str:
+        return self.ANSWER
@@ -5,11 +5,19 @@ UnitTests for ActivityInterpreter
 
 import unittest
 import os
+import tempfile
+from unittest.mock import patch
+from app.agents.agent_config import AIAgentConfig
+from app.agents.agent_factory import AIAgentFactory
 from app.agents.prompt import Prompt
+from app.commands.output_buffer import OutputBuffer
+from app.commands.shell_executor import ShellCommandExecutor
 from app.workflow.activity import Activity
 from app.workflow.workflow import Workflow
 from app.workflow.context import Context
 from app.workflow.activity_interpreter import ActivityInterpreter
+from app.workflow.history import History
+from test.stub_agent import StubAgent
 
 class TestActivityInterpreter(unittest.TestCase):
     """UnitTests for ActivityInterpreter"""
@@ -84,6 +92,44 @@ class TestActivityInterpreter(unittest.TestCase):
         self.assertTrue(interpreter.activity_succeeded)
 
 
+    def test_execute_exit_code(self):
+        """Test EXECUTE activity setting EXIT_CODE for CHECK expressions"""
+        AIAgentFactory.register_provider("stub-", StubAgent)
+        try:
+            context = Context( Workflow("Test Workflow"), AIAgentConfig("stub-model"), ShellCommandExecutor() )
+        finally:
+            AIAgentFactory.unregister_provider("stub-")
+        context.result = ""
+        interpreter = ActivityInterpreter(context)
+
+        Activity(Activity.Kind.EXECUTE, "EXECUTE_FAILED", "ls /nonexistent").accept(interpreter)
+        self.assertEqual(context.get_value("EXIT_CODE"), "2")
+        activity = Activity(Activity.Kind.CHECK, "CHECK_EXIT_CODE", "EXIT_CODE == 0")
+        activity.accept(interpreter)
+        self.assertFalse(interpreter.activity_succeeded)
+
+        Activity(Activity.Kind.EXECUTE, "EXECUTE_OK", "echo ok").accept(interpreter)
+        activity.accept(interpreter)
+        self.assertTrue(interpreter.activity_succeeded)
+
+
+    def test_execute_output_dir(self):
+        """Test that a long output of EXECUTE is spilled to the log directory of the workflow run"""
+        AIAgentFactory.register_provider("stub-", StubAgent)
+        try:
+            context = Context( Workflow("Test Workflow"), AIAgentConfig("stub-model"), ShellCommandExecutor() )
+        finally:
+            AIAgentFactory.unregister_provider("stub-")
+        context.result = ""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            interpreter = ActivityInterpreter(context, History(temp_dir))
+            with patch.multiple(OutputBuffer, HEAD_CHARS=100, TAIL_CHARS=100):
+                Activity(Activity.Kind.EXECUTE, "EXECUTE_LONG", "seq 1 10000").accept(interpreter)
+            spill_files = os.listdir(os.path.join(temp_dir, "output"))
+            self.assertEqual(len(spill_files), 1)
+            self.assertIn(os.path.join(temp_dir, "output", spill_files[0]), context.result)
+        context.command_executor.close()
+
     def test_prompt(self):
         """Test prompt method"""
         workflow = Workflow("Test Workflow prompt")
@@ -0,0 +1,165 @@
+#!/bin/python
+"""
+UnitTests for the candidate answers of PROMPT activities (AI_CANDIDATES)
+"""
+
+import tempfile
+import unittest
+from unittest.mock import patch
+from app.agents.agent_config import AIAgentConfig
+from app.agents.agent_factory import AIAgentFactory
+from app.agents.prompt import Prompt
+from app.commands.shell_executor import ShellCommandExecutor
+from app.workflow.activity import Activity
+from app.workflow.candidate_selector import CandidateSelector
+from app.workflow.context import Context
+from app.workflow.interpreter import WorkflowInterpreter
+from app.workflow.workflow import Workflow
+from app.workflow.writer import WorkflowWriter
+from test.stub_agent import StubAgent as BaseStubAgent
+
+
+class StubAgent(BaseStubAgent):
+    """Answers with fixed candidates instead of calling a LLM"""
+
+    CANDIDATES = ["There is nothing to do.",
+                  "```shell\necho failed\n```",
+                  "```shell\necho ok\n```"]
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.requests = 0
+
+    def _send_candidates(self, n: int) -> list[str]:
+        self.requests += 1
+        return StubAgent.CANDIDATES[:n]
+
+
+class PromptStubAgent(StubAgent):
+    """Answers with candidates echoing the last word of the prompt"""
+
+    def _send_candidates(self, n: int) -> list[str]:
+        self.requests += 1
+        word = self.messages[-1].content.split()[-1]
+        return [f"```shell\necho {word}_{i}\n```" for i in range(n)]
+
+
+class TestCandidates(unittest.TestCase):
+    """UnitTests for the candidate answers of PROMPT activities"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.patcher = patch.object(WorkflowWriter, "LOGFILES_DIR", self.temp_dir.name)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.temp_dir.cleanup()
+
+    def test_selectors(self):
+        """Test the registered selectors"""
+        candidates = StubAgent.CANDIDATES
+        self.assertEqual(CandidateSelector.create(CandidateSelector.FIRST)(candidates), 0)
+        self.assertEqual(CandidateSelector.create(CandidateSelector.COMMANDS)(candidates), 1)
+        self.assertEqual(CandidateSelector.create("regex:^echo ok$")(candidates), 2)
+        self.assertIsNone(CandidateSelector.create("regex:git")(candidates))
+        self.assertIsNone(CandidateSelector.create(CandidateSelector.COMMANDS)([]))
+        with self.assertRaises(ValueError):
+            CandidateSelector.create("best")
+
+        CandidateSelector.register("last", lambda candidates: len(candidates) - 1 if candidates else None)
+        self.assertEqual(CandidateSelector.create("last")(candidates), 2)
+
+    def test_agent_candidates(self):
+        """Test that the unused candidates are taken without another request"""
+        agent = StubAgent(AIAgentConfig("stub-model"))
+        agent.system("You are a helpful assistant")
+        selector = CandidateSelector.create(CandidateSelector.COMMANDS)
+        self.assertEqual(agent.ask_candidates("Print ok", 3, selector), StubAgent.CANDIDATES[1])
+        self.assertEqual(agent.candidates, [StubAgent.CANDIDATES[0], StubAgent.CANDIDATES[2]])
+        self.assertEqual(agent.next_candidate("Print ok", selector), StubAgent.CANDIDATES[2])
+        self.assertIsNone(agent.next_candidate("Print ok", selector))
+        self.assertEqual(agent.requests, 1)
+        self.assertEqual(agent.total_candidates, 3)
+        self.assertEqual(agent.reused_candidates, 1)
+        self.assertEqual(len(agent.messages), 5)
+        self.assertEqual(len(agent.call_metrics), 1)
+
+    def test_agent_candidates_other_prompt(self):
+        """Test that the unused candidates do not answer another prompt"""
+        agent = StubAgent(AIAgentConfig("stub-model"))
+        agent.system("You are a helpful assistant")
+        agent.ask_candidates("Print ok", 3)
+        self.assertIsNone(agent.next_candidate("Print something else"))
+        self.assertEqual(len(agent.candidates), 2)
+        agent.ask("Print something else")
+        self.assertEqual(agent.candidates, [])
+        self.assertIsNone(agent.next_candidate("Print ok"))
+        self.assertEqual(agent.reused_candidates, 0)
+
+    def test_workflow_retry(self):
+        """Test that the retry of a PROMPT -> EXECUTE -> CHECK loop takes the next candidate"""
+        workflow = Workflow("Test Workflow candidates")
+        workflow.params["AI_CANDIDATES"] = "3"
+        workflow.prompts["User Ask"] = Prompt(Prompt.USER, "Print ok")
+        start = Activity(Activity.Kind.START, "START")
+        prompt = Activity(Activity.Kind.PROMPT, "PROMPT_ASK", "User Ask")
+        execute = Activity(Activity.Kind.EXECUTE, "EXECUTE_OUTPUT")
+        check = Activity(Activity.Kind.CHECK, "CHECK_OK", "RESULT CONTAINS ok")
+        success = Activity(Activity.Kind.SUCCESS, "SUCCESS")
+        for activity in [start, prompt, execute, check, success]:
+            workflow.activities[activity.name] = activity
+        workflow.start = start
+        start.next = prompt
+        prompt.next = execute
+        execute.next = check
+        check.next = success
+        check.other = prompt
+
+        AIAgentFactory.register_provider("stub-", StubAgent)
+        try:
+            context = Context(workflow, AIAgentConfig("stub-model"), ShellCommandExecutor())
+            status, _ = WorkflowInterpreter(workflow).run(context)
+        finally:
+            AIAgentFactory.unregister_provider("stub-")
+        self.assertEqual(status, Workflow.Status.SUCCESS)
+        self.assertEqual(context.agent.requests, 1)
+        self.assertEqual(context.agent.reused_candidates, 1)
+
+    def test_workflow_other_prompts_after_failed_check(self):
+        """Test that the prompts following a failed CHECK are not answered by the candidates of the failed one"""
+        workflow = Workflow("Test Workflow candidates")
+        workflow.params["AI_CANDIDATES"] = "3"
+        start = Activity(Activity.Kind.START, "START")
+        activities = [start]
+        for name in ["A", "B", "C"]:
+            workflow.prompts[f"User {name}"] = Prompt(Prompt.USER, f"Print {name}")
+            activities.append(Activity(Activity.Kind.PROMPT, f"PROMPT_{name}", f"User {name}"))
+            activities.append(Activity(Activity.Kind.EXECUTE, f"EXECUTE_{name}"))
+        check = Activity(Activity.Kind.CHECK, "CHECK_A", "RESULT CONTAINS never")
+        activities.insert(3, check)
+        activities.append(Activity(Activity.Kind.SUCCESS, "SUCCESS"))
+        for activity, next_activity in zip(activities, activities[1:]):
+            workflow.activities[activity.name] = activity
+            activity.next = next_activity
+        workflow.activities["SUCCESS"] = activities[-1]
+        workflow.start = start
+        check.other = check.next
+
+        AIAgentFactory.register_provider("stub-", PromptStubAgent)
+        try:
+            context = Context(workflow, AIAgentConfig("stub-model"), ShellCommandExecutor())
+            status, _ = WorkflowInterpreter(workflow).run(context)
+        finally:
+            AIAgentFactory.unregister_provider("stub-")
+        self.assertEqual(status, Workflow.Status.SUCCESS)
+        self.assertEqual(context.agent.requests, 3)
+        self.assertEqual(context.agent.reused_candidates, 0)
+        answers = [msg.content for msg in context.agent.messages if msg.role == Prompt.ASSISTANT]
+        self.assertEqual(len(answers), 3)
+        for name, answer in zip(["A", "B", "C"], answers):
+            self.assertIn(f"echo {name}_0", answer)
+
+
+if __name__ == "__main__":
+    unittest.main()
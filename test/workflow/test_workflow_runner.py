@@ -0,0 +1,97 @@
+#!/bin/python
+"""
+UnitTests for the statistics of WorkflowRunner (CSV and JSON)
+"""
+
+import datetime
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from app.agents.agent_config import AIAgentConfig
+from app.agents.agent_factory import AIAgentFactory
+from app.workflow.batch_config import BatchConfig
+from app.workflow.context import Context
+from app.workflow.workflow import Workflow
+from app.workflow.workflow_runner import WorkflowRunner
+from app.workflow.writer import WorkflowWriter
+from test.stub_agent import StubAgent
+
+
+class TestWorkflowRunner(unittest.TestCase):
+    """UnitTests for the statistics of WorkflowRunner"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.patcher = patch.object(WorkflowWriter, "LOGFILES_DIR", self.temp_dir.name)
+        self.patcher.start()
+        AIAgentFactory.register_provider("stub-", StubAgent)
+
+    def tearDown(self):
+        AIAgentFactory.unregister_provider("stub-")
+        self.patcher.stop()
+        self.temp_dir.cleanup()
+
+    def create_runner(self) -> WorkflowRunner:
+        """Creates a runner of a workflow with two answered prompts, without running it"""
+        workflow_file = os.path.join(self.temp_dir.name, "test.wf.md")
+        runner = WorkflowRunner(workflow_file, {})
+        runner.context = Context(Workflow("Test Workflow"), AIAgentConfig("stub-model"))
+        runner.context.agent.system("You are a helpful assistant")
+        runner.context.agent.ask("What is the answer?")
+        runner.context.agent.ask("Are you sure?")
+        runner.start_time = datetime.datetime.now()
+        runner.duration_sec = 1.5
+        return runner
+
+    def test_csv(self):
+        """Test the columns and the metrics of the CSV file"""
+        runner = self.create_runner()
+        runner.write_stats_to_csv((Workflow.Status.SUCCESS, "42"), BatchConfig())
+        runner.write_stats_to_csv((Workflow.Status.SUCCESS, "42"), BatchConfig())
+        with open(runner.csv_file, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        self.assertEqual(len(lines), 3)
+        header = lines[0].split(";")
+        row = dict(zip(header, lines[2].split(";")))
+        self.assertEqual(len(lines[2].split(";")), len(header) + 1)  # each value ends with ';'
+        self.assertEqual(row["nr"], "2")
+        self.assertEqual(row["cfg_model"], "stub-model")
+        self.assertEqual(row["calls"], "2")
+        self.assertEqual(row["errors"], "0")
+        self.assertEqual(row["retries"], "0")
+        self.assertEqual(row["cache_misses"], "0")
+        self.assertGreaterEqual(float(row["latency_p95_sec"]), float(row["latency_p50_sec"]))
+
+    def test_csv_header_changed(self):
+        """Test that a CSV file with other columns is rotated instead of appended to"""
+        csv_file = os.path.join(self.temp_dir.name, "test.csv")
+        with open(csv_file, "w", encoding="utf-8") as f:
+            f.write("nr;sourcefile;label\n1;old.wf.md;\n")
+        runner = self.create_runner()
+        runner.write_stats_to_csv((Workflow.Status.SUCCESS, "42"), BatchConfig())
+        with open(csv_file, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+        self.assertEqual(lines[0], WorkflowRunner.CSV_HEADER)
+        self.assertEqual(lines[1].split(";")[0], "1")
+        rotated = [name for name in os.listdir(self.temp_dir.name) if name.startswith("test.") and
+                   name.endswith(".csv") and name != "test.csv"]
+        self.assertEqual(len(rotated), 1)
+
+    def test_json(self):
+        """Test the metrics of the JSON run summary"""
+        runner = self.create_runner()
+        runner.write_stats_to_jsonfile((Workflow.Status.SUCCESS, "42"))
+        with open(runner.workflow_file.replace(".wf.md", ".stats.json"), "r", encoding="utf-8") as f:
+            stats = json.load(f)
+        self.assertEqual(stats["config"]["model_name"], "stub-model")
+        self.assertEqual(stats["result_length"], 2)
+        self.assertEqual(stats["statistics"]["calls"], 2)
+        self.assertEqual(stats["statistics"]["errors"], 0)
+        self.assertEqual(stats["statistics"]["retries"], 0)
+        self.assertIsNotNone(stats["statistics"]["latency_p50_sec"])
+
+
+if __name__ == "__main__":
+    unittest.main()